@@ -0,0 +1,133 @@
+import base64
+import json
+import logging
+from datetime import datetime
+
+from django.conf import settings
+from django.db.models import F, Q, Window
+from django.db.models.functions import RowNumber
+
+from .models import NewsArticle
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Number of articles per page when the request does not ask for a page size
+FEED_PAGE_SIZE = getattr(settings, 'FEED_PAGE_SIZE', 20)
+
+# Largest page size a request may ask for
+FEED_MAX_PAGE_SIZE = getattr(settings, 'FEED_MAX_PAGE_SIZE', 100)
+
+# Fields of NewsArticle returned for each feed article
+FEED_FIELDS = ('news_id', 'title', 'category', 'description', 'url', 'published_at', 'image_url')
+
+# Newest articles first; the primary key breaks ties between articles published at the same time
+FEED_ORDER = (F('published_at').desc(), F('id').desc())
+
+
+def parse_page_size(value, default=FEED_PAGE_SIZE):
+    """
+    Return the requested page size clamped to [1, FEED_MAX_PAGE_SIZE].
+    :raises ValueError: If the value is not an integer
+    """
+    if value in (None, ''):
+        return default
+    return max(1, min(int(value), FEED_MAX_PAGE_SIZE))
+
+
+def encode_cursor(article, category=None):
+    """
+    Return the opaque cursor pointing after the given article (a values() dict including 'id').
+    """
+    position = {'p': article['published_at'].isoformat(), 'i': article['id']}
+    if category is not None:
+        position['c'] = category
+    return base64.urlsafe_b64encode(json.dumps(position).encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """
+    Return the (category, published_at, id) position of a cursor; category is None for cursors of the trending feed.
+    :raises ValueError: If the cursor is malformed
+    """
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except (UnicodeError, json.JSONDecodeError, base64.binascii.Error) as e:
+        raise ValueError(f"Invalid cursor {cursor}.") from e
+    if (not isinstance(position, dict) or not isinstance(position.get('p'), str)
+            or type(position.get('i')) is not int or not isinstance(position.get('c', ''), str)):
+        raise ValueError(f"Invalid cursor {cursor}.")
+    return position.get('c'), datetime.fromisoformat(position['p']), position['i']
+
+
+def after(published_at, article_id):
+    """
+    Keyset condition selecting the articles that come after the given position in feed order.
+    """
+    return Q(published_at__lt=published_at) | Q(published_at=published_at, id__lt=article_id)
+
+
+def _page(articles, page_size, category=None):
+    """
+    Split page_size + 1 fetched articles into the page and the cursor of the next page (None on the last page).
+    """
+    next_cursor = encode_cursor(articles[page_size - 1], category) if len(articles) > page_size else None
+    return [{field: article[field] for field in FEED_FIELDS} for article in articles[:page_size]], next_cursor
+
+
+def get_category_feeds(categories, page_size=FEED_PAGE_SIZE, cursors=()):
+    """
+    Fetch one page of articles for each of several categories with a single query.
+
+    Every category is a partition of a ROW_NUMBER() window ordered like the feed, so the query returns at most
+    page_size + 1 rows per category; the composite (category, published_at, id) index serves the partitions
+    in order. Categories with a cursor continue after it, the others start at their newest article.
+
+    :param categories: List of categories
+    :param page_size: Number of articles per category
+    :param cursors: Cursors returned for earlier pages (one per category at most)
+    :return: A dict of category to (list of article dicts, next cursor or None)
+    """
+    positions = {}
+    for cursor in cursors:
+        category, published_at, article_id = decode_cursor(cursor)
+        positions[category] = (published_at, article_id)
+
+    condition = Q()
+    for category in dict.fromkeys(categories):
+        category_condition = Q(category=category)
+        if category in positions:
+            category_condition &= after(*positions[category])
+        condition |= category_condition
+
+    rows = (
+        NewsArticle.objects.filter(condition)
+        .annotate(feed_rank=Window(RowNumber(), partition_by=[F('category')], order_by=FEED_ORDER))
+        .filter(feed_rank__lte=page_size + 1)
+        .order_by('category', 'feed_rank')
+        .values('id', *FEED_FIELDS)
+    )
+
+    articles_by_category = {category: [] for category in categories}
+    for article in rows:
+        articles_by_category[article['category']].append(article)
+
+    return {
+        category: _page(articles, page_size, category)
+        for category, articles in articles_by_category.items()
+    }
+
+
+def get_latest_feed(page_size=FEED_PAGE_SIZE, cursor=None):
+    """
+    Fetch one page of the newest articles over all categories, served by the (published_at, id) index.
+
+    :param page_size: Number of articles
+    :param cursor: Cursor returned for the previous page
+    :return: Tuple of the list of article dicts and the next cursor (None on the last page)
+    """
+    articles = NewsArticle.objects.all()
+    if cursor:
+        _, published_at, article_id = decode_cursor(cursor)
+        articles = articles.filter(after(published_at, article_id))
+    return _page(list(articles.order_by(*FEED_ORDER).values('id', *FEED_FIELDS)[:page_size + 1]), page_size)
@@ -0,0 +1,18 @@
+from django.conf import settings
+
+# News categories, in the order their weights are packed in UserPreferences.weights.
+# Categories may only be appended: the position of a category is its column in every stored weight vector,
+# and vectors stored before a category was added read as 0 for it.
+CATEGORIES = list(getattr(settings, 'NEWS_CATEGORIES', [
+    'business', 'sports', 'technology', 'entertainment', 'health', 'general', 'science',
+]))
+
+# Position of each category in a weight vector
+CATEGORY_INDEX = {category: index for index, category in enumerate(CATEGORIES)}
+
+
+def category_index(category):
+    """
+    Return the position of a category in a weight vector, or None if the category is unknown.
+    """
+    return CATEGORY_INDEX.get(category)
@@ -0,0 +1,266 @@
+import logging
+import threading
+from collections import Counter, defaultdict
+
+import numpy as np
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.http import Http404
+from django.utils import timezone
+
+from .categories import CATEGORY_INDEX
+from .decayFunction import apply_clicks, existing_user_ids, fold_clicks_into_profile
+from .embeddingStore import get_embedding_store
+from .indexService import get_index_service
+from .models import NewsArticle, UserInteractions, UserPreferences, UserProfileVector
+from .trendingFeed import record_trending_clicks
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# How clicks reach the preferences: 'async' (recorded in the request, applied in batches by a click worker)
+# or 'sync' (recorded and applied before the request returns)
+CLICK_INGESTION_MODE = getattr(settings, 'CLICK_INGESTION_MODE', 'async')
+
+# Whether web processes also run a click worker thread (development only); in production a `process_clicks`
+# worker applies the queued clicks
+CLICK_WORKER_IN_PROCESS = getattr(settings, 'CLICK_WORKER_IN_PROCESS', False)
+
+# Seconds between two flushes of the click worker
+CLICK_FLUSH_INTERVAL = getattr(settings, 'CLICK_FLUSH_INTERVAL', 1.0)
+
+# Maximum number of clicks applied per batch
+CLICK_BATCH_SIZE = getattr(settings, 'CLICK_BATCH_SIZE', 2000)
+
+# The rate at which past clicks decay in the profile vector
+CLICK_DECAY_RATE = getattr(settings, 'CLICK_DECAY_RATE', 0.02)
+
+def enqueue_click(user_id, news_id):
+    """
+    Record the click of a news article as a pending interaction, without touching the user's preferences.
+
+    :param user_id: The unique identifier for the user
+    :param news_id: The unique identifier for the clicked news article
+    :return: The user ID the click was recorded for, in its canonical form
+    :raises ValueError: If the user ID is not an integer
+    :raises Http404: If the user or the news article is not found
+    """
+    user_id = str(user_id)
+    if not (user_id.isascii() and user_id.isdigit()):
+        logger.error(f"Invalid user ID {user_id}.")
+        raise ValueError(f"Invalid user ID {user_id}.")
+    user_id = str(int(user_id))
+    if not existing_user_ids([user_id]):
+        logger.error(f"User with ID {user_id} does not exist.")
+        raise Http404(f"User with ID {user_id} does not exist.")
+
+    try:
+        article = NewsArticle.objects.only('id').get(news_id=news_id)
+    except NewsArticle.DoesNotExist:
+        logger.error(f"News article with ID {news_id} does not exist.")
+        raise Http404(f"News article with ID {news_id} does not exist.")
+
+    UserInteractions.objects.create(user_id=user_id, news_article=article, clicked=True)
+    return user_id
+
+
+def handle_click(user_id, news_id, mode=None):
+    """
+    Record the click of a news article and apply it according to CLICK_INGESTION_MODE.
+
+    :param user_id: The unique identifier for the user
+    :param news_id: The unique identifier for the clicked news article
+    :param mode: 'async' or 'sync' (default: CLICK_INGESTION_MODE)
+    :return: True if the preferences were updated before returning, False if the click is queued
+    :raises ValueError: If the user ID is not an integer
+    :raises Http404: If the user or the news article is not found
+    """
+    user_id = enqueue_click(user_id, news_id)
+    if (mode or CLICK_INGESTION_MODE) == 'sync':
+        process_pending_clicks(user_ids=[user_id])
+        return True
+
+    if CLICK_WORKER_IN_PROCESS:
+        start_click_worker()
+    return False
+
+
+def _apply_preference_clicks(clicks_by_user):
+    """
+    Apply the clicked categories of each user to their preference weights, one bulk write for all users.
+    """
+    now = timezone.now()
+    preferences = {
+        str(user_pref.user_id): user_pref
+        for user_pref in UserPreferences.objects.select_for_update().filter(user_id__in=list(clicks_by_user))
+    }
+
+    updated, created = [], []
+    for user_id, user_clicks in clicks_by_user.items():
+        category_clicks = [(category, clicked_at) for _, category, clicked_at in user_clicks if category in CATEGORY_INDEX]
+        if len(category_clicks) < len(user_clicks):
+            ignored = len(user_clicks) - len(category_clicks)
+            logger.error(f"Ignored {ignored} clicks of user {user_id} on unknown categories.")
+        if not category_clicks:
+            continue
+
+        user_pref = preferences.get(user_id)
+        if user_pref is None:
+            # A new user starts with all weights at 0
+            user_pref = UserPreferences(user_id=user_id, last_updated=now)
+            created.append(user_pref)
+        else:
+            updated.append(user_pref)
+
+        apply_clicks(user_pref, category_clicks, now)
+
+    UserPreferences.objects.bulk_update(updated, ['weights', 'last_updated'])
+    UserPreferences.objects.bulk_create(created)
+
+
+def _apply_profile_clicks(clicks_by_user, decay_rate):
+    """
+    Fold the embeddings of the clicked articles into each user's profile vector, one bulk write for all users.
+    """
+    snapshot = get_index_service().get_snapshot()
+    if snapshot is None:
+        logger.error("No FAISS index available, profile vectors not updated.")
+        return
+    store = get_embedding_store()
+
+    embeddings_by_user = {}
+    for user_id, user_clicks in clicks_by_user.items():
+        embeddings = [store.get(news_id, snapshot.mapping) for news_id, _, _ in user_clicks]
+        embeddings = [embedding for embedding in embeddings if embedding is not None]
+        if embeddings:
+            embeddings_by_user[user_id] = np.vstack(embeddings)
+    if not embeddings_by_user:
+        return
+
+    profiles = {
+        profile.user_id: profile
+        for profile in UserProfileVector.objects.select_for_update().filter(user_id__in=embeddings_by_user)
+    }
+
+    now = timezone.now()
+    updated, created = [], []
+    for user_id, embeddings in embeddings_by_user.items():
+        profile = profiles.get(user_id)
+        if profile is None:
+            profile = UserProfileVector(user_id=user_id)
+            created.append(profile)
+            current = None
+        else:
+            updated.append(profile)
+            current = profile.get_vector()
+
+        vector, profile.click_count = fold_clicks_into_profile(current, profile.click_count, embeddings, decay_rate)
+        profile.set_vector(vector)
+        profile.updated_at = now
+
+    UserProfileVector.objects.bulk_update(updated, ['vector', 'click_count', 'updated_at'])
+    UserProfileVector.objects.bulk_create(created)
+
+
+def process_pending_clicks(batch_size=CLICK_BATCH_SIZE, user_ids=None, decay_rate=CLICK_DECAY_RATE):
+    """
+    Apply one batch of pending clicks to the users' preferences and profile vectors.
+
+    The clicks of each user are coalesced: k clicks cost k additions to the stored weights and one closed-form
+    update of the profile vector, and all users of the batch are written with one bulk UPDATE per table. The clicks
+    are also added to the trending scores of the clicked articles. Pending rows are
+    claimed with SKIP LOCKED, so several workers can drain the queue side by side.
+
+    :param batch_size: Maximum number of clicks to apply
+    :param user_ids: Only apply the clicks of these users (default: all users)
+    :param decay_rate: The rate at which past clicks decay in the profile vector
+    :return: The number of clicks applied
+    """
+    with transaction.atomic():
+        pending = UserInteractions.objects.filter(processed=False, clicked=True)
+        if user_ids is not None:
+            pending = pending.filter(user_id__in=user_ids)
+        clicks = list(
+            pending.select_for_update(skip_locked=True, of=('self',))
+            .order_by('id')
+            .values_list('id', 'user_id', 'news_article_id', 'news_article__news_id', 'news_article__category',
+                         'timestamp')[:batch_size]
+        )
+        if not clicks:
+            return 0
+
+        # Group the clicks per user, oldest click first
+        clicks_by_user = defaultdict(list)
+        for _, user_id, _, news_id, category, clicked_at in clicks:
+            clicks_by_user[user_id].append((news_id, category, clicked_at))
+
+        # Drop the clicks of users deleted since they clicked
+        for user_id in set(clicks_by_user) - existing_user_ids(clicks_by_user):
+            logger.error(f"Ignored {len(clicks_by_user.pop(user_id))} clicks of unknown user {user_id}.")
+
+        _apply_preference_clicks(clicks_by_user)
+        _apply_profile_clicks(clicks_by_user, decay_rate)
+        record_trending_clicks(Counter(click[2] for click in clicks))
+
+        UserInteractions.objects.filter(id__in=[click[0] for click in clicks]).update(processed=True)
+
+    logger.info(f"Applied {len(clicks)} clicks of {len(clicks_by_user)} users.")
+    return len(clicks)
+
+
+def drain_pending_clicks(batch_size=CLICK_BATCH_SIZE):
+    """
+    Apply pending clicks until the queue is empty.
+    :return: The number of clicks applied
+    """
+    total = 0
+    while True:
+        applied = process_pending_clicks(batch_size)
+        total += applied
+        if applied < batch_size:
+            return total
+
+
+class ClickWorker(threading.Thread):
+    """
+    Daemon thread applying the pending clicks every `interval` seconds.
+
+    Clicks are durable in the UserInteractions table, so clicks left pending when the process exits are
+    applied by the next worker.
+    """
+
+    def __init__(self, interval=CLICK_FLUSH_INTERVAL, batch_size=CLICK_BATCH_SIZE):
+        super().__init__(name='click-worker', daemon=True)
+        self.interval = interval
+        self.batch_size = batch_size
+        self._stopping = threading.Event()
+
+    def run(self):
+        while not self._stopping.wait(self.interval):
+            try:
+                drain_pending_clicks(self.batch_size)
+            except Exception as e:
+                logger.error(f"Error applying pending clicks: {str(e)}")
+            finally:
+                close_old_connections()
+
+    def stop(self):
+        self._stopping.set()
+
+
+_click_worker = None
+_click_worker_lock = threading.Lock()
+
+
+def start_click_worker():
+    """
+    Start the process-wide click worker thread if it is not running yet.
+    """
+    global _click_worker
+    if _click_worker is None or not _click_worker.is_alive():
+        with _click_worker_lock:
+            if _click_worker is None or not _click_worker.is_alive():
+                _click_worker = ClickWorker()
+                _click_worker.start()
+                logger.info("Started the click worker thread.")
+    return _click_worker
@@ -1,167 +1,509 @@
+import math
 import re
+from itertools import islice
 import faiss
 import numpy as np
 import logging
-from .models import NewsArticle
-from sentence_transformers import SentenceTransformer
+from django.conf import settings
+from .models import NewsArticle, PopulateJob
+from .indexService import FAISS_INDEX_PATH, get_index_service, publish_index
+from .newsIdMapping import NewsIdMapping, load_news_id_mapping
+from .embeddingEngine import encode_texts, get_model, normalize_rows
+from .embeddingStore import get_embedding_store
+from .nearDuplicates import assign_clusters, duplicate_positions, promote_cluster_members, save_clusters
+from .stageTimers import StageTimers
 import hashlib
 import os
-import pandas as pd
-import json
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
-# Path to the stored FAISS index file
-FAISS_INDEX_PATH = 'news_faiss.index'
+# FAISS index type: 'auto' (chosen by vector count), 'flat', 'ivf_flat', 'ivf_pq' or 'hnsw'
+FAISS_INDEX_TYPE = getattr(settings, 'FAISS_INDEX_TYPE', 'auto')
+
+# Vector counts from which the automatic choice switches to IVF-Flat and IVF-PQ
+FAISS_IVF_THRESHOLD = getattr(settings, 'FAISS_IVF_THRESHOLD', 50000)
+FAISS_IVF_PQ_THRESHOLD = getattr(settings, 'FAISS_IVF_PQ_THRESHOLD', 2000000)
+
+# Maximum number of vectors used to train IVF/PQ indexes
+FAISS_TRAINING_SAMPLE_SIZE = getattr(settings, 'FAISS_TRAINING_SAMPLE_SIZE', 100000)
+
+# Minimum number of training vectors per index type (PQ trains 256 centroids per sub-quantizer); below it a flat
+# index is built instead
+FAISS_MIN_TRAINING_VECTORS = {'ivf_flat': 1, 'ivf_pq': 256}
+
+# Number of articles read from the database and embedded at a time when updating the index
+EMBEDDING_CHUNK_SIZE = getattr(settings, 'EMBEDDING_CHUNK_SIZE', 1024)
+
+# FAISS factory string per index type; {nlist} and {pq_m} are filled in from the vector count and dimension
+FAISS_INDEX_FACTORY_STRINGS = {
+    'flat': 'IDMap2,Flat',
+    'ivf_flat': 'IDMap2,IVF{nlist},Flat',
+    'ivf_pq': 'IDMap2,IVF{nlist},PQ{pq_m}',
+    'hnsw': 'IDMap2,HNSW32',
+}
+
+# Characters removed from embedding input: everything but ASCII letters, digits and spaces
+NON_ALPHANUMERIC = re.compile(r"[^a-zA-Z0-9 ]")
+
+# ASCII bytes clean_texts deletes: everything but letters, digits, spaces and the NUL separator it joins texts with
+NON_ALPHANUMERIC_BYTES = bytes(byte for byte in range(128) if not (chr(byte).isalnum() or chr(byte) in " \x00"))
+
+def is_missing(text):
+    """
+    Whether a title or description is missing (None or NaN).
+    """
+    return text is None or (isinstance(text, float) and math.isnan(text))
 
 def clean_text(text):
     """
     Clean and preprocess the given text. Convert to lowercase, strip whitespaces, and remove special characters.
     """
-    if pd.isna(text):
+    if is_missing(text):
         return ""
     text = text.lower().strip()  # Convert to lowercase and strip
-    text = re.sub(r"[^a-zA-Z0-9 ]", "", text)  # Remove non-alphanumeric characters except spaces
-    return text
+    return NON_ALPHANUMERIC.sub("", text)  # Remove non-alphanumeric characters except spaces
+
+def clean_texts(titles, descriptions):
+    """
+    Clean whole columns of titles and descriptions and combine them per article into the embedding input.
+    Equivalent to clean_text(title) + " " + clean_text(description) for every article, but the texts are joined
+    into one string that is filtered and lowercased at once: encoding to ASCII drops the non-ASCII characters,
+    bytes.translate deletes the remaining ASCII punctuation and bytes.lower lowercases what is left.
+
+    :param titles: List of titles (None for missing ones)
+    :param descriptions: List of descriptions of the same length (None for missing ones)
+    :return: List of cleaned texts
+    """
+    # Missing texts (None or NaN) are the only ones that are not strings
+    titles = [title.strip() if isinstance(title, str) else "" for title in titles]
+    descriptions = [description.strip() if isinstance(description, str) else "" for description in descriptions]
+    combined = "\x00".join(map(" ".join, zip(titles, descriptions)))
+    if combined.count("\x00") != max(len(titles) - 1, 0):
+        # A text contains the separator itself
+        return [clean_text(title) + " " + clean_text(description) for title, description in zip(titles, descriptions)]
+    if not titles:
+        return []
+    # The only non-ASCII characters whose lowercase contains ASCII letters (str.lower would keep those)
+    combined = combined.replace("\u0130", "i").replace("\u212a", "k")
+    cleaned = combined.encode('ascii', 'ignore').translate(None, NON_ALPHANUMERIC_BYTES).lower()
+    return cleaned.decode('ascii').split("\x00")
 
 def generate_embeddings_for_articles(articles):
     """
     Generate embeddings for a list of articles using SBERT.
+    Texts are encoded in batches by the shared embedding engine; unchanged texts are served from its cache.
 
     :param articles: List of articles to generate embeddings for
-    :return: List of embeddings for the articles and their corresponding news IDs
+    :return: Array of embeddings for the articles and their corresponding news IDs
     """
-    model = SentenceTransformer('all-MiniLM-L6-v2')  # Load the SBERT model
-    embeddings = []
-    news_id_to_index = {}  # To store the mapping of news_id to FAISS index
+    # Clean title and description, and combine them for embedding generation
+    texts = clean_texts([article['title'] for article in articles], [article['description'] for article in articles])
+    news_ids = [article['news_id'] for article in articles]
 
-    for idx, article in enumerate(articles):
-        # Generate a unique news_id for the article
-        news_id = article['news_id']
+    # Generate embeddings for all combined texts at once
+    embeddings = encode_texts(texts)
 
-        # Clean title and description
-        title = clean_text(article['title'])
-        description = clean_text(article['description'])
+    return embeddings, news_ids
 
-        # Combine title and description for embedding generation
-        text = title + " " + description
+def generate_news_id(article):
+    """
+    Generate a unique news ID based on title, description, URL, and published date.
+    """
+    unique_string = f"{article['title']} {article['description']} {article['url']} {article['publishedAt']}"
+    return hashlib.sha256(unique_string.encode('utf-8')).hexdigest()
 
-        # Generate embedding for the combined text
-        embedding = model.encode(text)
-        embeddings.append(embedding)
+def choose_index_type(vector_count):
+    """
+    Pick the FAISS index type for a corpus of the given size.
+    Exact search is fast enough for small corpora; larger ones switch to IVF, and to IVF-PQ once
+    the raw vectors no longer fit comfortably in memory.
+    """
+    if FAISS_INDEX_TYPE != 'auto':
+        return FAISS_INDEX_TYPE
+    if vector_count < FAISS_IVF_THRESHOLD:
+        return 'flat'
+    if vector_count < FAISS_IVF_PQ_THRESHOLD:
+        return 'ivf_flat'
+    return 'ivf_pq'
 
-        # Store the mapping of news_id to FAISS index
-        news_id_to_index[idx] = news_id
+def pinned_index_type():
+    """
+    Return the index type chosen for the last successful rebuild (rebuild_faiss_index --index-type), which index
+    updates keep instead of choosing one from the vector count; None if it was chosen automatically.
+    """
+    index_type = (PopulateJob.objects.filter(kind=PopulateJob.KIND_REBUILD, status=PopulateJob.STATUS_SUCCEEDED)
+                  .order_by('-finished_at', '-id').values_list('index_type', flat=True).first())
+    return index_type or None
 
-    # Optionally, save this mapping to disk for persistence
-    with open('news_id_to_index_mapping.json', 'w') as f:
-        json.dump(news_id_to_index, f)
+def trainable_index_type(index_type, vector_count):
+    """
+    Return the index type, or 'flat' if there are too few vectors to train an index of that type.
+    """
+    if vector_count < FAISS_MIN_TRAINING_VECTORS.get(index_type, 0):
+        return 'flat'
+    return index_type
 
-    return embeddings, news_id_to_index
+def get_index_type(faiss_index):
+    """
+    Return the index type ('flat', 'ivf_flat', 'ivf_pq' or 'hnsw') of an id-mapped FAISS index.
+    """
+    inner = faiss.downcast_index(faiss_index.index)
+    if isinstance(inner, faiss.IndexIVFPQ):
+        return 'ivf_pq'
+    if isinstance(inner, faiss.IndexIVF):
+        return 'ivf_flat'
+    if isinstance(inner, faiss.IndexHNSW):
+        return 'hnsw'
+    return 'flat'
 
-def generate_news_id(article):
+def index_factory_string(index_type, vector_count, dim):
     """
-    Generate a unique news ID based on title, description, URL, and published date.
+    Build the FAISS factory string of the given index type for a corpus of the given size.
     """
-    unique_string = f"{article['title']} {article['description']} {article['url']} {article['publishedAt']}"
-    return hashlib.sha256(unique_string.encode('utf-8')).hexdigest()
+    # Roughly 4 * sqrt(n) lists, keeping at least 39 training points per centroid
+    nlist = max(1, min(int(4 * np.sqrt(max(vector_count, 1))), vector_count // 39))
+    # Largest number of sub-quantizers (at most dim / 8) that divides the dimension
+    pq_m = next(m for m in range(max(1, dim // 8), 0, -1) if dim % m == 0)
+    return FAISS_INDEX_FACTORY_STRINGS[index_type].format(nlist=nlist, pq_m=pq_m)
+
+def create_faiss_index(dim, index_type='flat', training_vectors=None):
+    """
+    Create an empty FAISS index whose vectors are addressed by stable int64 ids (positions in the news_id mapping).
+    The index ranks by inner product; article vectors are L2-normalised at ingest, so scores are cosine similarities.
+
+    :param dim: The embedding dimension
+    :param index_type: 'flat', 'ivf_flat', 'ivf_pq' or 'hnsw'; a flat index is created when there are too few
+                       training vectors for the type
+    :param training_vectors: Vectors to sample the training set from (required by IVF/PQ indexes)
+    :return: The (trained) FAISS index object
+    """
+    vector_count = len(training_vectors) if training_vectors is not None else 0
+    if trainable_index_type(index_type, vector_count) != index_type:
+        logger.warning(f"Only {vector_count} vectors to train a {index_type} index, creating a flat index instead.")
+        index_type = 'flat'
+    factory_string = index_factory_string(index_type, vector_count, dim)
+
+    # Create a FAISS index for inner product similarity, wrapped so vectors can be added and removed by id
+    faiss_index = faiss.index_factory(dim, factory_string, faiss.METRIC_INNER_PRODUCT)
+
+    if not faiss_index.is_trained:
+        sample_size = min(vector_count, FAISS_TRAINING_SAMPLE_SIZE)
+        sample_rows = np.sort(np.random.default_rng(0).choice(vector_count, sample_size, replace=False))
+        faiss_index.train(np.asarray(training_vectors[sample_rows], dtype='float32'))
+        logger.info(f"Trained {factory_string} FAISS index on {sample_size} vectors.")
+
+    return faiss_index
+
+def load_index_for_update():
+    """
+    Load the published FAISS index and news_id mapping for an incremental update.
+    Indexes written by older versions (anything but an IndexIDMap2) address raw vectors by position, and their
+    mapping was rebuilt from the table on every populate without re-indexing, so positions no longer match the
+    vectors. Such an index is dropped together with its mapping; the update then re-embeds every article.
+    :return: The FAISS index (None if no usable index exists yet) and the NewsIdMapping
+    """
+    if not os.path.exists(FAISS_INDEX_PATH):
+        return None, load_news_id_mapping(legacy_path=None)
 
-def store_embeddings_in_faiss(embeddings):
+    faiss_index = faiss.read_index(FAISS_INDEX_PATH)
+    logger.info("Loaded existing FAISS index.")
+
+    if not isinstance(faiss_index, faiss.IndexIDMap2):
+        logger.warning(f"Dropping legacy FAISS index with {faiss_index.ntotal} vectors; all articles are re-embedded.")
+        return None, NewsIdMapping.from_news_ids([])
+
+    return faiss_index, load_news_id_mapping(legacy_path=None)
+
+def store_embeddings_in_faiss(faiss_index, embeddings, faiss_ids):
     """
     Store the embeddings in FAISS for fast similarity search.
-    If the index already exists, we load the existing one instead of creating a new one.
+    :param faiss_index: The id-mapped FAISS index to add the embeddings to
     :param embeddings: List of embeddings to be stored in FAISS
+    :param faiss_ids: The stable FAISS id of each embedding
     :return: The FAISS index object
     """
-    # Check if the FAISS index already exists
-    if os.path.exists(FAISS_INDEX_PATH):
-        # Load the existing FAISS index
-        faiss_index = faiss.read_index(FAISS_INDEX_PATH)
-        logger.info("Loaded existing FAISS index.")
-    else:
-        # Create a new FAISS index if none exists
-        embeddings_array = np.array(embeddings).astype('float32')
+    embeddings_array = np.array(embeddings).astype('float32')
+    faiss_index.add_with_ids(embeddings_array, np.asarray(faiss_ids, dtype='int64'))
+    return faiss_index
 
-        # Create a FAISS index for L2 (Euclidean) distance
-        faiss_index = faiss.IndexFlatL2(embeddings_array.shape[1])
+def sync_embedding_store(embedding_store, faiss_index, news_id_to_index):
+    """
+    Backfill the embedding store with vectors that only exist in the FAISS index (indexes built before the store).
+    The store is extended up to the highest id of the mapping and the index, as the index may hold ids the mapping
+    does not know. Rows of ids that are no longer indexed are filled with zeros so row i keeps matching FAISS id i.
+    """
+    if faiss_index is None:
+        return
+    live_ids = faiss.vector_to_array(faiss_index.id_map)
+    end = max(len(news_id_to_index), int(live_ids.max()) + 1 if len(live_ids) else 0)
+    missing = end - len(embedding_store)
+    if missing <= 0:
+        return
+
+    live_ids = set(live_ids.tolist())
+    vectors = np.zeros((missing, faiss_index.d), dtype='float32')
+    for row, faiss_id in enumerate(range(len(embedding_store), end)):
+        if faiss_id in live_ids:
+            vectors[row] = faiss_index.reconstruct(faiss_id)
+    embedding_store.append(vectors, len(embedding_store))
+    logger.info(f"Backfilled {missing} embeddings from the FAISS index into the embedding store.")
+
+def build_faiss_index_from_store(embedding_store, news_id_to_index, index_type=None):
+    """
+    Build a new FAISS index over the stored embeddings of all ids that still have a news_id in the mapping,
+    leaving out near-duplicates of other articles.
+    :param index_type: The index type to build; chosen from the vector count when omitted
+    :return: The new FAISS index object
+    """
+    live_ids = np.array([position for position in range(min(len(news_id_to_index), len(embedding_store)))
+                         if news_id_to_index.news_id_at(position) is not None], dtype='int64')
+    live_ids = np.setdiff1d(live_ids, duplicate_positions(news_id_to_index))
+    vectors = embedding_store.vectors_at(live_ids)
+    if not embedding_store.normalized:
+        vectors = normalize_rows(np.array(vectors, dtype='float32'))
 
-        # Add embeddings to the FAISS index
-        faiss_index.add(embeddings_array)
+    faiss_index = create_faiss_index(embedding_store.dim, index_type or choose_index_type(len(live_ids)), vectors)
+    if len(live_ids):
+        faiss_index.add_with_ids(vectors, live_ids)
+    return faiss_index
 
-        # Save the FAISS index to the file
-        faiss.write_index(faiss_index, FAISS_INDEX_PATH)
-        logger.info("Created and saved a new FAISS index.")
+def rebuild_faiss_index_from_store(index_type=None):
+    """
+    Rebuild the FAISS index from the embedding store without re-running SBERT.
+    Only ids that still have a news_id in the mapping and are not near-duplicates are added. Runs as a rebuild job
+    (see populateJobs), which holds the run lock: a rebuild publishing next to a populate could drop its new ids.
+    :param index_type: The index type to build; chosen from the vector count when omitted
+    :return: The new FAISS index object
+    """
+    news_id_to_index = load_news_id_mapping()
+    faiss_index = build_faiss_index_from_store(get_embedding_store(), news_id_to_index, index_type)
 
+    persist_index_and_mapping(faiss_index, news_id_to_index)
+    logger.info(f"Rebuilt FAISS index with {faiss_index.ntotal} embeddings from the embedding store.")
     return faiss_index
 
-def process_and_store_embeddings():
+def persist_index_and_mapping(faiss_index, news_id_to_index):
     """
-    Main function to fetch articles, clean them, generate embeddings, and store them in FAISS.
-    This function will load the existing FAISS index if it exists, otherwise, it will create a new one.
+    Publish the FAISS index and its news_id mapping together.
+    The mapping is written first: ids are never reused, so a process that still serves the previous index
+    can resolve all of its ids with the new mapping, and the index file stamp then triggers the swap.
     """
-    # Step 1: Fetch articles from PostgreSQL (NewsArticle table)
-    articles = NewsArticle.objects.all()  # Fetch all news articles
-    logger.info(f"Fetched {len(articles)} articles from PostgreSQL")
+    news_id_to_index.save()
+    publish_index(faiss_index, FAISS_INDEX_PATH)
+    get_index_service().reload()
 
-    # Step 2: Clean the data and generate embeddings
-    articles_data = [{
-        'title': article.title,
-        'description': article.description,
-        'url': article.url,
-        'publishedAt': article.published_at,
-        'news_id': article.news_id,
-    } for article in articles]
+def process_and_store_embeddings(news_ids=None, chunk_size=EMBEDDING_CHUNK_SIZE, timers=None):
+    """
+    Main function to bring the FAISS index in line with the NewsArticle table.
+    Only articles that are not in the index yet are cleaned and embedded; they are appended with new stable
+    ids, vectors of articles deleted from the database are removed, and index and mapping are persisted together.
 
-    embeddings, news_id_to_index = generate_embeddings_for_articles(articles_data)
-    logger.info(f"Generated embeddings for {len(embeddings)} articles")
+    New articles that are near-duplicates of an indexed article or of an earlier article of their chunk join its
+    cluster (see nearDuplicates): their embedding is stored and mapped like any other, for profile updates, but
+    only the cluster representative is added to the index, so search results hold one article per story.
 
-    # Step 3: Store embeddings in FAISS (or load existing FAISS index)
-    faiss_index = store_embeddings_in_faiss(embeddings)
-    logger.info(f"FAISS index is now ready with {len(embeddings)} embeddings.")
+    Articles are streamed from the database and processed in chunks of `chunk_size`: each chunk is cleaned, encoded
+    into a preallocated float32 buffer, appended to the embedding store and added to the index, so memory does not
+    grow with the number of articles beyond the index and the mapping themselves.
+
+    :param news_ids: Optional list of candidate news IDs (e.g. the articles just inserted). When omitted, the whole
+                     table is compared against the index, which also detects deleted articles.
+    :param chunk_size: Number of articles read and embedded at a time
+    :param timers: Optional StageTimers collecting the time spent per stage (read, clean, embed, dedup, store, index)
+    :return: The FAISS index object and the NewsIdMapping
+    """
+    timers = timers or StageTimers()
+
+    # Step 1: Load the current index and mapping, and find out which news IDs are already indexed
+    faiss_index, news_id_to_index = load_index_for_update()
+    if faiss_index is None:
+        # Without a usable index every article of the table has to be embedded, not only the candidates
+        news_ids = None
+    embedding_store = get_embedding_store()
+    # Rows beyond the mapping were appended by an update that never published them
+    embedding_store.truncate(len(news_id_to_index))
+    sync_embedding_store(embedding_store, faiss_index, news_id_to_index)
+    if len(embedding_store) > len(news_id_to_index):
+        # The index holds ids beyond the mapping (the files drifted apart); reserve them so ids are never reused
+        news_id_to_index = news_id_to_index.extended([None] * (len(embedding_store) - len(news_id_to_index)))
+    indexed = {}
+    orphaned_ids = []
+    if faiss_index is not None:
+        for faiss_id in faiss.vector_to_array(faiss_index.id_map):
+            news_id = news_id_to_index.news_id_at(int(faiss_id))
+            if news_id is None:
+                orphaned_ids.append(int(faiss_id))  # Vector without a news_id, left behind by older versions
+            else:
+                indexed[news_id] = int(faiss_id)
+
+    # New vectors go straight into the current index, unless it has to be rebuilt anyway
+    rebuild = faiss_index is None or faiss_index.metric_type != faiss.METRIC_INNER_PRODUCT
+
+    # Step 2: Stream the articles from PostgreSQL (NewsArticle table) and embed those without a vector, chunk by chunk
+    fields = ('id', 'news_id', 'title', 'description', 'published_at', 'cluster_id')
+    if news_ids is None:
+        articles = NewsArticle.objects.order_by().values_list(*fields)
+    else:
+        articles = NewsArticle.objects.filter(news_id__in=news_ids).order_by().values_list(*fields)
+    rows = articles.iterator(chunk_size=chunk_size)
+
+    seen = np.zeros(len(news_id_to_index), dtype=bool)  # Mapped positions whose article still exists
+    buffer = None
+    first_id = next_id = len(news_id_to_index)
+    new_mappings = []
+    new_news_ids = []
+    cluster_updates = []  # (article primary key, cluster id) of the new articles
+    duplicate_count = 0
+    # Index searched for near-duplicates: the current index, or the representatives of this run when it is rebuilt
+    dedup_index = None if rebuild else faiss_index
+
+    def news_id_at(faiss_id):
+        if faiss_id < first_id:
+            return news_id_to_index.news_id_at(faiss_id)
+        return new_news_ids[faiss_id - first_id] if faiss_id < next_id else None
+    while True:
+        with timers.stage('read'):
+            chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        timers.count('read', len(chunk))
+
+        new_articles = []
+        for article in chunk:
+            news_id, cluster_id = article[1], article[5]
+            position = indexed.get(news_id)
+            if position is None and cluster_id is not None:
+                # Near-duplicates are mapped but not indexed
+                position = news_id_to_index.position_of(news_id)
+                if position == cluster_id:
+                    position = None  # A representative that is missing from the index
+            if position is None:
+                new_articles.append(article)
+            else:
+                seen[position] = True
+        if not new_articles:
+            continue
+
+        with timers.stage('clean'):
+            # Clean title and description, and combine them for embedding generation
+            texts = clean_texts([article[2] for article in new_articles], [article[3] for article in new_articles])
+        timers.count('clean', len(texts))
+
+        with timers.stage('embed'):
+            if buffer is None:
+                buffer = np.empty((chunk_size, get_model().get_sentence_embedding_dimension()), dtype='float32')
+            embeddings = encode_texts(texts, out=buffer)
+        timers.count('embed', len(embeddings))
+
+        positions = np.arange(next_id, next_id + len(embeddings), dtype='int64')
+        with timers.stage('dedup'):
+            if dedup_index is None:
+                dedup_index = create_faiss_index(embeddings.shape[1], 'flat')
+            cluster_ids = assign_clusters(embeddings, [article[4] for article in new_articles], positions,
+                                          dedup_index, news_id_at)
+            representatives = cluster_ids == positions
+            if rebuild:
+                dedup_index.add_with_ids(embeddings[representatives], positions[representatives])
+            cluster_updates += [(article[0], int(cluster_id)) for article, cluster_id in zip(new_articles, cluster_ids)]
+        timers.count('dedup', len(embeddings))
+        duplicate_count += int(len(positions) - representatives.sum())
+
+        with timers.stage('store'):
+            embedding_store.append(embeddings, next_id)
+            new_news_ids += [article[1] for article in new_articles]
+            new_mappings.append(NewsIdMapping.from_news_ids(new_news_ids[-len(new_articles):]))
+        timers.count('store', len(embeddings))
+
+        if not rebuild:
+            with timers.stage('index'):
+                store_embeddings_in_faiss(faiss_index, embeddings[representatives], positions[representatives])
+            timers.count('index', int(representatives.sum()))
+        next_id += len(embeddings)
+
+    logger.info(f"Embedded {next_id - first_id} new articles, {duplicate_count} of them near-duplicates")
+    if new_mappings:
+        news_id_to_index = NewsIdMapping.concatenated([news_id_to_index, *new_mappings])
+
+    # Step 3: Drop the vectors of articles that no longer exist (only detectable when scanning the whole table)
+    removed_ids = list(orphaned_ids)
+    if news_ids is None:
+        mapped = news_id_to_index.ids[:len(seen)] != b''
+        removed_ids += np.flatnonzero(mapped & ~seen).tolist()
+
+    if next_id == first_id and not removed_ids:
+        logger.info("FAISS index is already up to date.")
+        return faiss_index, news_id_to_index
+
+    promoted_ids = []
+    if removed_ids:
+        news_id_to_index = news_id_to_index.cleared(removed_ids)
+        # Clusters whose representative was removed are represented by another of their articles from now on
+        promotion_updates, promoted_ids = promote_cluster_members(removed_ids, news_id_to_index)
+        cluster_updates += promotion_updates
+        if not rebuild:
+            try:
+                faiss_index.remove_ids(np.array(removed_ids, dtype='int64'))
+            except RuntimeError:
+                # Some index types (e.g. HNSW) cannot remove vectors, rebuild them from the embedding store instead
+                rebuild = True
+        logger.info(f"Removed {len(removed_ids)} deleted articles from the FAISS index")
+    if promoted_ids and not rebuild:
+        promoted_ids = np.array(promoted_ids, dtype='int64')
+        vectors = np.array(embedding_store.vectors_at(promoted_ids), dtype='float32')
+        store_embeddings_in_faiss(faiss_index, vectors if embedding_store.normalized else normalize_rows(vectors),
+                                  promoted_ids)
+
+    # Cluster ids are stored before a rebuild, which leaves the near-duplicates they designate out of the index
+    save_clusters(cluster_updates)
+
+    # Step 4: Rebuild when the corpus outgrew the current index type (or there is no usable index yet); a type
+    # pinned by an explicit rebuild is kept
+    index_type = pinned_index_type()
+    if not rebuild:
+        target_type = trainable_index_type(index_type or choose_index_type(faiss_index.ntotal), faiss_index.ntotal)
+        rebuild = get_index_type(faiss_index) != target_type
+    if rebuild:
+        with timers.stage('index'):
+            faiss_index = build_faiss_index_from_store(embedding_store, news_id_to_index, index_type)
+        logger.info(f"Rebuilt the FAISS index as {get_index_type(faiss_index)} from the embedding store")
+
+    # Step 5: Persist index and mapping together
+    persist_index_and_mapping(faiss_index, news_id_to_index)
+    logger.info(f"FAISS index is now ready with {faiss_index.ntotal} embeddings ({timers.report()}).")
 
     return faiss_index, news_id_to_index
 
 def load_faiss_index():
     """
-    Load the FAISS index from the file.
-    This function ensures that the FAISS index is loaded only when needed.
+    Return the resident FAISS index.
+    The index is loaded from the file once per process and reloaded only when a new version is published.
     """
-    try:
-        faiss_index = faiss.read_index(FAISS_INDEX_PATH)
-        logger.info(f"Loaded FAISS index from {FAISS_INDEX_PATH}.")
-        return faiss_index
-    except Exception as e:
-        logger.error(f"Error loading FAISS index from {FAISS_INDEX_PATH}: {str(e)}")
+    snapshot = get_index_service().get_snapshot()
+    if snapshot is None:
+        logger.error(f"Error loading FAISS index from {FAISS_INDEX_PATH}.")
         return None
+    return snapshot.index
 
 def fetch_embedding_from_faiss(news_id, news_id_to_index):
     """
-    Fetch the embedding of a specific news article from FAISS based on the news ID.
+    Fetch the embedding of a specific news article based on the news ID.
+    The vector is read zero-copy from the embedding store instead of reloading the FAISS index.
 
     :param news_id: The unique identifier for the news article
-    :param news_id_to_index: The mapping of news_id to the FAISS index
+    :param news_id_to_index: The NewsIdMapping of FAISS index to news_id
     :return: The embedding of the news article or None if not found
     """
-    # Ensure the news_id exists in the mapping
-    if news_id not in news_id_to_index:
+    # Get the index of the news article, ensuring the news_id exists in the mapping
+    index = news_id_to_index.position_of(news_id)
+    if index is None:
         logger.error(f"News article with ID {news_id} not found in FAISS index.")
         return None
 
-    # Get the index of the news article
-    index = news_id_to_index[news_id]
-
-    # Load the FAISS index (if not loaded already)
-    faiss_index = load_faiss_index()
-
-    if faiss_index is None:
-        logger.error(f"FAISS index not loaded properly. Could not fetch embedding for {news_id}.")
-        return None
-
-    # Retrieve the embedding for the article from FAISS
-    embedding = faiss_index.reconstruct(index)  # Fetch the embedding for the index
+    # Retrieve the embedding for the article from the embedding store
+    embedding = get_embedding_store().vector_at(index)
     if embedding is None:
-        logger.error(f"Failed to fetch embedding for news article {news_id} from FAISS.")
+        logger.error(f"Failed to fetch embedding for news article {news_id} from the embedding store.")
         return None
 
-    return embedding
\ No newline at end of file
+    return embedding
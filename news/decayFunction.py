@@ -1,143 +1,156 @@
-from django.http import Http404
-
-from .models import UserPreferences, NewsArticle
 import logging
+import math
 
-# Set up a logger
-logger = logging.getLogger(__name__)
+import numpy as np
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.utils import timezone
 
-from .models import UserPreferences, NewsArticle
-import logging
+from .categories import CATEGORIES, category_index
+from .models import UserPreferences
 
 # Set up a logger
 logger = logging.getLogger(__name__)
 
 
-def update_user_preferences(user_id, category, click_weight, decay_rate=0.02):
+# Seconds after which the weight gained from a click has decayed to half (default: one week)
+PREFERENCE_HALF_LIFE = getattr(settings, 'PREFERENCE_HALF_LIFE', 7 * 24 * 3600)
+
+# Weight a click adds to its category, relative to the total weight of 1 given by selecting preferences
+PREFERENCE_CLICK_BOOST = getattr(settings, 'PREFERENCE_CLICK_BOOST', 0.02)
+
+# Growth exponent of click boosts above which the stored weights are re-expressed at the current time
+PREFERENCE_REBASE_EXPONENT = getattr(settings, 'PREFERENCE_REBASE_EXPONENT', 30.0)
+
+# Decay constant of the preference weights, per second
+DECAY_CONSTANT = math.log(2) / PREFERENCE_HALF_LIFE
+
+
+def decay_exponent(since, until):
+    """
+    Return the decay exponent lambda * (until - since) between two datetimes.
     """
-    Update the user category preferences based on clicks and a decay rate.
+    return DECAY_CONSTANT * (until - since).total_seconds()
 
-    :param user_id: The unique identifier for the user
-    :param category: The category of news that the user interacted with
-    :param click_weight: The weight of the click (typically 1 if clicked)
-    :param decay_rate: The rate at which past weights decay (default 0.02)
+
+def normalize_weights(weights):
     """
-    # Step 1: Fetch current weight of the clicked category for the user
-    try:
-        user_pref = UserPreferences.objects.get(user_id=user_id)
-        current_weight = getattr(user_pref, f"{category}_weight", 0)  # Default to 0 if category doesn't exist
-    except UserPreferences.DoesNotExist:
-        # If no existing preferences, initialize with a default weight (0 or 1/7 per category)
-        user_pref = UserPreferences(user_id=user_id)
-        user_pref.save()
-        current_weight = 0  # Default to 0 (neutral preference)
+    Return weights as float64 shares of their total (rows of a 2D array are normalized separately).
+    """
+    weights = np.asarray(weights, dtype='float64')
+    totals = weights.sum(axis=-1, keepdims=True)
+    return np.divide(weights, totals, out=np.zeros_like(weights), where=totals > 0)
 
-    # Step 2: Update the weight of the clicked category
-    new_weight = current_weight + (click_weight - current_weight) * decay_rate
 
-    # Step 3: Update the weight field dynamically based on the category
-    setattr(user_pref, f"{category}_weight", new_weight)
-    user_pref.save()
+def effective_weights(user_pref):
+    """
+    Return the category weights of a user as shares of their total weight, without writing.
 
-    # Step 4: Decay other category weights
-    decay_other_categories(user_id, category, decay_rate)
+    Stored weights are expressed at `user_pref.last_updated` and decay as exp(-lambda * elapsed), so an idle
+    user never needs a background write. Every category decays by the same factor, so the shares only change
+    when the user clicks and the factor is not applied here: after long idle periods it underflows float32
+    weights to zero. Absolute weights only matter when clicks are added (see `apply_clicks`).
 
-    # Step 5: Normalize all weights to ensure the sum equals 1
-    normalize_and_save_preferences(user_id)
+    :param user_pref: The UserPreferences of the user
+    :return: A dictionary of category names and their share of the user's weight
+    """
+    return dict(zip(CATEGORIES, normalize_weights(user_pref.get_weights()).tolist()))
 
-    # Log the update
-    logger.info(f"Updated user {user_id}'s preference for category {category}: {new_weight}")
 
+def existing_user_ids(user_ids):
+    """
+    Return the given user ids that belong to existing users, as strings (ids that are not integers are dropped).
+    """
+    numeric_ids = {int(user_id) for user_id in map(str, user_ids) if user_id.isascii() and user_id.isdigit()}
+    if not numeric_ids:
+        return set()
+    return {str(pk) for pk in get_user_model().objects.filter(pk__in=numeric_ids).values_list('pk', flat=True)}
 
-def decay_other_categories(user_id, clicked_category, decay_rate):
+
+def load_preference_matrix(user_ids):
     """
-    Apply decay to all other categories for the given user.
+    Load the category weights of many users with a single query, as shares of each user's total weight
+    (see `effective_weights`).
 
-    :param user_id: The user whose category weights are being decayed
-    :param clicked_category: The category that was clicked (will not be decayed)
-    :param decay_rate: The rate at which non-clicked categories decay
+    :param user_ids: The unique identifiers of the users
+    :return: Tuple of the user_ids found and a contiguous float32 matrix with one row of weights per user
     """
-    try:
-        user_pref = UserPreferences.objects.get(user_id=user_id)
-    except UserPreferences.DoesNotExist:
-        logger.error(f"UserPreferences not found for user {user_id}. Skipping decay.")
-        return
+    numeric_ids = [user_id for user_id in map(str, user_ids) if user_id.isascii() and user_id.isdigit()]
+    preferences = UserPreferences.objects.filter(user_id__in=numeric_ids).order_by('id')
+    rows = {
+        str(user_id): bytes(weights) for user_id, weights in preferences.values_list('user_id', 'weights')
+    }
 
-    # List of all possible categories
-    categories = [
-        'business', 'sports', 'technology', 'entertainment', 'health', 'general', 'science'
-    ]
+    # Pad or cut each packed vector to the current number of categories and view all of them as one matrix
+    row_bytes = len(CATEGORIES) * 4
+    buffer = b''.join(weights[:row_bytes].ljust(row_bytes, b'\0') for weights in rows.values())
+    matrix = np.frombuffer(buffer, dtype='float32').reshape(len(rows), len(CATEGORIES))
+    return list(rows), np.ascontiguousarray(normalize_weights(matrix), dtype='float32')
 
-    # Apply decay to each category except the clicked category
-    for category in categories:
-        if category != clicked_category:
-            current_weight = getattr(user_pref, f"{category}_weight", 0.0)  # Default 0 if not set
-            new_weight = current_weight * (1 - decay_rate)  # Apply decay
-            setattr(user_pref, f"{category}_weight", new_weight)
-            user_pref.save()
 
-            # Log the decay
-            logger.info(f"Decayed weight for user {user_id} in category {category}: {new_weight}")
+def rebase_weights(user_pref, now):
+    """
+    Re-express the stored weights of a user at `now`, so click boosts stay small numbers.
+    """
+    factor = math.exp(-decay_exponent(user_pref.last_updated, now))
+    user_pref.set_weights(user_pref.get_weights() * factor)
+    user_pref.last_updated = now
 
 
-def normalize_and_save_preferences(user_id):
+def click_boost(last_updated, clicked_at, click_weight=1.0):
     """
-    Normalize the user preferences so that the sum of all weights equals 1.
+    Return the amount a click adds to the stored weight of its category (forward decay).
 
-    :param user_id: The unique identifier for the user
-    """
-    try:
-        user_pref = UserPreferences.objects.get(user_id=user_id)
+    Instead of decaying every other category, the click is boosted by exp(lambda * (clicked_at - last_updated)),
+    which has the same effect on the weights decayed to any later time while updating a single component.
 
-        # Calculate total weight (sum of all category weights)
-        total_weight = sum([getattr(user_pref, f"{category}_weight") for category in
-                            ['business', 'sports', 'technology', 'entertainment', 'health', 'general', 'science']])
+    :param last_updated: The time the stored weights are expressed at
+    :param clicked_at: The time of the click
+    :param click_weight: The weight of the click (typically 1 if clicked)
+    """
+    return click_weight * PREFERENCE_CLICK_BOOST * math.exp(decay_exponent(last_updated, clicked_at))
 
-        if total_weight == 0:
-            logger.error(f"User {user_id} has invalid preferences (sum of weights is 0).")
-            raise ValueError("Invalid user preferences. The sum of weights must be greater than 0.")
 
-        # Normalize each weight by dividing by the total weight
-        for category in ['business', 'sports', 'technology', 'entertainment', 'health', 'general', 'science']:
-            current_weight = getattr(user_pref, f"{category}_weight")
-            setattr(user_pref, f"{category}_weight", current_weight / total_weight)
+def apply_clicks(user_pref, clicks, now=None, click_weight=1.0):
+    """
+    Add a sequence of clicks to the stored weights of a user, rebasing the weights first if needed.
 
-        user_pref.save()
-        logger.info(f"Normalized user {user_id}'s preferences.")
+    :param user_pref: The UserPreferences of the user, updated in place
+    :param clicks: List of (category, clicked_at) tuples; the categories must be known
+    :param now: The current time (default: now)
+    :param click_weight: The weight of each click (typically 1 if clicked)
+    """
+    now = now or timezone.now()
+    if decay_exponent(user_pref.last_updated, now) > PREFERENCE_REBASE_EXPONENT:
+        rebase_weights(user_pref, now)
+    weights = user_pref.get_weights().astype('float64')
+    for category, clicked_at in clicks:
+        weights[category_index(category)] += click_boost(user_pref.last_updated, clicked_at, click_weight)
+    user_pref.set_weights(weights)
 
-    except UserPreferences.DoesNotExist:
-        logger.error(f"UserPreferences not found for user {user_id}.")
-        raise Http404({"error": "User preferences not found. Please select your preferences."})
 
-from .models import NewsArticle
-from django.http import Http404
-import logging
+def fold_clicks_into_profile(current, click_count, article_embeddings, decay_rate):
+    """
+    Fold the embeddings of clicked articles into a profile vector in closed form.
 
-# Set up logging
-logger = logging.getLogger(__name__)
+    The profile is the bias-corrected exponentially decayed mean of the clicked embeddings: the undecayed
+    sum (1 - (1 - r)^n) * profile decays by (1 - r)^k and gains r * sum_j (1 - r)^(k - j) * x_j for k new clicks.
 
-def handle_user_click(user_id, news_id):
-    """
-    Handle the click of a news article, updating the user's preferences based on the clicked category.
-
-    :param user_id: The unique identifier for the user
-    :param news_id: The unique identifier for the clicked news article
-    :raises Http404: If the news article is not found
-    """
-    # Step 1: Fetch the clicked news article to get its category
-    try:
-        article = NewsArticle.objects.get(news_id=news_id)
-        category = article.category
-    except NewsArticle.DoesNotExist:
-        # Log the error and raise Http404 if the article does not exist
-        logger.error(f"News article with ID {news_id} does not exist.")
-        raise Http404(f"News article with ID {news_id} does not exist.")
-
-    # Step 2: Update user preferences based on the category clicked
-    try:
-        update_user_preferences(user_id, category, click_weight=1.0)  # Assuming click_weight is 1 for a click
-        logger.info(f"User {user_id} preferences updated for category {category}.")
-    except Exception as e:
-        # Log and handle any errors that occur during preference update
-        logger.error(f"Error updating preferences for user {user_id} in category {category}: {str(e)}")
-        raise  # Re-raise the exception for further handling (or return a response if needed)
\ No newline at end of file
+    :param current: The current profile vector, or None for a new profile
+    :param click_count: The number of clicks folded into `current`
+    :param article_embeddings: 2D array of the clicked article embeddings, oldest click first
+    :param decay_rate: The rate at which past clicks decay
+    :return: Tuple of the new profile vector and the new click count
+    """
+    article_embeddings = np.asarray(article_embeddings, dtype='float64')
+    if current is None or current.shape != article_embeddings.shape[1:]:
+        # New profile, or the embedding model changed: start the profile over
+        current = np.zeros(article_embeddings.shape[1], dtype='float64')
+        click_count = 0
+
+    keep = 1 - decay_rate
+    k = len(article_embeddings)
+    weights = decay_rate * keep ** np.arange(k - 1, -1, -1, dtype='float64')
+    total = current * (1 - keep ** click_count) * keep ** k + weights @ article_embeddings
+    click_count += k
+    return (total / (1 - keep ** click_count)).astype('float32'), click_count
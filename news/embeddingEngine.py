@@ -0,0 +1,165 @@
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from django.conf import settings
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# SBERT model used for article embeddings
+EMBEDDING_MODEL_NAME = getattr(settings, 'EMBEDDING_MODEL_NAME', 'all-MiniLM-L6-v2')
+
+# Number of texts encoded per forward pass
+EMBEDDING_BATCH_SIZE = getattr(settings, 'EMBEDDING_BATCH_SIZE', 64)
+
+# Number of texts above which encoding is spread over a multi-process CPU pool (large backfills)
+EMBEDDING_POOL_THRESHOLD = getattr(settings, 'EMBEDDING_POOL_THRESHOLD', 20000)
+
+# Number of worker processes of the CPU pool (defaults to the number of CPUs)
+EMBEDDING_POOL_PROCESSES = getattr(settings, 'EMBEDDING_POOL_PROCESSES', None)
+
+# Maximum number of vectors kept in the content-hash cache
+EMBEDDING_CACHE_SIZE = getattr(settings, 'EMBEDDING_CACHE_SIZE', 100000)
+
+_model = None
+_model_lock = threading.Lock()
+
+
+def get_model():
+    """
+    Return the SBERT model, loading it once per process.
+    """
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                from sentence_transformers import SentenceTransformer
+                _model = SentenceTransformer(EMBEDDING_MODEL_NAME)
+                logger.info(f"Loaded SBERT model {EMBEDDING_MODEL_NAME}.")
+    return _model
+
+
+def normalize_rows(vectors):
+    """
+    L2-normalise the rows of a float32 matrix in place, so inner products are cosine similarities.
+    Zero rows are left unchanged.
+    """
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    np.divide(vectors, norms, out=vectors, where=norms > 0)
+    return vectors
+
+
+def content_hash(text):
+    """
+    Return the cache key of a cleaned text.
+    """
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).digest()
+
+
+class EmbeddingCache:
+    """
+    Bounded LRU cache of embeddings keyed by the content hash of the text they were computed from.
+    """
+
+    def __init__(self, max_entries=EMBEDDING_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is not None:
+                self._entries.move_to_end(key)
+            return vector
+
+    def put(self, key, vector):
+        with self._lock:
+            self._entries[key] = vector
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+embedding_cache = EmbeddingCache()
+
+
+def _encode_uncached(texts, batch_size, use_pool):
+    """
+    Encode texts with the SBERT model.
+    Texts are sorted by length and encoded in batches of similar length to minimise padding;
+    the result rows are in the order of the input texts.
+    """
+    model = get_model()
+    order = np.argsort([len(text) for text in texts], kind='stable')
+    sorted_texts = [texts[i] for i in order]
+
+    if use_pool:
+        processes = EMBEDDING_POOL_PROCESSES or os.cpu_count() or 1
+        pool = model.start_multi_process_pool(['cpu'] * processes)
+        try:
+            sorted_embeddings = model.encode_multi_process(sorted_texts, pool, batch_size=batch_size)
+        finally:
+            model.stop_multi_process_pool(pool)
+    else:
+        sorted_embeddings = np.empty((len(texts), model.get_sentence_embedding_dimension()), dtype='float32')
+        for start in range(0, len(sorted_texts), batch_size):
+            batch = sorted_texts[start:start + batch_size]
+            sorted_embeddings[start:start + len(batch)] = model.encode(batch, batch_size=batch_size,
+                                                                      convert_to_numpy=True)
+
+    embeddings = np.empty_like(sorted_embeddings, dtype='float32')
+    embeddings[order] = sorted_embeddings
+    return normalize_rows(embeddings)
+
+
+def encode_texts(texts, batch_size=EMBEDDING_BATCH_SIZE, use_pool=None, cache=embedding_cache, out=None):
+    """
+    Encode cleaned texts into L2-normalised embeddings, re-using cached vectors for texts that were encoded before.
+
+    :param texts: List of cleaned texts
+    :param batch_size: Number of texts per forward pass
+    :param use_pool: Force (True) or disable (False) the multi-process pool; by default it is used for large inputs
+    :param cache: The EmbeddingCache to consult, or None to always encode
+    :param out: Optional preallocated float32 array of at least len(texts) rows to write the embeddings to
+    :return: float32 array of shape (len(texts), dim) (a view of `out` when given)
+    """
+    keys = [content_hash(text) for text in texts]
+    vectors = [cache.get(key) for key in keys] if cache is not None else [None] * len(texts)
+
+    # Encode each distinct uncached text once
+    missing = {}
+    for key, text, vector in zip(keys, texts, vectors):
+        if vector is None and key not in missing:
+            missing[key] = text
+
+    if missing:
+        if use_pool is None:
+            use_pool = len(missing) >= EMBEDDING_POOL_THRESHOLD
+        encoded = _encode_uncached(list(missing.values()), batch_size, use_pool)
+        encoded_by_key = dict(zip(missing.keys(), encoded))
+        if cache is not None:
+            for key, vector in encoded_by_key.items():
+                cache.put(key, vector)
+        vectors = [vector if vector is not None else encoded_by_key[key] for key, vector in zip(keys, vectors)]
+        logger.info(f"Encoded {len(missing)} texts, {len(texts) - len(missing)} served from the embedding cache.")
+
+    if out is not None:
+        out = out[:len(texts)]
+        for row, vector in enumerate(vectors):
+            out[row] = vector
+        return out
+    if not vectors:
+        return np.empty((0, get_model().get_sentence_embedding_dimension()), dtype='float32')
+    return np.vstack(vectors).astype('float32', copy=False)
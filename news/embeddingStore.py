@@ -0,0 +1,175 @@
+import json
+import logging
+import os
+import threading
+
+import numpy as np
+from django.conf import settings
+
+from .embeddingEngine import EMBEDDING_MODEL_NAME
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Path to the raw embedding matrix and its manifest
+EMBEDDING_STORE_PATH = getattr(settings, 'EMBEDDING_STORE_PATH', 'news_embeddings.bin')
+EMBEDDING_MANIFEST_PATH = getattr(settings, 'EMBEDDING_MANIFEST_PATH', 'news_embeddings.json')
+
+# Element type of the stored vectors ('float32' or 'float16')
+EMBEDDING_STORE_DTYPE = getattr(settings, 'EMBEDDING_STORE_DTYPE', 'float32')
+
+EMBEDDING_STORE_FORMAT_VERSION = 1
+
+
+class EmbeddingStore:
+    """
+    Append-only matrix of article embeddings, the source of truth for vectors.
+
+    Row i holds the embedding of FAISS id i, so rows are addressed by news_id through the NewsIdMapping.
+    Vectors are appended to the data file first and become visible when the manifest (model, dimension,
+    dtype, normalisation and row count) is replaced, so readers never see a partially written row.
+    Reads are served zero-copy from a memory map of the data file. The data file only ever grows: other
+    processes may still map a larger version of it, and the row count of the manifest, not the file size,
+    says how many rows are valid.
+    """
+
+    def __init__(self, path=EMBEDDING_STORE_PATH, manifest_path=EMBEDDING_MANIFEST_PATH):
+        self.path = path
+        self.manifest_path = manifest_path
+        self.manifest = self._read_manifest()
+        self._matrix = None
+
+    def _read_manifest(self):
+        if not os.path.exists(self.manifest_path):
+            return None
+        with open(self.manifest_path, 'r') as f:
+            manifest = json.load(f)
+        if manifest.get('format_version') != EMBEDDING_STORE_FORMAT_VERSION:
+            raise ValueError(f"Unsupported embedding store manifest {self.manifest_path}.")
+        return manifest
+
+    def _write_manifest(self, manifest):
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, self.manifest_path)
+        self.manifest = manifest
+        self._matrix = None
+
+    def __len__(self):
+        return self.manifest['count'] if self.manifest else 0
+
+    @property
+    def dim(self):
+        return self.manifest['dim'] if self.manifest else None
+
+    @property
+    def model_name(self):
+        return self.manifest['model'] if self.manifest else None
+
+    @property
+    def normalized(self):
+        """
+        Whether all stored vectors are L2-normalised (stores written before normalisation at ingest are not).
+        """
+        return self.manifest.get('normalized', False) if self.manifest else True
+
+    def matrix(self):
+        """
+        Return the whole (count, dim) matrix as a read-only memory map.
+        """
+        if self._matrix is None:
+            if not len(self):
+                return np.empty((0, self.dim or 0), dtype=EMBEDDING_STORE_DTYPE)
+            self._matrix = np.memmap(self.path, dtype=self.manifest['dtype'], mode='r',
+                                     shape=(self.manifest['count'], self.manifest['dim']))
+        return self._matrix
+
+    def vector_at(self, position):
+        """
+        Return the embedding of the given FAISS id as a zero-copy view, or None if it is not stored.
+        """
+        if position is None or position < 0 or position >= len(self):
+            return None
+        return self.matrix()[position]
+
+    def vectors_at(self, positions):
+        """
+        Return the embeddings of the given FAISS ids as a float32 array (one row per id).
+        """
+        vectors = self.matrix()[np.asarray(positions, dtype='int64')]
+        return vectors.astype('float32', copy=False)
+
+    def get(self, news_id, news_id_to_index):
+        """
+        Return the embedding of a news article, or None if it is not stored.
+
+        :param news_id: The unique identifier for the news article
+        :param news_id_to_index: The NewsIdMapping of FAISS index to news_id
+        """
+        return self.vector_at(news_id_to_index.position_of(news_id))
+
+    def append(self, vectors, first_position, model_name=EMBEDDING_MODEL_NAME):
+        """
+        Append embeddings for the FAISS ids first_position, first_position + 1, ...
+
+        :param vectors: 2D array of L2-normalised embeddings
+        :param first_position: The FAISS id of the first row; must equal the current row count
+        :param model_name: The model the vectors were computed with
+        """
+        vectors = np.asarray(vectors)
+        if first_position != len(self):
+            raise ValueError(f"Embedding store has {len(self)} rows, cannot append at position {first_position}.")
+
+        manifest = self.manifest or {
+            'format_version': EMBEDDING_STORE_FORMAT_VERSION,
+            'model': model_name,
+            'dim': int(vectors.shape[1]),
+            'dtype': EMBEDDING_STORE_DTYPE,
+            'normalized': True,
+            'count': 0,
+        }
+        if manifest['model'] != model_name or manifest['dim'] != vectors.shape[1]:
+            raise ValueError(f"Embedding store holds {manifest['model']} vectors of dimension {manifest['dim']}, "
+                             f"got {model_name} vectors of dimension {vectors.shape[1]}.")
+
+        with open(self.path, 'r+b' if os.path.exists(self.path) else 'wb') as f:
+            # Overwrite any rows left behind by an append that never reached the manifest; the file is never
+            # shrunk, as reading a truncated page through a memory map of another process would crash it
+            row_bytes = manifest['dim'] * np.dtype(manifest['dtype']).itemsize
+            f.seek(manifest['count'] * row_bytes)
+            f.write(np.ascontiguousarray(vectors, dtype=manifest['dtype']).tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+
+        self._write_manifest(dict(manifest, count=manifest['count'] + len(vectors)))
+        logger.info(f"Appended {len(vectors)} embeddings to the embedding store ({len(self)} rows).")
+
+    def truncate(self, count):
+        """
+        Drop the rows from position `count` on, e.g. rows appended by an update that stopped before publishing
+        its news_id mapping. Only the manifest changes; the next append overwrites the dropped rows in place.
+        """
+        if count < len(self):
+            dropped = len(self) - count
+            self._write_manifest(dict(self.manifest, count=count))
+            logger.info(f"Dropped {dropped} unpublished embeddings from the embedding store ({len(self)} rows).")
+
+
+_embedding_store = None
+_embedding_store_lock = threading.Lock()
+
+
+def get_embedding_store():
+    """
+    Return the process-wide EmbeddingStore, re-opening it when another process appended to it.
+    """
+    global _embedding_store
+    with _embedding_store_lock:
+        try:
+            stamp = os.stat(EMBEDDING_MANIFEST_PATH).st_mtime_ns
+        except FileNotFoundError:
+            stamp = None
+        if _embedding_store is None or _embedding_store[0] != stamp:
+            _embedding_store = (stamp, EmbeddingStore())
+        return _embedding_store[1]
@@ -0,0 +1,189 @@
+import logging
+import os
+import threading
+import time
+
+import faiss
+from django.conf import settings
+
+from .newsIdMapping import LEGACY_MAPPING_PATH, NEWS_ID_MAPPING_PATH, load_news_id_mapping
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Path to the stored FAISS index file
+FAISS_INDEX_PATH = getattr(settings, 'FAISS_INDEX_PATH', 'news_faiss.index')
+
+# Minimum number of seconds between two checks of the index file for a newly published version
+FAISS_INDEX_CHECK_INTERVAL = getattr(settings, 'FAISS_INDEX_CHECK_INTERVAL', 5.0)
+
+# Query-time accuracy/speed trade-offs: inverted lists probed by IVF indexes and search depth of HNSW indexes
+FAISS_NPROBE = getattr(settings, 'FAISS_NPROBE', 16)
+FAISS_EF_SEARCH = getattr(settings, 'FAISS_EF_SEARCH', 64)
+
+
+def apply_search_parameters(faiss_index, nprobe=FAISS_NPROBE, ef_search=FAISS_EF_SEARCH):
+    """
+    Set the query-time parameters of approximate indexes (no-op for exact Flat indexes).
+    """
+    ivf_index = faiss.try_extract_index_ivf(faiss_index)
+    if ivf_index is not None:
+        ivf_index.nprobe = min(nprobe, ivf_index.nlist)
+
+    inner = faiss.downcast_index(faiss_index.index) if hasattr(faiss_index, 'index') else faiss_index
+    if isinstance(inner, faiss.IndexHNSW):
+        inner.hnsw.efSearch = ef_search
+    return faiss_index
+
+
+class IndexSnapshot:
+    """
+    An immutable view of one published version of the FAISS index and its news_id mapping.
+    Searches hold on to the snapshot they started with, so swapping in a new version never affects them.
+    """
+    __slots__ = ('index', 'mapping', 'version')
+
+    def __init__(self, index, mapping, version):
+        self.index = index
+        self.mapping = mapping
+        self.version = version
+
+
+class FaissIndexService:
+    """
+    Process-wide holder for the FAISS index and its news_id mapping.
+
+    The index is loaded once (memory-mapped where the index type allows it) and served from memory.
+    The index file is watched by its (mtime, size, inode) stamp; when `publish_index` replaces it,
+    the next search after the check interval loads the new version and swaps it in atomically.
+    """
+
+    def __init__(self, index_path=FAISS_INDEX_PATH, mapping_path=NEWS_ID_MAPPING_PATH,
+                 legacy_mapping_path=LEGACY_MAPPING_PATH, check_interval=FAISS_INDEX_CHECK_INTERVAL):
+        self.index_path = index_path
+        self.mapping_path = mapping_path
+        self.legacy_mapping_path = legacy_mapping_path
+        self.check_interval = check_interval
+        self._snapshot = None
+        self._last_check = 0.0
+        self._reload_lock = threading.Lock()  # Only serialises reloads, never searches
+
+    def _file_version(self):
+        """
+        Return the version stamp of the index file on disk, or None if the file does not exist.
+        """
+        try:
+            stat = os.stat(self.index_path)
+        except FileNotFoundError:
+            return None
+        return f"{stat.st_mtime_ns}-{stat.st_size}-{stat.st_ino}"
+
+    def _read_index(self):
+        """
+        Read the index from disk, memory-mapping it when the index type supports it.
+        """
+        try:
+            return faiss.read_index(self.index_path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+        except RuntimeError:
+            # Not every index type can be memory-mapped, fall back to a regular load
+            return faiss.read_index(self.index_path)
+
+    def _refresh(self, blocking):
+        """
+        Load the index file if its version stamp changed since the current snapshot was loaded.
+
+        :param blocking: Wait for a reload running in another thread instead of serving the current snapshot
+        :return: The current snapshot (None if no index has been published yet)
+        """
+        if not self._reload_lock.acquire(blocking=blocking):
+            # Another thread is already loading the new version, keep serving the current one
+            return self._snapshot
+
+        try:
+            self._last_check = time.monotonic()
+            version = self._file_version()
+            current = self._snapshot
+
+            if version is None:
+                if current is None:
+                    logger.error(f"FAISS index file {self.index_path} not found.")
+                return current
+
+            if current is not None and current.version == version:
+                return current
+
+            index = apply_search_parameters(self._read_index())
+            mapping = load_news_id_mapping(self.mapping_path, self.legacy_mapping_path)
+            self._snapshot = IndexSnapshot(index, mapping, version)
+            logger.info(f"Loaded FAISS index version {version} with {index.ntotal} vectors from {self.index_path}.")
+            return self._snapshot
+
+        except Exception as e:
+            logger.error(f"Error loading FAISS index from {self.index_path}: {str(e)}")
+            return self._snapshot
+
+        finally:
+            self._reload_lock.release()
+
+    def get_snapshot(self):
+        """
+        Return the snapshot searches should use, checking for a newer published version at most once per interval.
+
+        :return: The current IndexSnapshot, or None if no index is available
+        """
+        snapshot = self._snapshot
+        if snapshot is None:
+            return self._refresh(blocking=True)
+
+        if time.monotonic() - self._last_check >= self.check_interval:
+            return self._refresh(blocking=False)
+
+        return snapshot
+
+    def reload(self):
+        """
+        Check the index file immediately, e.g. right after this process published a new version.
+        """
+        return self._refresh(blocking=True)
+
+    def search(self, queries, top_n):
+        """
+        Search the resident index.
+
+        :param queries: 2D float32 array of query vectors
+        :param top_n: The number of neighbours to return per query
+        :return: The (distances, indices) arrays returned by FAISS
+        """
+        snapshot = self.get_snapshot()
+        if snapshot is None:
+            raise RuntimeError(f"FAISS index {self.index_path} is not available.")
+        return snapshot.index.search(queries, top_n)
+
+
+def publish_index(faiss_index, index_path=FAISS_INDEX_PATH):
+    """
+    Write the FAISS index to disk atomically.
+    The index is written to a temporary file and renamed over the old one, so readers never see
+    a partially written file and memory-mapped old versions stay valid until they are released.
+    The news_id mapping must be saved before the index, since the index file stamp triggers the reload.
+    """
+    tmp_path = f"{index_path}.tmp"
+    faiss.write_index(faiss_index, tmp_path)
+    os.replace(tmp_path, index_path)
+    logger.info(f"Published FAISS index with {faiss_index.ntotal} vectors to {index_path}.")
+
+
+_index_service = None
+_index_service_lock = threading.Lock()
+
+
+def get_index_service():
+    """
+    Return the process-wide FaissIndexService, creating it on first use.
+    """
+    global _index_service
+    if _index_service is None:
+        with _index_service_lock:
+            if _index_service is None:
+                _index_service = FaissIndexService()
+    return _index_service
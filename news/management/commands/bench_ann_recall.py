@@ -0,0 +1,68 @@
+import time
+
+import faiss
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from news.dataConvertor import FAISS_INDEX_FACTORY_STRINGS, create_faiss_index
+from news.embeddingStore import get_embedding_store
+from news.indexService import apply_search_parameters
+
+
+class Command(BaseCommand):
+    help = "Measure recall@k and search latency of the approximate FAISS index types against the exact Flat baseline."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--vectors', type=int, default=100000, help="Number of synthetic vectors")
+        parser.add_argument('--dim', type=int, default=384, help="Dimension of the synthetic vectors")
+        parser.add_argument('--from-store', action='store_true', help="Benchmark on the embedding store instead")
+        parser.add_argument('--queries', type=int, default=200, help="Number of query vectors")
+        parser.add_argument('--top-n', type=int, default=21, help="k of recall@k")
+        parser.add_argument('--types', nargs='+', default=list(FAISS_INDEX_FACTORY_STRINGS),
+                            choices=list(FAISS_INDEX_FACTORY_STRINGS), help="Index types to benchmark")
+        parser.add_argument('--nprobe', type=int, nargs='+', default=[1, 8, 16, 64], help="nprobe values for IVF")
+        parser.add_argument('--ef-search', type=int, nargs='+', default=[16, 64, 256], help="efSearch values for HNSW")
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(0)
+        if options['from_store']:
+            vectors = np.asarray(get_embedding_store().matrix(), dtype='float32')
+        else:
+            vectors = rng.standard_normal((options['vectors'], options['dim']), dtype='float32')
+        queries = vectors[rng.choice(len(vectors), options['queries'], replace=False)]
+        queries = queries + rng.standard_normal(queries.shape, dtype='float32') * 0.1
+        faiss.normalize_L2(vectors)
+        faiss.normalize_L2(queries)
+        ids = np.arange(len(vectors), dtype='int64')
+        top_n = options['top_n']
+
+        # Ground truth from exact search
+        exact = faiss.IndexFlatIP(vectors.shape[1])
+        exact.add(vectors)
+        _, truth = exact.search(queries, top_n)
+
+        self.stdout.write(f"{'index':<10} {'parameter':<14} {'recall@' + str(top_n):>10} {'ms/query':>10} "
+                          f"{'build s':>8}")
+
+        for index_type in options['types']:
+            start = time.perf_counter()
+            faiss_index = create_faiss_index(vectors.shape[1], index_type, vectors)
+            faiss_index.add_with_ids(vectors, ids)
+            build_seconds = time.perf_counter() - start
+
+            if index_type in ('ivf_flat', 'ivf_pq'):
+                parameter_sets = [(f"nprobe={nprobe}", {'nprobe': nprobe}) for nprobe in options['nprobe']]
+            elif index_type == 'hnsw':
+                parameter_sets = [(f"efSearch={ef}", {'ef_search': ef}) for ef in options['ef_search']]
+            else:
+                parameter_sets = [("-", {})]
+
+            for label, parameters in parameter_sets:
+                apply_search_parameters(faiss_index, **parameters)
+                start = time.perf_counter()
+                _, found = faiss_index.search(queries, top_n)
+                latency_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+                recall = np.mean([len(set(row) & set(expected)) / top_n for row, expected in zip(found, truth)])
+                self.stdout.write(f"{index_type:<10} {label:<14} {recall:>10.3f} {latency_ms:>10.3f} "
+                                  f"{build_seconds:>8.1f}")
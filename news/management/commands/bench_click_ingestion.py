@@ -0,0 +1,86 @@
+import threading
+import time
+
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from news.categories import CATEGORIES
+from news.clickQueue import drain_pending_clicks, handle_click
+from news.models import NewsArticle, UserInteractions, UserPreferences, UserProfileVector
+
+
+class Command(BaseCommand):
+    help = ("Compare click throughput of the 'sync' click mode with the 'async' click queue "
+            "(request path and coalesced batch apply). Writes to the database; benchmark users are removed afterwards.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clicks', type=int, default=5000, help="Number of simulated clicks")
+        parser.add_argument('--users', type=int, default=200, help="Number of distinct users clicking")
+        parser.add_argument('--threads', type=int, default=4, help="Concurrent request threads")
+        parser.add_argument('--batch-size', type=int, default=2000, help="Clicks applied per batch by the worker")
+
+    def handle(self, *args, **options):
+        news_ids = list(NewsArticle.objects.values_list('news_id', flat=True)[:1000])
+        if not news_ids:
+            raise CommandError("No articles to click.")
+
+        # Zipf-like activity: a few users click much more often than the rest
+        rng = np.random.default_rng(0)
+        activity = 1.0 / np.arange(1, options['users'] + 1)
+        users = rng.choice(options['users'], options['clicks'], p=activity / activity.sum())
+        articles = rng.choice(len(news_ids), options['clicks'])
+
+        # Every benchmark user starts with preferences, so both paths update existing rows
+        User = get_user_model()
+        User.objects.bulk_create([
+            User(email=f"bench-click-{path}-{user}@example.com", full_name=f"Bench {path} {user}")
+            for path in ('sync', 'queue') for user in range(options['users'])
+        ])
+        bench_users = list(User.objects.filter(email__startswith='bench-click-').order_by('id'))
+        user_ids = {path: [str(user.pk) for user in bench_users if f"-{path}-" in user.email]
+                    for path in ('sync', 'queue')}
+        weights = np.eye(len(CATEGORIES), dtype='float32')[0].tobytes()
+        UserPreferences.objects.bulk_create([UserPreferences(user=user, weights=weights) for user in bench_users])
+
+        try:
+            clicks = [(user_ids['sync'][user], news_ids[article]) for user, article in zip(users, articles)]
+            elapsed = self.run_clicks(lambda user_id, news_id: handle_click(user_id, news_id, mode='sync'),
+                                      clicks, options['threads'])
+            self.report("synchronous", len(clicks), elapsed)
+
+            clicks = [(user_ids['queue'][user], news_ids[article]) for user, article in zip(users, articles)]
+            elapsed = self.run_clicks(lambda user_id, news_id: handle_click(user_id, news_id, mode='async'),
+                                      clicks, options['threads'])
+            self.report("queue request", len(clicks), elapsed)
+
+            start = time.perf_counter()
+            applied = drain_pending_clicks(options['batch_size'])
+            drain = time.perf_counter() - start
+            self.report("queue apply", applied, drain)
+            self.report("queue total", len(clicks), elapsed + drain)
+        finally:
+            all_user_ids = user_ids['sync'] + user_ids['queue']
+            UserInteractions.objects.filter(user_id__in=all_user_ids).delete()
+            UserProfileVector.objects.filter(user_id__in=all_user_ids).delete()
+            User.objects.filter(email__startswith='bench-click-').delete()
+
+    def run_clicks(self, handler, clicks, threads_count):
+        def worker(share):
+            try:
+                for user_id, news_id in share:
+                    handler(user_id, news_id)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(clicks[i::threads_count],)) for i in range(threads_count)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return time.perf_counter() - start
+
+    def report(self, label, clicks, elapsed):
+        self.stdout.write(f"{label:<14} {clicks:7d} clicks in {elapsed:8.3f} s   {clicks / elapsed:10.0f} clicks/s")
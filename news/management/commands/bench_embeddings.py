@@ -0,0 +1,50 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from news.dataConvertor import clean_text
+from news.embeddingEngine import EmbeddingCache, encode_texts, get_model
+
+WORDS = ('market', 'stocks', 'league', 'season', 'vaccine', 'study', 'launch', 'chip', 'movie', 'album',
+         'election', 'storm', 'startup', 'earnings', 'playoffs', 'research', 'galaxy', 'award', 'trial', 'record')
+
+
+class Command(BaseCommand):
+    help = "Compare SBERT encoding throughput (articles/sec) of the per-article loop against the batched engine on CPU."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--articles', type=int, default=2000, help="Number of synthetic articles")
+        parser.add_argument('--batch-size', type=int, default=64, help="Batch size of the engine")
+        parser.add_argument('--pool', action='store_true', help="Also measure the multi-process CPU pool")
+
+    def handle(self, *args, **options):
+        rng = random.Random(0)
+        texts = [
+            clean_text(" ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 60))))
+            for _ in range(options['articles'])
+        ]
+        model = get_model()
+        model.encode(texts[:8])  # Warm up
+
+        start = time.perf_counter()
+        for text in texts:
+            model.encode(text)
+        self.report("per-article loop", len(texts), time.perf_counter() - start)
+
+        cache = EmbeddingCache()
+        start = time.perf_counter()
+        encode_texts(texts, batch_size=options['batch_size'], use_pool=False, cache=cache)
+        self.report("batched engine", len(texts), time.perf_counter() - start)
+
+        start = time.perf_counter()
+        encode_texts(texts, batch_size=options['batch_size'], use_pool=False, cache=cache)
+        self.report("batched engine, cached", len(texts), time.perf_counter() - start)
+
+        if options['pool']:
+            start = time.perf_counter()
+            encode_texts(texts, batch_size=options['batch_size'], use_pool=True, cache=None)
+            self.report("multi-process pool", len(texts), time.perf_counter() - start)
+
+    def report(self, label, count, seconds):
+        self.stdout.write(f"{label:<24} {count / seconds:>10.1f} articles/sec ({seconds:.2f}s)")
@@ -0,0 +1,65 @@
+import os
+import tempfile
+import time
+
+import faiss
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from news.indexService import FaissIndexService, publish_index
+from news.newsIdMapping import NewsIdMapping
+
+
+class Command(BaseCommand):
+    help = "Compare recommendation search latency of loading the FAISS index per request against the resident index."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000],
+                            help="Number of vectors in the benchmark index")
+        parser.add_argument('--dim', type=int, default=384, help="Embedding dimension")
+        parser.add_argument('--queries', type=int, default=50, help="Number of searches per size")
+        parser.add_argument('--top-n', type=int, default=21, help="Neighbours returned per search")
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(0)
+        dim = options['dim']
+        top_n = options['top_n']
+
+        self.stdout.write(f"{'vectors':>10} {'per-request p50 ms':>20} {'per-request p99 ms':>20} "
+                          f"{'resident p50 ms':>17} {'resident p99 ms':>17} {'speedup':>9}")
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for size in options['sizes']:
+                index_path = os.path.join(tmp_dir, f"bench_{size}.index")
+                mapping_path = os.path.join(tmp_dir, f"bench_{size}.mapping")
+                NewsIdMapping.from_news_ids([f"{i:064x}" for i in range(size)]).save(mapping_path)
+                index = faiss.IndexFlatL2(dim)
+                index.add(rng.standard_normal((size, dim), dtype='float32'))
+                publish_index(index, index_path)
+
+                queries = rng.standard_normal((options['queries'], dim), dtype='float32')
+                faiss.normalize_L2(queries)
+
+                # Current behaviour: read the index from disk for every request
+                per_request = []
+                for query in queries:
+                    start = time.perf_counter()
+                    faiss.read_index(index_path).search(query[None, :], top_n)
+                    per_request.append(time.perf_counter() - start)
+
+                # Resident index: loaded once, then served from memory
+                service = FaissIndexService(index_path=index_path, mapping_path=mapping_path, legacy_mapping_path=None)
+                service.get_snapshot()
+                resident = []
+                for query in queries:
+                    start = time.perf_counter()
+                    service.search(query[None, :], top_n)
+                    resident.append(time.perf_counter() - start)
+
+                per_request_ms = np.array(per_request) * 1000
+                resident_ms = np.array(resident) * 1000
+                self.stdout.write(
+                    f"{size:>10} {np.percentile(per_request_ms, 50):>20.3f} {np.percentile(per_request_ms, 99):>20.3f} "
+                    f"{np.percentile(resident_ms, 50):>17.3f} {np.percentile(resident_ms, 99):>17.3f} "
+                    f"{np.median(per_request_ms) / np.median(resident_ms):>8.1f}x"
+                )
@@ -0,0 +1,71 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from news.categories import CATEGORIES
+from news.models import NewsArticle
+from news.newsHandler import generate_news_id, save_news_to_db
+
+
+def legacy_save_news_to_db(articles):
+    """
+    The former per-article ingest: one exists() query and one INSERT per article.
+    """
+    for article in articles:
+        news_id = generate_news_id(article)
+        if NewsArticle.objects.filter(news_id=news_id).exists():
+            continue
+        NewsArticle.objects.create(
+            news_id=news_id,
+            title=article['title'],
+            category=article['category'],
+            description=article['description'],
+            url=article['url'],
+            image_url=article['urlToImage'],
+            published_at=article['publishedAt'],
+        )
+
+
+class Command(BaseCommand):
+    help = ("Compare queries and wall time of the per-article ingest with the bulk ingest on synthetic articles. "
+            "Writes to the database; benchmark articles are removed afterwards.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--articles', type=int, default=10000, help="Number of synthetic articles")
+        parser.add_argument('--duplicates', type=float, default=0.2,
+                            help="Share of the articles that are already in the database")
+
+    def handle(self, *args, **options):
+        runs = {
+            'per-article': legacy_save_news_to_db,
+            'bulk': save_news_to_db,
+        }
+        try:
+            for label, save in runs.items():
+                articles = self.make_articles(label, options['articles'])
+                # Store the duplicates upfront, so both runs skip the same share of articles
+                save_news_to_db(articles[:int(len(articles) * options['duplicates'])])
+
+                queries = []
+                with connection.execute_wrapper(lambda execute, *query: queries.append(1) or execute(*query)):
+                    start = time.perf_counter()
+                    save(articles)
+                    elapsed = time.perf_counter() - start
+                self.stdout.write(f"{label:<12} {len(articles):7d} articles   {len(queries):6d} queries   "
+                                  f"{elapsed:8.3f} s   {len(articles) / elapsed:9.0f} articles/s")
+        finally:
+            NewsArticle.objects.filter(url__startswith='https://bench-ingest.example.com/').delete()
+
+    def make_articles(self, label, count):
+        return [
+            {
+                'title': f"Benchmark article {label} {i}",
+                'description': f"Synthetic description {i}",
+                'url': f"https://bench-ingest.example.com/{label}/{i}",
+                'urlToImage': None,
+                'publishedAt': f"2025-01-01T{i % 24:02d}:00:00Z",
+                'category': CATEGORIES[i % len(CATEGORIES)],
+            }
+            for i in range(count)
+        ]
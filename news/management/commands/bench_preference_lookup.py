@@ -0,0 +1,84 @@
+import time
+
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from news.categories import CATEGORIES
+from news.models import UserPreferences
+
+
+class Command(BaseCommand):
+    help = ("Report p50/p99 latency of preference lookups by user_id with the former unindexed varchar column "
+            "and with the unique user key. Creates the benchmark users and removes them afterwards.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000000, help="Number of users with preferences")
+        parser.add_argument('--lookups', type=int, default=10000, help="Lookups through the unique user key")
+        parser.add_argument('--legacy-lookups', type=int, default=200,
+                            help="Lookups through the unindexed varchar column (each one scans the table)")
+        parser.add_argument('--batch-size', type=int, default=10000, help="Rows per INSERT while creating users")
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        users_table = User._meta.db_table
+        preferences_table = UserPreferences._meta.db_table
+        legacy_table = 'bench_legacy_userpreferences'
+
+        self.stdout.write(f"Creating {options['users']} users with preferences...")
+        weights = np.full(len(CATEGORIES), 1 / len(CATEGORIES), dtype='float32').tobytes()
+        for start in range(0, options['users'], options['batch_size']):
+            end = min(start + options['batch_size'], options['users'])
+            with transaction.atomic():
+                users = User.objects.bulk_create([
+                    User(email=f"bench-pref-{i}@example.com", full_name=f"Bench {i}") for i in range(start, end)
+                ])
+                UserPreferences.objects.bulk_create([UserPreferences(user=user, weights=weights) for user in users])
+        user_ids = list(UserPreferences.objects.filter(user__email__startswith='bench-pref-')
+                        .values_list('user_id', flat=True))
+
+        try:
+            # The layout before re-keying: user_id as a varchar column without an index
+            with connection.cursor() as cursor:
+                cursor.execute(f"CREATE TABLE {legacy_table} AS "
+                               f"SELECT id, CAST(user_id AS VARCHAR(255)) AS user_id, weights FROM {preferences_table}")
+                if connection.vendor == 'postgresql':
+                    cursor.execute(f"ANALYZE {legacy_table}")
+                    cursor.execute(f"ANALYZE {preferences_table}")
+
+            rng = np.random.default_rng(0)
+            self.report("varchar, no index", self.time_lookups(
+                f"SELECT weights FROM {legacy_table} WHERE user_id = %s",
+                [str(user_ids[i]) for i in rng.integers(len(user_ids), size=options['legacy_lookups'])]))
+            self.report("unique user key", self.time_lookups(
+                f"SELECT weights FROM {preferences_table} WHERE user_id = %s",
+                [user_ids[i] for i in rng.integers(len(user_ids), size=options['lookups'])]))
+
+            latencies = []
+            for i in rng.integers(len(user_ids), size=options['lookups']):
+                start = time.perf_counter()
+                UserPreferences.objects.get(user_id=user_ids[i])
+                latencies.append(time.perf_counter() - start)
+            self.report("ORM get", latencies)
+        finally:
+            with connection.cursor() as cursor:
+                cursor.execute(f"DROP TABLE IF EXISTS {legacy_table}")
+                cursor.execute(f"DELETE FROM {preferences_table} WHERE user_id IN "
+                               f"(SELECT id FROM {users_table} WHERE email LIKE %s)", ['bench-pref-%'])
+                cursor.execute(f"DELETE FROM {users_table} WHERE email LIKE %s", ['bench-pref-%'])
+
+    def time_lookups(self, sql, params):
+        latencies = []
+        with connection.cursor() as cursor:
+            for param in params:
+                start = time.perf_counter()
+                cursor.execute(sql, [param])
+                cursor.fetchone()
+                latencies.append(time.perf_counter() - start)
+        return latencies
+
+    def report(self, label, latencies):
+        latencies_ms = np.array(latencies) * 1000
+        self.stdout.write(f"{label:<18} {len(latencies):6d} lookups   p50 {np.percentile(latencies_ms, 50):9.3f} ms   "
+                          f"p99 {np.percentile(latencies_ms, 99):9.3f} ms")
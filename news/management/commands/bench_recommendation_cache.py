@@ -0,0 +1,60 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from news.models import UserPreferences
+from news.recommendationCache import RecommendationCache, create_backend
+from news.recommendationSystem import get_recommended_news
+
+
+class Command(BaseCommand):
+    help = "Report hit ratio and p50/p99 latency of recommend_news requests with and without the recommendation cache."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000, help="Number of simulated requests")
+        parser.add_argument('--users', type=int, default=1000, help="Number of distinct users requesting")
+        parser.add_argument('--click-rate', type=float, default=0.05,
+                            help="Probability that a request follows a click (preference change) of that user")
+        parser.add_argument('--backend', choices=['local', 'django'], default='local', help="Cache backend")
+        parser.add_argument('--top-n', type=int, default=21, help="Recommendations per request")
+
+    def handle(self, *args, **options):
+        user_ids = list(UserPreferences.objects.values_list('user_id', flat=True)[:options['users']])
+        if not user_ids:
+            raise CommandError("No users with preferences to benchmark.")
+
+        # Zipf-like popularity: a few users request much more often than the rest
+        rng = np.random.default_rng(0)
+        popularity = 1.0 / np.arange(1, len(user_ids) + 1)
+        requests = rng.choice(len(user_ids), options['requests'], p=popularity / popularity.sum())
+        clicks = rng.random(options['requests']) < options['click_rate']
+        top_n = options['top_n']
+
+        latencies = []
+        for user_index in requests:
+            start = time.perf_counter()
+            get_recommended_news(user_ids[user_index], top_n)
+            latencies.append(time.perf_counter() - start)
+        self.report("no cache", latencies)
+
+        cache = RecommendationCache(create_backend(options['backend']))
+        latencies = []
+        # Simulated clicks change the stored preferences, which are restored afterwards
+        with transaction.atomic():
+            for user_index, clicked in zip(requests, clicks):
+                if clicked:
+                    UserPreferences.objects.filter(user_id=user_ids[user_index]).update(last_updated=timezone.now())
+                start = time.perf_counter()
+                cache.get_or_compute(user_ids[user_index], top_n, get_recommended_news)
+                latencies.append(time.perf_counter() - start)
+            transaction.set_rollback(True)
+        self.report(f"{options['backend']} cache", latencies, cache.hit_ratio)
+
+    def report(self, label, latencies, hit_ratio=None):
+        latencies_ms = np.array(latencies) * 1000
+        hits = f"hit ratio {hit_ratio:.1%}" if hit_ratio is not None else ""
+        self.stdout.write(f"{label:<14} p50 {np.percentile(latencies_ms, 50):8.3f} ms   "
+                          f"p99 {np.percentile(latencies_ms, 99):8.3f} ms   {hits}")
@@ -0,0 +1,54 @@
+import random
+import re
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from news.dataConvertor import clean_texts
+
+WORDS = ('Market', 'stocks', 'League', 'season', 'vaccine', 'study', 'launch', 'chip', 'movie', 'album',
+         'election', 'storm', 'start-up', 'earnings', 'playoffs', 'research', 'galaxy', 'award', 'trial', 'record',
+         "CEO's", '$4.2bn', 'Café', '—', '"quoted"', '(AP)', 'U.S.', '2025:', '…', '#1')
+
+
+def legacy_clean_text(text):
+    """
+    The former per-text cleaning: pd.isna and re.sub on every title and description.
+    """
+    import pandas as pd
+    if pd.isna(text):
+        return ""
+    text = text.lower().strip()
+    text = re.sub(r"[^a-zA-Z0-9 ]", "", text)
+    return text
+
+
+class Command(BaseCommand):
+    help = "Compare the per-text cleaning loop with the batch clean_texts on synthetic titles and descriptions."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--articles', type=int, default=100000, help="Number of synthetic articles")
+
+    def handle(self, *args, **options):
+        rng = random.Random(0)
+        titles = [" ".join(rng.choice(WORDS) for _ in range(rng.randint(5, 15))) for _ in range(options['articles'])]
+        descriptions = [
+            None if rng.random() < 0.1 else " ".join(rng.choice(WORDS) for _ in range(rng.randint(15, 60))) + " "
+            for _ in range(options['articles'])
+        ]
+        legacy_clean_text("warm up")  # Import pandas outside the measurement
+
+        start = time.perf_counter()
+        expected = [legacy_clean_text(title) + " " + legacy_clean_text(description)
+                    for title, description in zip(titles, descriptions)]
+        self.report("per-text loop", len(titles), time.perf_counter() - start)
+
+        start = time.perf_counter()
+        cleaned = clean_texts(titles, descriptions)
+        self.report("clean_texts", len(titles), time.perf_counter() - start)
+
+        if cleaned != expected:
+            raise CommandError("clean_texts does not match the per-text cleaning.")
+
+    def report(self, label, count, seconds):
+        self.stdout.write(f"{label:<16} {count / seconds:>12.0f} articles/sec ({seconds:.3f}s)")
@@ -0,0 +1,57 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Modules the serving path must not load
+HEAVY_MODULES = ('torch', 'sentence_transformers', 'transformers', 'pandas')
+
+# Code run in a fresh interpreter: set up Django, import the given modules and report time, peak RSS and heavy modules
+PROBE = """
+import json, resource, sys, time
+start = time.perf_counter()
+import django
+django.setup()
+for module in sys.argv[1:]:
+    __import__(module)
+print(json.dumps({
+    'seconds': time.perf_counter() - start,
+    'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    'heavy': [module for module in %r if module in sys.modules],
+}))
+""" % (HEAVY_MODULES,)
+
+SCENARIOS = {
+    # What a web worker loads now
+    'serving (lazy)': ['news.urls'],
+    # What a web worker loaded when the views imported the ingest stack and its ML dependencies eagerly
+    'serving (eager ML)': ['news.urls', 'news.dataConvertor', 'news.newsHandler', 'pandas', 'sentence_transformers'],
+}
+
+
+class Command(BaseCommand):
+    help = ("Measure import time and peak resident memory of a fresh web worker loading the URL configuration, "
+            "with the ML dependencies loaded lazily and eagerly.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5, help="Fresh interpreters per scenario")
+
+    def handle(self, *args, **options):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=settings.SETTINGS_MODULE,
+                   PYTHONPATH=os.pathsep.join(path for path in sys.path if path))
+        for label, modules in SCENARIOS.items():
+            runs = []
+            for _ in range(options['repeat']):
+                result = subprocess.run([sys.executable, '-c', PROBE, *modules], env=env, capture_output=True, text=True)
+                if result.returncode:
+                    raise CommandError(f"{label} failed:\n{result.stderr}")
+                runs.append(json.loads(result.stdout.strip().splitlines()[-1]))
+
+            seconds = statistics.median(run['seconds'] for run in runs)
+            rss_mb = statistics.median(run['max_rss_kb'] for run in runs) / 1024
+            heavy = ", ".join(runs[0]['heavy']) or "none"
+            self.stdout.write(f"{label:<20} import {seconds:7.3f} s   peak RSS {rss_mb:8.1f} MB   heavy modules: {heavy}")
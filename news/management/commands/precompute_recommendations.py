@@ -0,0 +1,58 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+
+from news.models import UserPreferences
+from news.recommendationCache import get_recommendation_cache
+from news.recommendationSystem import get_recommended_news_batch
+
+
+class Command(BaseCommand):
+    help = "Compute recommendations for many users with batched FAISS searches (nightly precompute, push fan-out)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', nargs='+', help="User IDs to compute (all users with preferences by default)")
+        parser.add_argument('--top-n', type=int, default=21, help="Recommendations per user")
+        parser.add_argument('--batch-size', type=int, default=10000, help="Users per FAISS search")
+        parser.add_argument('--output', help="Write one JSON line per user with the recommended news IDs to this file")
+        parser.add_argument('--warm-cache', action='store_true', help="Store the results in the recommendation cache")
+
+    def handle(self, *args, **options):
+        user_ids = options['users'] or UserPreferences.objects.values_list('user_id', flat=True).iterator()
+        output = open(options['output'], 'w') if options['output'] else None
+        cache = get_recommendation_cache() if options['warm_cache'] else None
+
+        start = time.perf_counter()
+        total = 0
+        try:
+            for batch in self.batches(user_ids, options['batch_size']):
+                recommendations = get_recommended_news_batch(batch, options['top_n'])
+                total += len(recommendations)
+                if cache is not None:
+                    for user_id, articles in recommendations.items():
+                        cache.put(user_id, options['top_n'], articles)
+                if output is not None:
+                    for user_id, articles in recommendations.items():
+                        output.write(json.dumps({
+                            'user_id': user_id,
+                            'news_ids': [article['news_id'] for article in articles],
+                        }) + "\n")
+        finally:
+            if output is not None:
+                output.close()
+
+        seconds = time.perf_counter() - start
+        self.stdout.write(f"Computed recommendations for {total} users in {seconds:.2f}s "
+                          f"({total / seconds if seconds else 0:.0f} users/sec).")
+
+    @staticmethod
+    def batches(user_ids, batch_size):
+        batch = []
+        for user_id in user_ids:
+            batch.append(user_id)
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
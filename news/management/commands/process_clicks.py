@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from news.clickQueue import CLICK_BATCH_SIZE, CLICK_FLUSH_INTERVAL, drain_pending_clicks
+
+
+class Command(BaseCommand):
+    help = "Apply queued clicks to the user preferences in coalesced batches; the worker behind the async click mode."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=CLICK_BATCH_SIZE, help="Clicks applied per transaction")
+        parser.add_argument('--interval', type=float, default=CLICK_FLUSH_INTERVAL, help="Seconds between two flushes")
+        parser.add_argument('--once', action='store_true', help="Drain the queue once and exit")
+
+    def handle(self, *args, **options):
+        while True:
+            applied = drain_pending_clicks(options['batch_size'])
+            if applied:
+                self.stdout.write(f"Applied {applied} clicks.")
+            if options['once']:
+                return
+            close_old_connections()
+            time.sleep(options['interval'])
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from news.dataConvertor import FAISS_INDEX_FACTORY_STRINGS
+from news.models import PopulateJob
+from news.populateJobs import run_job, start_job
+
+
+class Command(BaseCommand):
+    help = ("Rebuild the FAISS index from the embedding store without re-encoding articles. The rebuild runs as a "
+            "job holding the run lock, so it never overlaps a populate or reindex job.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--index-type', choices=list(FAISS_INDEX_FACTORY_STRINGS),
+                            help="Index type to build and keep across later index updates (by default the type "
+                                 "is chosen from the vector count, now and in later updates)")
+
+    def handle(self, *args, **options):
+        job = start_job(PopulateJob.KIND_REBUILD, options['index_type'] or '')
+        if job is None:
+            raise CommandError("Another populate job is running; rebuild the index once it finished.")
+
+        job = run_job(job)
+        if job.status != PopulateJob.STATUS_SUCCEEDED:
+            raise CommandError(f"Rebuild job {job.pk} failed: {job.error}")
+        self.stdout.write(f"Rebuild job {job.pk} succeeded ({job.progress['stages']['index']['items']} vectors).")
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from news.trendingFeed import TRENDING_REFRESH_INTERVAL, decay_trending_scores, rebuild_trending_scores
+
+
+class Command(BaseCommand):
+    help = "Decay the trending scores of the articles and drop the faded ones, every --interval seconds."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=TRENDING_REFRESH_INTERVAL,
+                            help="Seconds between two decay passes")
+        parser.add_argument('--once', action='store_true', help="Run one decay pass and exit")
+        parser.add_argument('--rebuild', action='store_true',
+                            help="Recompute the scores from the recorded clicks before the first pass")
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            stored = rebuild_trending_scores()
+            self.stdout.write(f"Rebuilt {stored} trending scores from the recorded clicks.")
+            if options['once']:
+                return
+
+        while True:
+            kept, removed = decay_trending_scores()
+            self.stdout.write(f"Decayed {kept} trending scores, removed {removed}.")
+            if options['once']:
+                return
+            close_old_connections()
+            time.sleep(options['interval'])
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from news.models import PopulateJob
+from news.populateJobs import POPULATE_POLL_INTERVAL, enqueue_job, run_pending_jobs
+
+
+class Command(BaseCommand):
+    help = "Run queued populate, reindex and rebuild jobs; the worker that executes the jobs queued by the populate API."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=POPULATE_POLL_INTERVAL,
+                            help="Seconds between two polls for queued jobs")
+        parser.add_argument('--once', action='store_true', help="Run the queued jobs once and exit")
+        parser.add_argument('--enqueue', choices=[kind for kind, _ in PopulateJob.KIND_CHOICES],
+                            help="Queue a job of this kind first (e.g. from cron)")
+
+    def handle(self, *args, **options):
+        if options['enqueue']:
+            job = enqueue_job(options['enqueue'])
+            self.stdout.write(f"Queued {job.kind} job {job.pk}.")
+
+        while True:
+            count = run_pending_jobs()
+            if count:
+                self.stdout.write(f"Ran {count} jobs.")
+            if options['once']:
+                return
+            close_old_connections()
+            time.sleep(options['interval'])
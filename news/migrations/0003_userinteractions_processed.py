@@ -0,0 +1,29 @@
+# Generated by Django 5.2 on 2026-10-17 10:27
+
+from django.db import migrations, models
+
+
+def mark_existing_interactions_processed(apps, schema_editor):
+    # Interactions recorded before the click queue existed were already applied to the preferences
+    UserInteractions = apps.get_model('news', 'UserInteractions')
+    UserInteractions.objects.update(processed=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0002_userprofilevector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userinteractions',
+            name='processed',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(mark_existing_interactions_processed, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='userinteractions',
+            index=models.Index(condition=models.Q(('processed', False)), fields=['id'], name='news_interaction_pending_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2 on 2026-10-17 10:31
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0003_userinteractions_processed'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userpreferences',
+            name='last_updated',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
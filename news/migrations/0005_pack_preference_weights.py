@@ -0,0 +1,81 @@
+# Generated by Django 5.2 on 2026-10-17 10:33
+
+import numpy as np
+from django.db import migrations, models
+
+# Categories of the weight columns, in the order they are packed
+WEIGHT_CATEGORIES = ['business', 'sports', 'technology', 'entertainment', 'health', 'general', 'science']
+
+
+def pack_weights(apps, schema_editor):
+    UserPreferences = apps.get_model('news', 'UserPreferences')
+    batch = []
+    for user_pref in UserPreferences.objects.iterator(chunk_size=2000):
+        weights = [getattr(user_pref, f"{category}_weight") for category in WEIGHT_CATEGORIES]
+        user_pref.weights = np.asarray(weights, dtype='float32').tobytes()
+        batch.append(user_pref)
+        if len(batch) == 2000:
+            UserPreferences.objects.bulk_update(batch, ['weights'])
+            batch = []
+    UserPreferences.objects.bulk_update(batch, ['weights'])
+
+
+def unpack_weights(apps, schema_editor):
+    UserPreferences = apps.get_model('news', 'UserPreferences')
+    fields = [f"{category}_weight" for category in WEIGHT_CATEGORIES]
+    batch = []
+    for user_pref in UserPreferences.objects.iterator(chunk_size=2000):
+        weights = np.zeros(len(WEIGHT_CATEGORIES), dtype='float32')
+        stored = np.frombuffer(bytes(user_pref.weights), dtype='float32')[:len(WEIGHT_CATEGORIES)]
+        weights[:len(stored)] = stored
+        for field, weight in zip(fields, weights.tolist()):
+            setattr(user_pref, field, weight)
+        batch.append(user_pref)
+        if len(batch) == 2000:
+            UserPreferences.objects.bulk_update(batch, fields)
+            batch = []
+    UserPreferences.objects.bulk_update(batch, fields)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0004_userpreferences_last_updated'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userpreferences',
+            name='weights',
+            field=models.BinaryField(default=bytes),
+        ),
+        migrations.RunPython(pack_weights, unpack_weights),
+        migrations.RemoveField(
+            model_name='userpreferences',
+            name='business_weight',
+        ),
+        migrations.RemoveField(
+            model_name='userpreferences',
+            name='entertainment_weight',
+        ),
+        migrations.RemoveField(
+            model_name='userpreferences',
+            name='general_weight',
+        ),
+        migrations.RemoveField(
+            model_name='userpreferences',
+            name='health_weight',
+        ),
+        migrations.RemoveField(
+            model_name='userpreferences',
+            name='science_weight',
+        ),
+        migrations.RemoveField(
+            model_name='userpreferences',
+            name='sports_weight',
+        ),
+        migrations.RemoveField(
+            model_name='userpreferences',
+            name='technology_weight',
+        ),
+    ]
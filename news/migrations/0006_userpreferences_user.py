@@ -0,0 +1,84 @@
+# Generated by Django 5.2 on 2026-10-17 10:36
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def link_preferences_to_users(apps, schema_editor):
+    """
+    Keep the latest preferences row of every user and link it to the user; drop duplicates and rows
+    whose user_id is not the id of an existing user.
+    """
+    UserPreferences = apps.get_model('news', 'UserPreferences')
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+
+    # Latest row of every numeric user id; rows with other ids can not be linked to a user
+    latest = {}
+    for pk, legacy_user_id in UserPreferences.objects.order_by('id').values_list('id', 'legacy_user_id').iterator():
+        legacy_user_id = legacy_user_id.strip()
+        if legacy_user_id.isascii() and legacy_user_id.isdigit():
+            latest[int(legacy_user_id)] = pk
+
+    numeric_ids = list(latest)
+    existing_ids = set()
+    for start in range(0, len(numeric_ids), 10000):
+        existing_ids.update(User.objects.filter(pk__in=numeric_ids[start:start + 10000]).values_list('pk', flat=True))
+
+    # Link the rows to keep; every other row stays unlinked and is deleted
+    keep = {pk: user_id for user_id, pk in latest.items() if user_id in existing_ids}
+    kept_pks = list(keep)
+    for start in range(0, len(kept_pks), 2000):
+        batch = list(UserPreferences.objects.filter(pk__in=kept_pks[start:start + 2000]))
+        for user_pref in batch:
+            user_pref.user_id = keep[user_pref.pk]
+        UserPreferences.objects.bulk_update(batch, ['user'])
+    UserPreferences.objects.filter(user__isnull=True).delete()
+
+
+def unlink_preferences_from_users(apps, schema_editor):
+    UserPreferences = apps.get_model('news', 'UserPreferences')
+    batch = []
+    for user_pref in UserPreferences.objects.iterator(chunk_size=2000):
+        user_pref.legacy_user_id = str(user_pref.user_id)
+        batch.append(user_pref)
+        if len(batch) == 2000:
+            UserPreferences.objects.bulk_update(batch, ['legacy_user_id'])
+            batch = []
+    UserPreferences.objects.bulk_update(batch, ['legacy_user_id'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0005_pack_preference_weights'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RenameField(
+            model_name='userpreferences',
+            old_name='user_id',
+            new_name='legacy_user_id',
+        ),
+        migrations.AlterField(
+            model_name='userpreferences',
+            name='legacy_user_id',
+            field=models.CharField(max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name='userpreferences',
+            name='user',
+            field=models.OneToOneField(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='preferences', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(link_preferences_to_users, unlink_preferences_from_users),
+        migrations.RemoveField(
+            model_name='userpreferences',
+            name='legacy_user_id',
+        ),
+        migrations.AlterField(
+            model_name='userpreferences',
+            name='user',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='preferences', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
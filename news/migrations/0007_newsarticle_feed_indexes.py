@@ -0,0 +1,21 @@
+# Generated by Django 5.2 on 2026-10-17 10:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0006_userpreferences_user'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='newsarticle',
+            index=models.Index(fields=['category', '-published_at', '-id'], name='news_article_category_feed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='newsarticle',
+            index=models.Index(fields=['-published_at', '-id'], name='news_article_recent_idx'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2 on 2026-10-17 10:42
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0007_newsarticle_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendingScore',
+            fields=[
+                ('news_article', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='trending_score', serialize=False, to='news.newsarticle')),
+                ('score', models.FloatField(default=0.0)),
+                ('decayed_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-score'], name='news_trending_score_idx')],
+            },
+        ),
+    ]
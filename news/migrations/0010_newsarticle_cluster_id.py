@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-17 10:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0009_populatejob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='newsarticle',
+            name='cluster_id',
+            field=models.BigIntegerField(blank=True, db_index=True, null=True),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2 on 2026-10-17 11:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0010_newsarticle_cluster_id'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='populatejob',
+            name='news_populate_job_single_queued',
+        ),
+        migrations.AddConstraint(
+            model_name='populatejob',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'queued')), fields=('kind',), name='news_populate_job_single_queued_per_kind'),
+        ),
+    ]
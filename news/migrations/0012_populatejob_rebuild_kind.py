@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-17 11:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0011_populatejob_single_queued_per_kind'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='populatejob',
+            name='kind',
+            field=models.CharField(choices=[('populate', 'Populate'), ('reindex', 'Reindex'), ('rebuild', 'Rebuild')], default='populate', max_length=20),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-17 11:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0012_populatejob_rebuild_kind'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='populatejob',
+            name='index_type',
+            field=models.CharField(blank=True, default='', max_length=20),
+        ),
+    ]
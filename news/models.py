@@ -1,5 +1,10 @@
+from django.conf import settings
 from django.db import models
+from django.utils import timezone
 import datetime
+import numpy as np
+
+from .categories import CATEGORIES
 
 class NewsArticle(models.Model):
     news_id = models.CharField(max_length=256, unique=True)
@@ -10,26 +15,126 @@ class NewsArticle(models.Model):
     image_url = models.TextField(null=True, blank = True)
     published_at = models.DateTimeField()
     timestamp = models.DateTimeField(auto_now_add=True)
+    # FAISS id of the article representing this article's story; near-duplicates share the cluster of the first
+    # article of the story and are not indexed themselves (see nearDuplicates). None for articles not embedded yet.
+    cluster_id = models.BigIntegerField(null=True, blank=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            # Category feeds: newest first within a category, id breaks ties (see articleFeeds)
+            models.Index(fields=['category', '-published_at', '-id'], name='news_article_category_feed_idx'),
+            # Feed of the newest articles over all categories
+            models.Index(fields=['-published_at', '-id'], name='news_article_recent_idx'),
+        ]
 
     def __str__(self):
         return self.title
 
+class TrendingScore(models.Model):
+    # Clicks of the article, decayed to decayed_at (see trendingFeed); only recently clicked articles have a row
+    news_article = models.OneToOneField(NewsArticle, on_delete=models.CASCADE, primary_key=True, related_name='trending_score')
+    score = models.FloatField(default=0.0)
+    decayed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-score'], name='news_trending_score_idx'),
+        ]
+
 class UserPreferences(models.Model):
-    user_id = models.CharField(max_length=255)
-    business_weight = models.FloatField(default=0.0)
-    sports_weight = models.FloatField(default=0.0)
-    technology_weight = models.FloatField(default=0.0)
-    entertainment_weight = models.FloatField(default=0.0)
-    health_weight = models.FloatField(default=0.0)
-    general_weight = models.FloatField(default=0.0)
-    science_weight = models.FloatField(default=0.0)
+    # One row per user, keyed by the integer user id (column user_id)
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='preferences')
+    # Category weights packed as float32, in the order of categories.CATEGORIES
+    weights = models.BinaryField(default=bytes)
+    # Time the weights are expressed at; all of them decay alike from there (see decayFunction.effective_weights)
+    last_updated = models.DateTimeField(default=timezone.now)
+
+    def get_weights(self):
+        """
+        Return the category weights as a float32 array with one entry per category (0 for unset categories).
+        """
+        stored = np.frombuffer(self.weights, dtype='float32')[:len(CATEGORIES)]
+        weights = np.zeros(len(CATEGORIES), dtype='float32')
+        weights[:len(stored)] = stored
+        return weights
+
+    def set_weights(self, weights):
+        self.weights = np.asarray(weights, dtype='float32').tobytes()
 
     def __str__(self):
         return f"User {self.user_id} Preferences"
 
 
+class UserProfileVector(models.Model):
+    """
+    Semantic profile of a user: the exponentially decayed mean of the embeddings of the articles they clicked.
+    The vector is stored as float16 bytes and updated in O(dim) per click.
+    """
+    user_id = models.CharField(max_length=255, unique=True)
+    vector = models.BinaryField()
+    click_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def get_vector(self):
+        return np.frombuffer(self.vector, dtype='float16').astype('float32')
+
+    def set_vector(self, vector):
+        self.vector = np.asarray(vector, dtype='float16').tobytes()
+
+    def __str__(self):
+        return f"User {self.user_id} Profile Vector"
+
+
 class UserInteractions(models.Model):
     user_id = models.CharField(max_length=255)
     news_article = models.ForeignKey(NewsArticle, on_delete=models.CASCADE)  # Cascade delete interactions
     clicked = models.BooleanField(default=False)
-    timestamp = models.DateTimeField(auto_now_add=True)
\ No newline at end of file
+    timestamp = models.DateTimeField(auto_now_add=True)
+    # Whether the click has been applied to the user's preferences (the table doubles as the click outbox)
+    processed = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['id'], condition=models.Q(processed=False), name='news_interaction_pending_idx'),
+        ]
+
+class PopulateJob(models.Model):
+    KIND_POPULATE = 'populate'  # Fetch the news, store the new articles and index them
+    KIND_REINDEX = 'reindex'  # Bring the FAISS index in line with the whole NewsArticle table
+    KIND_REBUILD = 'rebuild'  # Rebuild the FAISS index from the embedding store without re-encoding articles
+    KIND_CHOICES = [(KIND_POPULATE, 'Populate'), (KIND_REINDEX, 'Reindex'), (KIND_REBUILD, 'Rebuild')]
+
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_SUCCEEDED = 'succeeded'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_SUCCEEDED, 'Succeeded'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, default=KIND_POPULATE)
+    # Index type a rebuild job builds ('' to choose it from the vector count); the type of the last successful
+    # rebuild is kept by later index updates (see dataConvertor.pinned_index_type)
+    index_type = models.CharField(max_length=20, blank=True, default='')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    # Current stage and per-stage durations and item counts (see stageTimers.StageTimers.as_dict)
+    progress = models.JSONField(default=dict, blank=True)
+    error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    # Last progress report of a running job; a running job that stopped reporting is considered dead
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            # At most one job of each kind waits: enqueueing while a job of the kind is queued returns the queued job
+            models.UniqueConstraint(fields=['kind'], condition=models.Q(status='queued'),
+                                    name='news_populate_job_single_queued_per_kind'),
+            # At most one job runs: populate and reindex runs never overlap
+            models.UniqueConstraint(fields=['status'], condition=models.Q(status='running'),
+                                    name='news_populate_job_single_running'),
+        ]
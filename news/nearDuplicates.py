@@ -0,0 +1,131 @@
+import logging
+from collections import defaultdict
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+
+from .models import NewsArticle
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Whether articles whose embedding nearly matches an indexed article are clustered with it instead of being indexed
+NEAR_DUPLICATE_COLLAPSING = getattr(settings, 'NEAR_DUPLICATE_COLLAPSING', True)
+
+# Cosine similarity from which two articles are the same story
+NEAR_DUPLICATE_THRESHOLD = getattr(settings, 'NEAR_DUPLICATE_THRESHOLD', 0.92)
+
+# Maximum time between the publication of two articles of the same story
+NEAR_DUPLICATE_WINDOW = getattr(settings, 'NEAR_DUPLICATE_WINDOW', timedelta(days=3))
+
+# Number of nearest indexed articles compared with each new article
+NEAR_DUPLICATE_NEIGHBOURS = getattr(settings, 'NEAR_DUPLICATE_NEIGHBOURS', 4)
+
+
+def assign_clusters(embeddings, published_at, positions, faiss_index, news_id_at,
+                    threshold=NEAR_DUPLICATE_THRESHOLD, window=NEAR_DUPLICATE_WINDOW,
+                    neighbours=NEAR_DUPLICATE_NEIGHBOURS):
+    """
+    Assign a cluster to each new article of a chunk.
+
+    An article joins the cluster of the most similar of its `neighbours` nearest indexed articles, or else of the
+    first earlier article of the chunk, that has a cosine similarity of at least `threshold` and was published within
+    `window` of it. Other articles start their own cluster, identified by their own FAISS id. Only cluster
+    representatives are indexed, so the FAISS id of an indexed match is its cluster id.
+
+    :param embeddings: L2-normalised embeddings of the new articles
+    :param published_at: Publication times of the new articles
+    :param positions: FAISS ids of the new articles
+    :param faiss_index: The index to search for indexed near-duplicates (None to only compare within the chunk)
+    :param news_id_at: Function returning the news_id of an indexed FAISS id (None if unknown)
+    :return: int64 array of cluster ids; an article is a near-duplicate if its cluster id differs from its FAISS id
+    """
+    positions = np.asarray(positions, dtype='int64')
+    cluster_ids = positions.copy()
+    if not NEAR_DUPLICATE_COLLAPSING or not len(positions):
+        return cluster_ids
+    timestamps = np.array([moment.timestamp() for moment in published_at])
+    window_seconds = window.total_seconds()
+
+    # Near-duplicates of indexed articles, best match first
+    if faiss_index is not None and faiss_index.ntotal:
+        scores, faiss_ids = faiss_index.search(np.ascontiguousarray(embeddings), min(neighbours, faiss_index.ntotal))
+        hits = [
+            [(int(faiss_id), news_id_at(int(faiss_id))) for score, faiss_id in zip(row_scores, row_ids)
+             if faiss_id >= 0 and score >= threshold]
+            for row_scores, row_ids in zip(scores, faiss_ids)
+        ]
+        candidates = {news_id for row_hits in hits for _, news_id in row_hits if news_id is not None}
+        if candidates:
+            indexed_published_at = dict(
+                NewsArticle.objects.filter(news_id__in=candidates).values_list('news_id', 'published_at')
+            )
+            for row, row_hits in enumerate(hits):
+                for faiss_id, news_id in row_hits:
+                    moment = indexed_published_at.get(news_id)
+                    if moment is not None and abs(timestamps[row] - moment.timestamp()) <= window_seconds:
+                        cluster_ids[row] = faiss_id
+                        break
+
+    # Near-duplicates within the chunk: join the cluster of the first matching earlier article
+    similar = (embeddings @ embeddings.T >= threshold) & (np.abs(timestamps[:, None] - timestamps) <= window_seconds)
+    for row in range(1, len(positions)):
+        if cluster_ids[row] != positions[row]:
+            continue
+        earlier = np.flatnonzero(similar[row, :row])
+        if len(earlier):
+            cluster_ids[row] = cluster_ids[earlier[0]]
+
+    return cluster_ids
+
+
+def duplicate_positions(news_id_to_index):
+    """
+    Return the FAISS ids of the articles that are near-duplicates of another article (left out of the index).
+    """
+    positions = []
+    clustered = NewsArticle.objects.filter(cluster_id__isnull=False).values_list('news_id', 'cluster_id')
+    for news_id, cluster_id in clustered.iterator(chunk_size=10000):
+        position = news_id_to_index.position_of(news_id)
+        if position is not None and position != cluster_id:
+            positions.append(position)
+    return np.array(positions, dtype='int64')
+
+
+def promote_cluster_members(removed_positions, news_id_to_index):
+    """
+    Give the clusters whose representative was removed a new representative: the remaining member with the lowest
+    FAISS id, which now has to be indexed.
+
+    :param removed_positions: FAISS ids of the removed articles
+    :param news_id_to_index: The NewsIdMapping without the removed articles
+    :return: Tuple of the list of (article primary key, new cluster id) updates and the FAISS ids to index
+    """
+    members = defaultdict(list)
+    clustered = NewsArticle.objects.filter(cluster_id__in=[int(position) for position in removed_positions])
+    for article_pk, news_id, cluster_id in clustered.values_list('id', 'news_id', 'cluster_id').iterator():
+        position = news_id_to_index.position_of(news_id)
+        if position is not None:
+            members[cluster_id].append((position, article_pk))
+
+    updates, promoted = [], []
+    for cluster_members in members.values():
+        representative = min(position for position, _ in cluster_members)
+        promoted.append(representative)
+        updates += [(article_pk, representative) for _, article_pk in cluster_members]
+    if promoted:
+        logger.info(f"Promoted {len(promoted)} articles to represent the clusters of removed articles.")
+    return updates, promoted
+
+
+def save_clusters(updates, batch_size=2000):
+    """
+    Store the cluster ids of articles.
+    :param updates: List of (article primary key, cluster id)
+    """
+    for start in range(0, len(updates), batch_size):
+        NewsArticle.objects.bulk_update(
+            [NewsArticle(id=article_pk, cluster_id=cluster_id) for article_pk, cluster_id in updates[start:start + batch_size]],
+            ['cluster_id'],
+        )
@@ -1,56 +1,215 @@
-import requests
+import hashlib
 import logging
+import math
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import requests
 from django.conf import settings
-from django.db import IntegrityError
+from django.db import IntegrityError, transaction
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
 from .models import NewsArticle
-import hashlib
 
 
 # Set up a logger
 logger = logging.getLogger(__name__)
 
-def fetch_all_news_for_categories(categories):
-    url = 'https://newsapi.org/v2/top-headlines'
-    all_articles = []
+# Endpoint of the NewsAPI top headlines
+NEWS_API_URL = getattr(settings, 'NEWS_API_URL', 'https://newsapi.org/v2/top-headlines')
+
+# Country of the fetched headlines
+NEWS_API_COUNTRY = getattr(settings, 'NEWS_API_COUNTRY', 'us')
+
+# Articles per page (NewsAPI allows up to 100)
+NEWS_API_PAGE_SIZE = getattr(settings, 'NEWS_API_PAGE_SIZE', 100)
+
+# Maximum number of requests in flight
+NEWS_API_CONCURRENCY = getattr(settings, 'NEWS_API_CONCURRENCY', 4)
+
+# Maximum number of requests started per second (None: no limit)
+NEWS_API_RATE_LIMIT = getattr(settings, 'NEWS_API_RATE_LIMIT', 5.0)
+
+# Connect and read timeouts of a request, in seconds
+NEWS_API_TIMEOUT = getattr(settings, 'NEWS_API_TIMEOUT', (3.05, 10))
+
+# Retries of a request failing with a connection error or a 429/5xx status, with exponential backoff
+NEWS_API_MAX_RETRIES = getattr(settings, 'NEWS_API_MAX_RETRIES', 3)
+NEWS_API_BACKOFF = getattr(settings, 'NEWS_API_BACKOFF', 0.5)
+
+# Number of articles per INSERT when saving fetched articles
+NEWS_INGEST_BATCH_SIZE = getattr(settings, 'NEWS_INGEST_BATCH_SIZE', 1000)
+
 
-    for category in categories:
-        page = 1  # Start from page 1
+class RateLimiter:
+    """
+    Token bucket allowing `rate` acquisitions per second on average and bursts of up to `burst`.
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Block until a token is available and take it.
+        """
         while True:
-            params = {
-                'category': category,
-                'apiKey': settings.NEWS_API_KEY,  # Your NewsAPI key
-                'pageSize': 100,  # Max articles per page (NewsAPI allows up to 100)
-                'country': 'us',  # Filter by country (e.g., US)
-                'page': page,  # Paginate through results
-            }
-
-            try:
-                response = requests.get(url, params=params)
-
-                if response.status_code == 200:
-                    articles = response.json()['articles']
-                    for article in articles:
-                        article['category'] = category  # Add the category field to each article
-                    all_articles += articles  # Add articles to the list
-
-                    if len(articles) < 100:
-                        break  # Stop pagination if fewer than 100 articles (last page)
-                    page += 1  # Move to the next page
-                else:
-                    # Log if NewsAPI response status is not 200
-                    logger.error(f"NewsAPI Error: Status code {response.status_code} for category {category}")
-                    break  # Stop the loop if the request failed
-
-            except requests.exceptions.RequestException as e:
-                # Log if a request error occurs (e.g., connection issues, timeout)
-                logger.error(f"Request failed for category {category} on page {page}. Error: {str(e)}")
-                break  # Stop the loop on error
-            except Exception as e:
-                # Log any unexpected errors
-                logger.error(f"Unexpected error fetching news for category {category} on page {page}. Error: {str(e)}")
-                break  # Stop the loop on error
-
-    return all_articles
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+
+
+def build_session(pool_size=NEWS_API_CONCURRENCY, max_retries=NEWS_API_MAX_RETRIES, backoff=NEWS_API_BACKOFF):
+    """
+    Return a session keeping up to `pool_size` connections alive, retrying failed GETs with exponential backoff.
+    """
+    retry = Retry(
+        total=max_retries,
+        backoff_factor=backoff,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(['GET']),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+class NewsFetcher:
+    """
+    Fetch the pages of several categories in parallel over one pooled session.
+
+    The first page of every category is requested at once; its totalResults tells how many pages follow, and
+    those are requested in parallel too, so fetching takes about as long as the slowest category.
+    """
+
+    def __init__(self, url=NEWS_API_URL, api_key=None, concurrency=NEWS_API_CONCURRENCY,
+                 rate_limit=NEWS_API_RATE_LIMIT, timeout=NEWS_API_TIMEOUT, max_retries=NEWS_API_MAX_RETRIES,
+                 backoff=NEWS_API_BACKOFF, page_size=NEWS_API_PAGE_SIZE):
+        self.url = url
+        self.api_key = api_key or settings.NEWS_API_KEY
+        self.concurrency = concurrency
+        self.rate_limiter = RateLimiter(rate_limit) if rate_limit else None
+        self.timeout = timeout
+        self.page_size = page_size
+        self.session = build_session(concurrency, max_retries, backoff)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.session.close()
+
+    def fetch_page(self, category, page):
+        """
+        Fetch one page of a category.
+
+        :return: Tuple of the list of articles and the total number of results (None if not reported)
+        :raises requests.exceptions.RequestException: If the request fails or the response is not 200
+        """
+        if self.rate_limiter:
+            self.rate_limiter.acquire()
+        params = {
+            'category': category,
+            'apiKey': self.api_key,
+            'pageSize': self.page_size,
+            'country': NEWS_API_COUNTRY,
+            'page': page,
+        }
+        response = self.session.get(self.url, params=params, timeout=self.timeout)
+        if response.status_code != 200:
+            raise requests.exceptions.HTTPError(f"Status code {response.status_code}", response=response)
+        data = response.json()
+        articles = data['articles']
+        for article in articles:
+            article['category'] = category  # Add the category field to each article
+        return articles, data.get('totalResults')
+
+    def iter_pages(self, categories):
+        """
+        Fetch all pages of the given categories, yielding every page as soon as it arrives.
+
+        A page failing after its retries is logged and left out; the other pages are not affected.
+
+        :param categories: List of categories
+        :return: Generator of (category, page, list of articles) tuples, in order of arrival
+        """
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            pending = {pool.submit(self.fetch_page, category, 1): (category, 1) for category in dict.fromkeys(categories)}
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    category, page = pending.pop(future)
+                    try:
+                        articles, total_results = future.result()
+                    except requests.exceptions.RequestException as e:
+                        # Log if a request error occurs (e.g., connection issues, timeout, error status)
+                        logger.error(f"Request failed for category {category} on page {page}. Error: {str(e)}")
+                        continue
+                    except Exception as e:
+                        # Log any unexpected errors
+                        logger.error(f"Unexpected error fetching news for category {category} on page {page}. "
+                                     f"Error: {str(e)}")
+                        continue
+
+                    if page == 1 and total_results is not None:
+                        # All remaining pages are known upfront
+                        next_pages = range(2, math.ceil(total_results / self.page_size) + 1)
+                    elif total_results is None and len(articles) == self.page_size:
+                        # Without totalResults, continue until a page is not full
+                        next_pages = [page + 1]
+                    else:
+                        next_pages = []
+                    for next_page in next_pages:
+                        pending[pool.submit(self.fetch_page, category, next_page)] = (category, next_page)
+
+                    yield category, page, articles
+
+    def fetch(self, categories):
+        """
+        Fetch all pages of the given categories.
+
+        :param categories: List of categories
+        :return: List of articles, grouped by category in the given order and in page order within a category
+        """
+        pages = {category: {} for category in categories}
+        for category, page, articles in self.iter_pages(categories):
+            pages[category][page] = articles
+
+        all_articles = []
+        for category in pages:
+            for page in sorted(pages[category]):
+                all_articles += pages[category][page]
+        return all_articles
+
+
+def fetch_all_news_for_categories(categories):
+    """
+    Fetch the top headlines of the given categories from NewsAPI.
+
+    :param categories: List of categories
+    :return: List of articles with their category
+    """
+    with NewsFetcher() as fetcher:
+        return fetcher.fetch(categories)
 
 
 def generate_news_id(article):
@@ -61,29 +220,73 @@ def generate_news_id(article):
     return hashlib.sha256(unique_string.encode('utf-8')).hexdigest()
 
 
-def save_news_to_db(articles):
+def insert_each(articles):
+    """
+    Insert articles one at a time, skipping those that conflict with a stored article.
+    :return: List of the news IDs of the inserted articles
+    """
+    inserted = []
     for article in articles:
-        # Generate a unique news_id for the article
-        news_id = generate_news_id(article)
+        article.pk = None  # Drop any primary key set by the rolled back bulk INSERT
+        try:
+            with transaction.atomic():
+                article.save(force_insert=True)
+            inserted.append(article.news_id)
+        except IntegrityError as e:
+            logger.warning(f"Skipping article {article.news_id} that could not be inserted: {str(e)}")
+    return inserted
 
-        # Check if the article already exists by the news_id (avoid duplicates)
-        if NewsArticle.objects.filter(news_id=news_id).exists():
-            logger.info(f"Duplicate article found. Skipping: {article['title']}")
-            continue  # Skip inserting this article since it's a duplicate
 
-        # Save the article to the database if it's not a duplicate
+def save_news_to_db(articles, batch_size=NEWS_INGEST_BATCH_SIZE):
+    """
+    Insert the articles that are not in the database yet.
+
+    All news IDs are hashed upfront and the existing ones are looked up with one query (per 10000 articles); the new
+    articles are then inserted with bulk INSERTs of `batch_size` rows. A batch conflicting with articles inserted
+    concurrently by another populate is inserted again one article at a time, skipping the conflicting ones, so
+    each article is reported as new (and embedded) by one populate only.
+
+    :param articles: List of NewsAPI articles with their category
+    :param batch_size: Number of rows per INSERT
+    :return: List of the news IDs of the inserted articles
+    """
+    # Hash every article once; repeated articles (e.g. listed in two pages) are only kept once
+    candidates = {}
+    for article in articles:
+        if not article.get('title') or not article.get('url') or not article.get('publishedAt'):
+            logger.error(f"Skipping article without title, URL or publication date: {article.get('url')}")
+            continue
+        candidates.setdefault(generate_news_id(article), article)
+
+    news_ids = list(candidates)
+    existing = set()
+    for start in range(0, len(news_ids), 10000):
+        existing.update(NewsArticle.objects.filter(news_id__in=news_ids[start:start + 10000])
+                        .values_list('news_id', flat=True))
+
+    new_articles = [
+        NewsArticle(
+            news_id=news_id,
+            title=article['title'],
+            category=article['category'],
+            description=article['description'],
+            url=article['url'],
+            image_url=article.get('urlToImage'),
+            published_at=article['publishedAt'],
+        )
+        for news_id, article in candidates.items() if news_id not in existing
+    ]
+    new_news_ids = []
+    for start in range(0, len(new_articles), batch_size):
+        batch = new_articles[start:start + batch_size]
         try:
-            NewsArticle.objects.create(
-                news_id=news_id,
-                title=article['title'],
-                category=article['category'],
-                description=article['description'],
-                url=article['url'],
-                image_url =article['urlToImage'],
-                published_at=article['publishedAt'],
-            )
-            logger.info(f"Saved article: {article['title']}")
+            with transaction.atomic():
+                NewsArticle.objects.bulk_create(batch)
+            new_news_ids += [article.news_id for article in batch]
+        except IntegrityError:
+            # Another populate inserted some of these articles since the lookup; insert the batch one by one so
+            # only the articles inserted here are reported as new
+            new_news_ids += insert_each(batch)
 
-        except IntegrityError as e:
-            # If there's any error while saving, log it
-            logger.error(f"Error saving article {article['title']}: {str(e)}")
\ No newline at end of file
+    logger.info(f"Saved {len(new_news_ids)} new articles, skipped {len(candidates) - len(new_news_ids)} duplicates.")
+    return new_news_ids
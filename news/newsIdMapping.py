@@ -0,0 +1,147 @@
+import json
+import logging
+import os
+import struct
+
+import numpy as np
+from django.conf import settings
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Path to the stored FAISS position -> news_id mapping
+NEWS_ID_MAPPING_PATH = getattr(settings, 'NEWS_ID_MAPPING_PATH', 'news_id_mapping.bin')
+
+# Path of the JSON mapping written by older versions, read until the next index update replaces it
+LEGACY_MAPPING_PATH = 'news_id_to_index_mapping.json'
+
+# File layout: magic, format version, id width in bytes, entry count, then `count` fixed-width ASCII ids
+MAPPING_MAGIC = b'NIDMAP'
+MAPPING_FORMAT_VERSION = 1
+MAPPING_HEADER = struct.Struct('<6sHHQ')
+
+
+class NewsIdMapping:
+    """
+    Mapping between FAISS positions (ids) and news_ids, backed by a fixed-width byte array.
+
+    Position lookups are plain array indexing on the (memory-mapped) array. The reverse
+    news_id -> position hash index is built on first use only.
+    Positions whose article was removed hold an empty id.
+    """
+
+    def __init__(self, ids):
+        self.ids = ids
+        self._positions = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def from_news_ids(cls, news_ids):
+        """
+        Build a mapping where the position of each news_id in the list is its FAISS id.
+        """
+        width = max((len(news_id) for news_id in news_ids if news_id), default=1)
+        ids = np.array([(news_id or '').encode('ascii') for news_id in news_ids], dtype=f'S{width}')
+        return cls(ids)
+
+    def news_id_at(self, position):
+        """
+        Return the news_id stored at the given FAISS position, or None if there is none.
+        """
+        if position < 0 or position >= len(self.ids):
+            return None
+        news_id = self.ids[position]
+        return news_id.decode('ascii') if news_id else None
+
+    def news_ids_at(self, positions):
+        """
+        Return the news_ids for a row of FAISS search results, in order, skipping unknown positions.
+        """
+        return [news_id for news_id in (self.news_id_at(int(position)) for position in positions) if news_id]
+
+    def position_of(self, news_id):
+        """
+        Return the FAISS position of the given news_id, or None if it is not in the mapping.
+        """
+        if self._positions is None:
+            self._positions = {key: position for position, key in enumerate(self.ids.tolist()) if key}
+        return self._positions.get(news_id.encode('ascii'))
+
+    def extended(self, news_ids):
+        """
+        Return a new mapping with the given news_ids appended at positions len(self), len(self) + 1, ...
+        Existing positions never change, so FAISS ids stay stable across updates.
+        """
+        return NewsIdMapping.concatenated([self, NewsIdMapping.from_news_ids(news_ids)])
+
+    @classmethod
+    def concatenated(cls, mappings):
+        """
+        Return a mapping holding the positions of the given mappings one after another.
+        """
+        width = max(mapping.ids.itemsize for mapping in mappings)
+        return cls(np.concatenate([mapping.ids.astype(f'S{width}') for mapping in mappings]))
+
+    def cleared(self, positions):
+        """
+        Return a new mapping with the given positions emptied (their articles were removed from the index).
+        Positions are never reused; positions beyond the mapping hold no news_id and are ignored.
+        """
+        ids = np.array(self.ids)
+        positions = np.asarray(positions, dtype='int64')
+        ids[positions[(positions >= 0) & (positions < len(ids))]] = b''
+        return NewsIdMapping(ids)
+
+    def save(self, path=NEWS_ID_MAPPING_PATH):
+        """
+        Write the mapping to disk atomically (temporary file + rename).
+        """
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(MAPPING_HEADER.pack(MAPPING_MAGIC, MAPPING_FORMAT_VERSION, self.ids.itemsize, len(self.ids)))
+            f.write(np.ascontiguousarray(self.ids).tobytes())
+        os.replace(tmp_path, path)
+        logger.info(f"Saved news_id mapping with {len(self.ids)} entries to {path}.")
+
+    @classmethod
+    def load(cls, path=NEWS_ID_MAPPING_PATH):
+        """
+        Memory-map a mapping file written by `save`.
+        """
+        with open(path, 'rb') as f:
+            magic, version, width, count = MAPPING_HEADER.unpack(f.read(MAPPING_HEADER.size))
+
+        if magic != MAPPING_MAGIC or version != MAPPING_FORMAT_VERSION:
+            raise ValueError(f"Unsupported news_id mapping file {path} (version {version}).")
+
+        if count == 0:
+            return cls(np.array([], dtype=f'S{width}'))
+        ids = np.memmap(path, dtype=f'S{width}', mode='r', offset=MAPPING_HEADER.size, shape=(count,))
+        return cls(ids)
+
+
+def load_news_id_mapping(path=NEWS_ID_MAPPING_PATH, legacy_path=LEGACY_MAPPING_PATH):
+    """
+    Load the news_id mapping, falling back to the legacy JSON mapping if no binary mapping exists yet.
+
+    The legacy mapping is only read into memory, so web processes never write files: the next index update drops
+    the legacy index with its mapping and saves a binary mapping (see dataConvertor.load_index_for_update).
+
+    :return: A NewsIdMapping (empty if no mapping was found)
+    """
+    if os.path.exists(path):
+        return NewsIdMapping.load(path)
+
+    if legacy_path and os.path.exists(legacy_path):
+        with open(legacy_path, 'r') as f:
+            legacy = json.load(f)
+        news_ids = [None] * (max(map(int, legacy), default=-1) + 1)
+        for position, news_id in legacy.items():
+            news_ids[int(position)] = news_id
+        logger.info(f"Loaded legacy mapping {legacy_path}.")
+        return NewsIdMapping.from_news_ids(news_ids)
+
+    logger.error("Mapping file not found.")
+    return NewsIdMapping.from_news_ids([])
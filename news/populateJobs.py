@@ -0,0 +1,223 @@
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.utils import timezone
+
+from .categories import CATEGORIES
+from .models import PopulateJob
+from .stageTimers import StageTimers
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Whether web processes also run queued jobs in a background thread (development only: embedding and index builds
+# would then run next to the request workers); in production a `run_populate_jobs` worker runs them
+POPULATE_WORKER_IN_PROCESS = getattr(settings, 'POPULATE_WORKER_IN_PROCESS', False)
+
+# Seconds between two polls of the job worker for queued jobs
+POPULATE_POLL_INTERVAL = getattr(settings, 'POPULATE_POLL_INTERVAL', 5.0)
+
+# Minimum seconds between two progress reports of a running job
+POPULATE_PROGRESS_INTERVAL = getattr(settings, 'POPULATE_PROGRESS_INTERVAL', 1.0)
+
+# A running job without a progress report for this long is considered dead (its worker stopped) and failed
+POPULATE_STALE_AFTER = getattr(settings, 'POPULATE_STALE_AFTER', timedelta(minutes=30))
+
+
+def enqueue_job(kind=PopulateJob.KIND_POPULATE):
+    """
+    Queue a populate, reindex or rebuild job, unless a job of the same kind is already queued.
+
+    :param kind: PopulateJob.KIND_POPULATE, PopulateJob.KIND_REINDEX or PopulateJob.KIND_REBUILD
+    :return: The queued job of the given kind (the one already waiting, if any)
+    """
+    try:
+        with transaction.atomic():
+            return PopulateJob.objects.create(kind=kind)
+    except IntegrityError:
+        # Another job of the same kind is waiting and will pick up the latest news as well
+        job = PopulateJob.objects.filter(status=PopulateJob.STATUS_QUEUED, kind=kind).first()
+        if job is None:
+            # The waiting job started in the meantime
+            return enqueue_job(kind)
+        return job
+
+
+def fail_stale_jobs(now=None):
+    """
+    Fail the running jobs that stopped reporting progress, releasing the run lock.
+    :return: The number of failed jobs
+    """
+    now = now or timezone.now()
+    failed = PopulateJob.objects.filter(
+        status=PopulateJob.STATUS_RUNNING, heartbeat_at__lt=now - POPULATE_STALE_AFTER
+    ).update(status=PopulateJob.STATUS_FAILED, finished_at=now, error="The job stopped reporting progress.")
+    if failed:
+        logger.error(f"Failed {failed} populate jobs that stopped reporting progress.")
+    return failed
+
+
+def claim_next_job():
+    """
+    Mark the oldest queued job as running and return it.
+    :return: The claimed job, or None if no job is queued or a job is already running
+    """
+    try:
+        with transaction.atomic():
+            job = (PopulateJob.objects.select_for_update(skip_locked=True)
+                   .filter(status=PopulateJob.STATUS_QUEUED).order_by('id').first())
+            if job is None:
+                return None
+            job.status = PopulateJob.STATUS_RUNNING
+            job.started_at = job.heartbeat_at = timezone.now()
+            job.save(update_fields=['status', 'started_at', 'heartbeat_at'])
+            return job
+    except IntegrityError:
+        # Another job holds the run lock; the queued job stays queued
+        return None
+
+
+def start_job(kind, index_type=''):
+    """
+    Create a job that runs right away in the calling process (e.g. a management command), taking the run lock
+    so it never overlaps a job run by the worker.
+    :param index_type: The index type a rebuild job builds ('' to choose it from the vector count)
+    :return: The running job, or None if another job is running
+    """
+    fail_stale_jobs()
+    now = timezone.now()
+    try:
+        with transaction.atomic():
+            return PopulateJob.objects.create(kind=kind, index_type=index_type, status=PopulateJob.STATUS_RUNNING,
+                                              started_at=now, heartbeat_at=now)
+    except IntegrityError:
+        return None
+
+
+def run_job(job):
+    """
+    Run a claimed job, reporting its progress and per-stage durations on the job row.
+    """
+    # The ingest stack (NewsAPI client, embedding pipeline) is only loaded by the process that runs jobs,
+    # web processes that merely queue them do not pay for it
+    from .dataConvertor import process_and_store_embeddings, rebuild_faiss_index_from_store
+    from .populatePipeline import populate_news
+
+    last_report = 0.0
+
+    def report_progress(stage, timers, force=False):
+        nonlocal last_report
+        if not force and time.monotonic() - last_report < POPULATE_PROGRESS_INTERVAL:
+            return
+        last_report = time.monotonic()
+        job.progress = dict(job.progress, stage=stage, stages=timers.as_dict())
+        job.heartbeat_at = timezone.now()
+        job.save(update_fields=['progress', 'heartbeat_at'])
+
+    timers = StageTimers(listener=report_progress)
+    logger.info(f"Running {job.kind} job {job.pk}.")
+    try:
+        if job.kind == PopulateJob.KIND_REINDEX:
+            process_and_store_embeddings(timers=timers)
+        elif job.kind == PopulateJob.KIND_REBUILD:
+            with timers.stage('index'):
+                faiss_index = rebuild_faiss_index_from_store(job.index_type or None)
+            timers.count('index', faiss_index.ntotal)
+        else:
+            new_news_ids, _ = populate_news(CATEGORIES, timers=timers)
+            job.progress = dict(job.progress, new_articles=len(new_news_ids))
+        report_progress('done', timers, force=True)
+        job.status = PopulateJob.STATUS_SUCCEEDED
+    except Exception as e:
+        logger.error(f"Error running {job.kind} job {job.pk}: {str(e)}")
+        report_progress('failed', timers, force=True)
+        job.status = PopulateJob.STATUS_FAILED
+        job.error = str(e)
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'error', 'finished_at'])
+    logger.info(f"{job.kind.capitalize()} job {job.pk} {job.status} ({timers.report()}).")
+    return job
+
+
+def run_pending_jobs():
+    """
+    Run queued jobs one after the other until none is left.
+    :return: The number of jobs run
+    """
+    fail_stale_jobs()
+    count = 0
+    while True:
+        job = claim_next_job()
+        if job is None:
+            return count
+        run_job(job)
+        count += 1
+
+
+class PopulateWorker(threading.Thread):
+    """
+    Daemon thread running queued populate jobs every `interval` seconds.
+
+    Jobs are durable in the PopulateJob table, so jobs left queued when the process exits are run by the next worker.
+    """
+
+    def __init__(self, interval=POPULATE_POLL_INTERVAL):
+        super().__init__(name='populate-worker', daemon=True)
+        self.interval = interval
+        self._wakeup = threading.Event()
+        self._stopping = False
+
+    def run(self):
+        while not self._stopping:
+            try:
+                run_pending_jobs()
+            except Exception as e:
+                logger.error(f"Error running populate jobs: {str(e)}")
+            finally:
+                close_old_connections()
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+
+    def wake_up(self):
+        self._wakeup.set()
+
+    def stop(self):
+        self._stopping = True
+        self._wakeup.set()
+
+
+_populate_worker = None
+_populate_worker_lock = threading.Lock()
+
+
+def start_populate_worker():
+    """
+    Start the process-wide populate worker thread if it is not running yet, and make it look for queued jobs.
+    """
+    global _populate_worker
+    with _populate_worker_lock:
+        if _populate_worker is None or not _populate_worker.is_alive():
+            _populate_worker = PopulateWorker()
+            _populate_worker.start()
+            logger.info("Started the populate worker thread.")
+        else:
+            _populate_worker.wake_up()
+    return _populate_worker
+
+
+def serialize_job(job):
+    return {
+        'job_id': job.pk,
+        'kind': job.kind,
+        'index_type': job.index_type or None,
+        'status': job.status,
+        'progress': job.progress,
+        'error': job.error or None,
+        'created_at': job.created_at,
+        'started_at': job.started_at,
+        'finished_at': job.finished_at,
+    }
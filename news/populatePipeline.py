@@ -0,0 +1,63 @@
+import logging
+
+from django.conf import settings
+
+from .dataConvertor import EMBEDDING_CHUNK_SIZE, process_and_store_embeddings
+from .newsHandler import NewsFetcher, save_news_to_db
+from .stageTimers import StageTimers
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Number of fetched articles inserted into the database at a time
+POPULATE_CHUNK_SIZE = getattr(settings, 'POPULATE_CHUNK_SIZE', 1000)
+
+
+def populate_news(categories, chunk_size=POPULATE_CHUNK_SIZE, embedding_chunk_size=EMBEDDING_CHUNK_SIZE,
+                  fetcher=None, timers=None):
+    """
+    Fetch the news of the given categories, store the new articles and add them to the FAISS index.
+
+    Pages are inserted as they arrive, `chunk_size` articles at a time, while the remaining pages are still being
+    fetched; only the news IDs of the new articles are kept, and embedding streams them back from the database in
+    chunks of `embedding_chunk_size`.
+
+    :param categories: List of categories
+    :param chunk_size: Number of articles per insert
+    :param embedding_chunk_size: Number of articles per embedding chunk
+    :param fetcher: The NewsFetcher to use (default: a new one with the NEWS_API settings)
+    :param timers: Optional StageTimers collecting the time spent per stage
+    :return: Tuple of the list of news IDs of the new articles and the StageTimers of the run
+    """
+    timers = timers or StageTimers()
+    new_news_ids = []
+
+    def insert(articles):
+        with timers.stage('insert'):
+            new_news_ids.extend(save_news_to_db(articles))
+        timers.count('insert', len(articles))
+
+    owns_fetcher = fetcher is None
+    fetcher = fetcher or NewsFetcher()
+    try:
+        pages = fetcher.iter_pages(categories)
+        pending = []
+        while True:
+            with timers.stage('fetch'):
+                page = next(pages, None)
+            if page is None:
+                break
+            pending += page[2]
+            timers.count('fetch', len(page[2]))
+            while len(pending) >= chunk_size:
+                insert(pending[:chunk_size])
+                del pending[:chunk_size]
+        if pending:
+            insert(pending)
+    finally:
+        if owns_fetcher:
+            fetcher.close()
+
+    process_and_store_embeddings(new_news_ids, chunk_size=embedding_chunk_size, timers=timers)
+    logger.info(f"Populated {len(new_news_ids)} new articles ({timers.report()}).")
+    return new_news_ids, timers
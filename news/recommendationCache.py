@@ -0,0 +1,197 @@
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db.models import CharField, OuterRef, Subquery
+from django.db.models.functions import Cast
+
+from .indexService import get_index_service
+from .models import UserPreferences, UserProfileVector
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Cache backend for recommendation results: 'django' (Django cache framework, shared between workers when
+# CACHES points to a shared cache), 'local' (in-process LRU, one copy per worker) or None
+RECOMMENDATION_CACHE_BACKEND = getattr(settings, 'RECOMMENDATION_CACHE_BACKEND', 'django')
+
+# Seconds a cached result stays valid
+RECOMMENDATION_CACHE_TTL = getattr(settings, 'RECOMMENDATION_CACHE_TTL', 300)
+
+# Maximum number of entries of the in-process backend
+RECOMMENDATION_CACHE_MAX_ENTRIES = getattr(settings, 'RECOMMENDATION_CACHE_MAX_ENTRIES', 10000)
+
+# Django cache alias used by the 'django' backend
+RECOMMENDATION_CACHE_ALIAS = getattr(settings, 'RECOMMENDATION_CACHE_ALIAS', 'default')
+
+
+class LocalCacheBackend:
+    """
+    In-process cache with LRU eviction and a per-entry TTL.
+    """
+
+    def __init__(self, max_entries=RECOMMENDATION_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout):
+        with self._lock:
+            expires_at = time.monotonic() + timeout if timeout is not None else None
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class DjangoCacheBackend:
+    """
+    Cache backed by the Django cache framework, shared between processes when the cache is (memcached, redis, db, ...).
+    """
+
+    def __init__(self, alias=RECOMMENDATION_CACHE_ALIAS):
+        self.alias = alias
+
+    @property
+    def cache(self):
+        from django.core.cache import caches
+        return caches[self.alias]
+
+    def get(self, key):
+        return self.cache.get(key)
+
+    def set(self, key, value, timeout):
+        self.cache.set(key, value, timeout)
+
+    def clear(self):
+        self.cache.clear()
+
+
+def preference_version(user_id):
+    """
+    Return a digest of the stored preference state of a user (category weights and profile vector click count),
+    read with one query.
+
+    Every write that changes the user's recommendations changes the digest, whichever process makes it (web
+    request, click worker), so cache entries keyed by it never need to be invalidated explicitly.
+
+    :return: The digest, or None if the user has no preferences
+    """
+    user_id = str(user_id)
+    if not (user_id.isascii() and user_id.isdigit()):
+        return None
+    profile_clicks = UserProfileVector.objects.filter(
+        user_id=Cast(OuterRef('user_id'), output_field=CharField())
+    ).values('click_count')[:1]
+    row = (UserPreferences.objects.filter(user_id=user_id)
+           .annotate(profile_clicks=Subquery(profile_clicks))
+           .values_list('weights', 'last_updated', 'profile_clicks').first())
+    if row is None:
+        return None
+    weights, last_updated, clicks = row
+    state = bytes(weights) + f"|{last_updated.isoformat()}|{clicks}".encode('ascii')
+    return hashlib.blake2b(state, digest_size=12).hexdigest()
+
+
+class RecommendationCache:
+    """
+    Cache of recommendation results keyed by (user_id, preference version, index version, top_n).
+
+    The preference version is a digest of the user's preferences as stored in the database (see
+    `preference_version`) and the index version is the stamp of the published FAISS index, so stale results
+    are never served, even when the backend is not shared between processes; they simply age out of the backend.
+    """
+
+    def __init__(self, backend, ttl=RECOMMENDATION_CACHE_TTL):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(user_id, top_n, version, index_version):
+        return f"recommendations:{user_id}:{version}:{index_version}:{top_n}"
+
+    def get_or_compute(self, user_id, top_n, compute):
+        """
+        Return the cached recommendations of the user, computing and caching them on a miss.
+        :param compute: Callable (user_id, top_n) -> list of recommended articles
+        """
+        snapshot = get_index_service().get_snapshot()
+        version = preference_version(user_id)
+        if snapshot is None or version is None:
+            return compute(user_id, top_n)
+
+        key = self._key(user_id, top_n, version, snapshot.version)
+        recommendations = self.backend.get(key)
+        if recommendations is not None:
+            self.hits += 1
+            return recommendations
+
+        self.misses += 1
+        recommendations = compute(user_id, top_n)
+        if recommendations:
+            self.backend.set(key, recommendations, self.ttl)
+        return recommendations
+
+    def put(self, user_id, top_n, recommendations):
+        """
+        Store precomputed recommendations of the user for the current index version.
+        """
+        snapshot = get_index_service().get_snapshot()
+        version = preference_version(user_id)
+        if snapshot is not None and version is not None and recommendations:
+            self.backend.set(self._key(user_id, top_n, version, snapshot.version), recommendations, self.ttl)
+
+    @property
+    def hit_ratio(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+def create_backend(name=RECOMMENDATION_CACHE_BACKEND):
+    """
+    Create the cache backend configured by name, or None to disable caching.
+    """
+    if name == 'local':
+        return LocalCacheBackend()
+    if name == 'django':
+        return DjangoCacheBackend()
+    return None
+
+
+_recommendation_cache = None
+_recommendation_cache_lock = threading.Lock()
+
+
+def get_recommendation_cache():
+    """
+    Return the process-wide RecommendationCache, or None if caching is disabled.
+    """
+    global _recommendation_cache
+    if _recommendation_cache is None:
+        with _recommendation_cache_lock:
+            if _recommendation_cache is None:
+                backend = create_backend()
+                _recommendation_cache = RecommendationCache(backend) if backend is not None else False
+    return _recommendation_cache or None
+
@@ -1,25 +1,27 @@
 import numpy as np
 import faiss
-from .models import NewsArticle, UserPreferences
+from .categories import CATEGORIES
+from .decayFunction import effective_weights, load_preference_matrix
+from .models import NewsArticle, UserPreferences, UserProfileVector
+from .indexService import get_index_service
+from .newsIdMapping import NewsIdMapping, load_news_id_mapping
+from .recommendationCache import get_recommendation_cache
 from django.http import Http404, JsonResponse
 import logging
-import json
 
 # Set up a logger
 logger = logging.getLogger(__name__)
 
-# Path to the stored FAISS index file
-FAISS_INDEX_PATH = 'news_faiss.index'
+# Fields of NewsArticle returned for each recommended article
+ARTICLE_RESPONSE_FIELDS = ('news_id', 'title', 'category', 'description', 'url', 'image_url', 'published_at')
 
 def generate_user_preference_embedding(user_weights, embedding_dim):
     """
     Generate an embedding for the user's preferences based on category weights.
     This converts user weights into a vector that can be compared against article embeddings.
     """
-    categories = ['business', 'sports', 'technology', 'entertainment', 'health', 'general', 'science']
-
     # Create user embedding from weights
-    user_embedding = np.array([user_weights[category] for category in categories], dtype='float32')
+    user_embedding = np.array([user_weights[category] for category in CATEGORIES], dtype='float32')
 
     # Padding or truncating user embedding to match article embeddings
     if len(user_embedding) < embedding_dim:
@@ -30,27 +32,44 @@ def generate_user_preference_embedding(user_weights, embedding_dim):
     # Reshape to 2D array (1, embedding_dim) as faiss expects a 2D array
     user_embedding_2d = np.expand_dims(user_embedding, axis=0)
 
-    # Normalize the user embedding (L2 normalization)
+    # Normalize the user embedding (L2 normalization); article vectors are normalized at ingest,
+    # so the inner product scores returned by the index are cosine similarities comparable across users
     faiss.normalize_L2(user_embedding_2d)
 
     return user_embedding_2d  # return the 2D normalized user embedding
 
 
+def get_user_profile_embedding(user_id, embedding_dim):
+    """
+    Return the user's semantic profile vector (decayed mean of clicked article embeddings) as a normalized
+    2D query, or None if the user has not clicked any indexed article yet.
+    """
+    profile = UserProfileVector.objects.filter(user_id=user_id, click_count__gt=0).first()
+    if profile is None:
+        return None
+
+    user_embedding = np.expand_dims(profile.get_vector(), axis=0)
+    if user_embedding.shape[1] != embedding_dim or not user_embedding.any():
+        return None
+
+    faiss.normalize_L2(user_embedding)
+    return user_embedding
+
+
 def get_news_id_to_index_mapping():
     """
-    Retrieve the mapping of FAISS index to news IDs from the stored mapping file.
-    :return: Mapping of FAISS index to news_id
+    Retrieve the mapping of FAISS index to news IDs.
+    The mapping is loaded together with the resident FAISS index, so this does not touch the disk per call.
+    :return: NewsIdMapping of FAISS index to news_id
     """
+    snapshot = get_index_service().get_snapshot()
+    if snapshot is not None:
+        return snapshot.mapping
     try:
-        with open('news_id_to_index_mapping.json', 'r') as f:
-            news_id_to_index = json.load(f)
-        return news_id_to_index
-    except FileNotFoundError:
-        logger.error("Mapping file not found.")
-        return {}
+        return load_news_id_mapping()
     except Exception as e:
         logger.error(f"Error loading mapping: {str(e)}")
-        return {}
+        return NewsIdMapping.from_news_ids([])
 
 
 def get_news_id_from_faiss_index(faiss_index, index, news_id_to_index):
@@ -58,15 +77,46 @@ def get_news_id_from_faiss_index(faiss_index, index, news_id_to_index):
     Retrieve the news_id corresponding to a FAISS index using the news_id_to_index mapping.
     :param faiss_index: The FAISS index
     :param index: The FAISS index
-    :param news_id_to_index: The mapping of news_id to FAISS index
+    :param news_id_to_index: The NewsIdMapping of FAISS index to news_id
     :return: The corresponding news_id
     """
-    index_str = str(index)
-    if index_str in news_id_to_index:
-        return news_id_to_index[index_str]
-    else:
+    news_id = news_id_to_index.news_id_at(int(index))
+    if news_id is None:
         logger.error(f"FAISS index {index} not found in mapping.")
-        return None
+    return news_id
+
+
+def fetch_articles(news_ids):
+    """
+    Fetch the response fields of the given articles with a single query.
+    :return: A dict of news_id to NewsArticle; ids missing from the database are absent
+    """
+    return NewsArticle.objects.only(*ARTICLE_RESPONSE_FIELDS).in_bulk(list(news_ids), field_name='news_id')
+
+
+def hydrate_articles(news_ids, articles=None):
+    """
+    Fetch the articles for a ranked list of news IDs with a single query.
+    :param news_ids: The news IDs in rank order (as returned by the FAISS search)
+    :param articles: Articles already fetched with `fetch_articles` (skips the query)
+    :return: A list of article dicts in the same order; ids missing from the database are dropped
+    """
+    if articles is None:
+        articles = fetch_articles(news_ids)
+
+    hydrated_articles = []
+    seen = set()
+    for news_id in news_ids:
+        article = articles.get(news_id)
+        if article is None:
+            logger.error(f"Article with news_id {news_id} not found in the database.")
+            continue
+        if news_id in seen:
+            continue
+        seen.add(news_id)
+        hydrated_articles.append({field: getattr(article, field) for field in ARTICLE_RESPONSE_FIELDS})
+
+    return hydrated_articles
 
 
 def get_recommended_news(user_id, top_n=5):
@@ -77,56 +127,34 @@ def get_recommended_news(user_id, top_n=5):
     :return: A list of recommended news articles
     """
     try:
-        # Fetch user preferences from the database
+        # Fetch user preferences from the database (ids that are not integers belong to no user)
+        if not (str(user_id).isascii() and str(user_id).isdigit()):
+            raise UserPreferences.DoesNotExist
         user_pref = UserPreferences.objects.get(user_id=user_id)
 
-        # User preferences weights for each category
-        user_weights = {
-            'business': user_pref.business_weight,
-            'sports': user_pref.sports_weight,
-            'technology': user_pref.technology_weight,
-            'entertainment': user_pref.entertainment_weight,
-            'health': user_pref.health_weight,
-            'general': user_pref.general_weight,
-            'science': user_pref.science_weight,
-        }
+        # User preferences weights for each category, as shares of the user's total weight
+        user_weights = effective_weights(user_pref)
 
-        # Load FAISS index
-        faiss_index = faiss.read_index(FAISS_INDEX_PATH)
+        # Get the resident FAISS index (loaded once per process, reloaded when a new version is published)
+        snapshot = get_index_service().get_snapshot()
+        if snapshot is None:
+            raise RuntimeError("FAISS index is not available.")
+        faiss_index = snapshot.index
+        news_id_to_index = snapshot.mapping
 
-        # Generate the user embedding from preferences
-        user_embedding = generate_user_preference_embedding(user_weights, faiss_index.d)
+        # Use the user's profile vector once they clicked articles, otherwise generate the embedding from preferences
+        user_embedding = get_user_profile_embedding(user_id, faiss_index.d)
+        if user_embedding is None:
+            user_embedding = generate_user_preference_embedding(user_weights, faiss_index.d)
 
         # Perform a similarity search to find the most similar articles
         distances, indices = faiss_index.search(user_embedding, top_n)
 
-        # Fetch the recommended articles from the database using the updated method
-        recommended_articles = []
-
-        # Get the news_id to index mapping (from the FAISS index)
-        news_id_to_index = get_news_id_to_index_mapping()
-
-        for idx in indices[0]:
-            # Get the corresponding news_id from the FAISS index using the mapping
-            news_id = get_news_id_from_faiss_index(faiss_index, idx, news_id_to_index)
-
-            if news_id:
-                # Fetch the article from the database using the news_id
-                try:
-                    article = NewsArticle.objects.get(news_id=news_id)
-
-                    # Add the article to the recommendations
-                    recommended_articles.append({
-                        'news_id': article.news_id,
-                        'title': article.title,
-                        'category': article.category,
-                        'description': article.description,
-                        'url': article.url,
-                        'image_url':article.image_url,
-                        'published_at': article.published_at,
-                    })
-                except NewsArticle.DoesNotExist:
-                    logger.error(f"Article with news_id {news_id} not found in the database.")
+        # Get the corresponding news_ids from the FAISS index using the mapping, in rank order
+        news_ids = news_id_to_index.news_ids_at(indices[0])
+
+        # Fetch the recommended articles from the database in one query
+        recommended_articles = hydrate_articles(news_ids)
 
         # Log the recommendation action
         logger.info(f"Recommended {top_n} news articles for user {user_id}.")
@@ -147,6 +175,70 @@ def get_recommended_news(user_id, top_n=5):
         raise Exception({"error": "An error occurred while fetching recommendations."})
 
 
+def get_cached_recommended_news(user_id, top_n=5):
+    """
+    Return the recommendations of the user from the recommendation cache, computing them on a miss.
+    Cached results are invalidated when the user's preferences change or a new FAISS index is published.
+    :param user_id: The unique identifier for the user
+    :param top_n: The number of recommendations to return
+    :return: A list of recommended news articles
+    """
+    cache = get_recommendation_cache()
+    if cache is None:
+        return get_recommended_news(user_id, top_n)
+    return cache.get_or_compute(str(user_id), top_n, get_recommended_news)
+
+
+def get_recommended_news_batch(user_ids, top_n=5):
+    """
+    Generate recommendations for many users at once.
+    All user vectors are stacked into one matrix and searched with a single FAISS call, and the articles
+    of all users are hydrated with one query, so the cost is dominated by one matrix product.
+    :param user_ids: The unique identifiers of the users
+    :param top_n: The number of recommendations per user
+    :return: A dict of user_id to the list of recommended news articles; users without preferences are left out
+    """
+    user_ids = [str(user_id) for user_id in user_ids]
+
+    # Get the resident FAISS index (loaded once per process, reloaded when a new version is published)
+    snapshot = get_index_service().get_snapshot()
+    if snapshot is None:
+        raise RuntimeError("FAISS index is not available.")
+    faiss_index = snapshot.index
+    embedding_dim = faiss_index.d
+
+    # Load the category weights of all users as one matrix
+    found_user_ids, weight_matrix = load_preference_matrix(user_ids)
+    if not found_user_ids:
+        return {}
+    profiles = {str(profile.user_id): profile
+                for profile in UserProfileVector.objects.filter(user_id__in=found_user_ids, click_count__gt=0)}
+
+    # Stack one query vector per user: the profile vector if available, otherwise the category weights
+    user_embeddings = np.zeros((len(found_user_ids), embedding_dim), dtype='float32')
+    width = min(weight_matrix.shape[1], embedding_dim)
+    user_embeddings[:, :width] = weight_matrix[:, :width]
+    for row, user_id in enumerate(found_user_ids):
+        profile = profiles.get(user_id)
+        profile_vector = profile.get_vector() if profile is not None else None
+        if profile_vector is not None and profile_vector.shape[0] == embedding_dim and profile_vector.any():
+            user_embeddings[row] = profile_vector
+    faiss.normalize_L2(user_embeddings)
+
+    # Perform one similarity search for all users
+    distances, indices = faiss_index.search(user_embeddings, top_n)
+    ranked_news_ids = [snapshot.mapping.news_ids_at(row) for row in indices]
+
+    # Fetch the articles of all users from the database in one query
+    articles = fetch_articles({news_id for news_ids in ranked_news_ids for news_id in news_ids})
+
+    logger.info(f"Recommended {top_n} news articles for {len(found_user_ids)} users.")
+    return {
+        user_id: hydrate_articles(news_ids, articles)
+        for user_id, news_ids in zip(found_user_ids, ranked_news_ids)
+    }
+
+
 def get_user_clicked_articles(user_id):
     """
     Retrieve a list of articles that the user has already clicked on.
@@ -0,0 +1,42 @@
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+
+class StageTimers:
+    """
+    Wall time and number of processed items per stage of a pipeline.
+
+    The optional listener is called with the stage name and the timers whenever items are counted, e.g. to report
+    the progress of a job.
+    """
+
+    def __init__(self, listener=None):
+        self.seconds = defaultdict(float)
+        self.items = defaultdict(int)
+        self.listener = listener
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Add the time spent in the block to the given stage.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[name] += time.perf_counter() - start
+
+    def count(self, name, items):
+        """
+        Add processed items to the given stage.
+        """
+        self.items[name] += items
+        if self.listener is not None:
+            self.listener(name, self)
+
+    def as_dict(self):
+        return {name: {'seconds': round(seconds, 6), 'items': self.items[name]} for name, seconds in self.seconds.items()}
+
+    def report(self):
+        return ", ".join(f"{name} {seconds:.3f}s/{self.items[name]}" for name, seconds in self.seconds.items())
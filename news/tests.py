@@ -1,3 +1,1183 @@
-from django.test import TestCase
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta, timezone as dt_timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from unittest import mock
 
-# Create your tests here.
+import faiss
+import numpy as np
+from django.conf import settings
+from django.http import Http404
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+from django.urls import reverse
+from django.utils import timezone
+
+from .articleFeeds import FEED_MAX_PAGE_SIZE, get_category_feeds, get_latest_feed, parse_page_size
+from .clickQueue import enqueue_click, handle_click, process_pending_clicks
+from .dataConvertor import (
+    FAISS_IVF_PQ_THRESHOLD, FAISS_IVF_THRESHOLD, choose_index_type, clean_text, clean_texts, create_faiss_index,
+    get_index_type, index_factory_string, process_and_store_embeddings, trainable_index_type,
+)
+from .categories import CATEGORIES
+from .decayFunction import (
+    PREFERENCE_HALF_LIFE, effective_weights, fold_clicks_into_profile, load_preference_matrix,
+)
+from .embeddingEngine import EmbeddingCache, encode_texts, normalize_rows
+from .embeddingStore import EmbeddingStore, get_embedding_store
+from .indexService import FaissIndexService, IndexSnapshot, publish_index
+from .models import NewsArticle, PopulateJob, TrendingScore, UserInteractions, UserPreferences, UserProfileVector
+from .newsHandler import NewsFetcher, RateLimiter, generate_news_id, save_news_to_db
+from .nearDuplicates import assign_clusters, duplicate_positions, promote_cluster_members
+from .newsIdMapping import NewsIdMapping, load_news_id_mapping
+from .populateJobs import POPULATE_STALE_AFTER, claim_next_job, enqueue_job, run_pending_jobs
+from .populatePipeline import populate_news
+from .recommendationCache import DjangoCacheBackend, RecommendationCache
+from .recommendationSystem import (
+    generate_user_preference_embedding, get_cached_recommended_news, get_recommended_news, get_recommended_news_batch,
+)
+from .trendingFeed import (
+    TRENDING_HALF_LIFE, TrendingCache, decay_trending_scores, get_trending_cache, rebuild_trending_scores,
+)
+from .userPreferencesHandler import get_user_preferences, update_user_preferences_impl
+
+
+def make_articles(count, start=0):
+    """
+    Create `count` articles and return their news_ids in creation order.
+    """
+    news_ids = [f"{i:064x}" for i in range(start, start + count)]
+    NewsArticle.objects.bulk_create([
+        NewsArticle(
+            news_id=news_id,
+            title=f"Article {i}",
+            category='sports',
+            description=f"Description {i}",
+            url=f"https://example.com/{i}",
+            published_at=datetime(2025, 1, 1, tzinfo=dt_timezone.utc),
+        )
+        for i, news_id in enumerate(news_ids, start)
+    ])
+    return news_ids
+
+
+def make_category_articles():
+    """
+    Create one article per category and return their news_ids in category order.
+    """
+    news_ids = make_articles(len(CATEGORIES))
+    for news_id, category in zip(news_ids, CATEGORIES):
+        NewsArticle.objects.filter(news_id=news_id).update(category=category)
+    return news_ids
+
+
+def disable_index_service(test):
+    """
+    Make the click queue see no FAISS index for the duration of the test, so profile vectors are not updated.
+    """
+    patcher = mock.patch('news.clickQueue.get_index_service',
+                         return_value=mock.Mock(**{'get_snapshot.return_value': None}))
+    patcher.start()
+    test.addCleanup(patcher.stop)
+
+
+def use_temp_dir(test):
+    """
+    Run the test in a temporary working directory, where the index, mapping and embedding files are written.
+    """
+    cwd = os.getcwd()
+    temp_dir = tempfile.TemporaryDirectory()
+    os.chdir(temp_dir.name)
+    test.addCleanup(temp_dir.cleanup)
+    test.addCleanup(os.chdir, cwd)
+    return temp_dir.name
+
+
+def fake_encode_texts(texts, out=None, dim=32):
+    """
+    Stand-in for encode_texts returning a distinct random unit vector per text.
+    """
+    vectors = np.stack([np.random.default_rng(zlib.crc32(text.encode('utf-8'))).standard_normal(dim) for text in texts])
+    vectors = (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype('float32')
+    if out is None:
+        return vectors
+    out[:len(vectors)] = vectors
+    return out[:len(vectors)]
+
+
+def make_user(user_id):
+    """
+    Create the user with the given id.
+    """
+    user, created = get_user_model().objects.get_or_create(
+        pk=int(user_id), defaults={'email': f"user{user_id}@example.com", 'full_name': f"User {user_id}"}
+    )
+    return user
+
+
+def make_preferences(user_id, last_updated=None, **weights):
+    """
+    Create the user and their preferences with the given category weights (all other categories at 0).
+    """
+    user_pref = UserPreferences(user=make_user(user_id), last_updated=last_updated or timezone.now())
+    user_pref.set_weights([weights.get(category, 0.0) for category in CATEGORIES])
+    user_pref.save()
+    return user_pref
+
+
+def stored_weights(user_id):
+    """
+    Return the stored (undecayed) category weights of a user as a dictionary.
+    """
+    return dict(zip(CATEGORIES, UserPreferences.objects.get(user_id=user_id).get_weights().tolist()))
+
+
+class StubNewsAPI:
+    """
+    Local stand-in for the NewsAPI top headlines endpoint, serving `articles_per_category` articles per category.
+
+    `failures` maps a category to the number of 503 responses its requests get before succeeding. The server
+    records the number of connections it accepted and the highest number of requests it served at once.
+    """
+
+    def __init__(self, articles_per_category, failures=None, delay=0.0):
+        self.articles_per_category = articles_per_category
+        self.failures = dict(failures or {})
+        self.delay = delay
+        self.connections = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # Keep connections alive
+
+            def setup(self):
+                super().setup()
+                with stub._lock:
+                    stub.connections += 1
+
+            def do_GET(self):
+                params = {key: values[0] for key, values in parse_qs(urlparse(self.path).query).items()}
+                with stub._lock:
+                    stub.in_flight += 1
+                    stub.max_in_flight = max(stub.max_in_flight, stub.in_flight)
+                    failing = stub.failures.get(params['category'], 0) > 0
+                    if failing:
+                        stub.failures[params['category']] -= 1
+                time.sleep(stub.delay)
+                with stub._lock:
+                    stub.in_flight -= 1
+
+                if failing:
+                    self.respond(503, {'status': 'error'})
+                    return
+                page, page_size = int(params['page']), int(params['pageSize'])
+                numbers = range((page - 1) * page_size, min(page * page_size, stub.articles_per_category))
+                self.respond(200, {
+                    'status': 'ok',
+                    'totalResults': stub.articles_per_category,
+                    'articles': [
+                        {
+                            'title': f"{params['category']} {i}",
+                            'description': None,
+                            'url': f"https://example.com/{params['category']}/{i}",
+                            'urlToImage': None,
+                            'publishedAt': '2025-01-01T00:00:00Z',
+                        }
+                        for i in numbers
+                    ],
+                })
+
+            def respond(self, status, data):
+                body = json.dumps(data).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/v2/top-headlines"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def make_index_service(news_ids, dim=8):
+    """
+    Return a stand-in for the resident index service holding a random index over `news_ids`.
+    """
+    index = faiss.IndexFlatL2(dim)
+    index.add(np.random.default_rng(0).standard_normal((len(news_ids), dim), dtype='float32'))
+    service = mock.Mock()
+    service.get_snapshot.return_value = IndexSnapshot(index, NewsIdMapping.from_news_ids(news_ids), 'test')
+    return service
+
+
+class FakeSentenceModel:
+    """
+    Stand-in for the SBERT model returning an unnormalised random vector per text and recording its batches.
+    """
+
+    def __init__(self, dim=16):
+        self.dim = dim
+        self.batches = []
+
+    def get_sentence_embedding_dimension(self):
+        return self.dim
+
+    def encode(self, texts, batch_size=32, convert_to_numpy=True):
+        self.batches.append(list(texts))
+        return np.stack([3 * fake_encode_texts([text], dim=self.dim)[0] for text in texts])
+
+
+class EmbeddingEngineTests(SimpleTestCase):
+    def setUp(self):
+        self.model = FakeSentenceModel()
+        patcher = mock.patch('news.embeddingEngine.get_model', return_value=self.model)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_embeddings_are_returned_in_input_order_and_normalised(self):
+        texts = ["a much longer text", "a", "medium text", "a"]
+
+        embeddings = encode_texts(texts, batch_size=2, cache=None)
+
+        np.testing.assert_allclose(embeddings, fake_encode_texts(texts, dim=16), rtol=1e-5)
+        # Distinct texts are encoded once, in batches of similar length
+        self.assertEqual(self.model.batches, [["a", "medium text"], ["a much longer text"]])
+
+    def test_cached_texts_are_not_encoded_again(self):
+        cache = EmbeddingCache()
+        first = encode_texts(["first text", "second text"], cache=cache)
+        out = np.zeros((4, 16), dtype='float32')
+
+        second = encode_texts(["second text", "third text", "first text"], cache=cache, out=out)
+
+        self.assertEqual(self.model.batches[1:], [["third text"]])
+        np.testing.assert_array_equal(second[[0, 2]], first[[1, 0]])
+        self.assertEqual(second.shape, (3, 16))
+        self.assertTrue(np.shares_memory(second, out))
+
+
+class EmbeddingStoreTests(SimpleTestCase):
+    def setUp(self):
+        use_temp_dir(self)
+        self.vectors = fake_encode_texts([f"text {i}" for i in range(5)], dim=8)
+
+    def test_appended_rows_are_read_back_after_reopening(self):
+        store = EmbeddingStore()
+        store.append(self.vectors[:3], 0)
+        store.append(self.vectors[3:], 3)
+        with self.assertRaises(ValueError):
+            store.append(self.vectors[:1], 2)
+
+        reopened = EmbeddingStore()
+        self.assertEqual((len(reopened), reopened.dim, reopened.normalized), (5, 8, True))
+        np.testing.assert_array_equal(reopened.vectors_at([4, 0]), self.vectors[[4, 0]])
+        self.assertIsNone(reopened.vector_at(5))
+        mapping = NewsIdMapping.from_news_ids([f"{i:064x}" for i in range(5)])
+        np.testing.assert_array_equal(reopened.get(f"{2:064x}", mapping), self.vectors[2])
+
+    def test_data_file_never_shrinks_under_open_readers(self):
+        store = EmbeddingStore()
+        store.append(self.vectors, 0)
+        reader = EmbeddingStore().matrix()
+        size = os.path.getsize(store.path)
+
+        # Drop two unpublished rows and append one in their place
+        store.truncate(3)
+        store.append(self.vectors[:1], 3)
+
+        self.assertEqual(os.path.getsize(store.path), size)
+        self.assertEqual(len(EmbeddingStore()), 4)
+        np.testing.assert_array_equal(EmbeddingStore().vector_at(3), self.vectors[0])
+        # The reader's mapping of the larger file stays readable
+        np.testing.assert_array_equal(reader[4], self.vectors[4])
+
+
+class IndexFactoryTests(SimpleTestCase):
+    def test_index_type_follows_the_vector_count(self):
+        for vector_count, index_type in ((0, 'flat'), (FAISS_IVF_THRESHOLD - 1, 'flat'), (FAISS_IVF_THRESHOLD, 'ivf_flat'),
+                                         (FAISS_IVF_PQ_THRESHOLD - 1, 'ivf_flat'), (FAISS_IVF_PQ_THRESHOLD, 'ivf_pq')):
+            self.assertEqual(choose_index_type(vector_count), index_type, vector_count)
+        with mock.patch('news.dataConvertor.FAISS_INDEX_TYPE', 'hnsw'):
+            self.assertEqual(choose_index_type(10), 'hnsw')
+
+    def test_factory_strings_scale_with_the_corpus(self):
+        self.assertEqual(index_factory_string('flat', 10, 384), 'IDMap2,Flat')
+        # min(4 * sqrt(n), n / 39) lists, dim / 8 sub-quantizers
+        self.assertEqual(index_factory_string('ivf_flat', 10000, 384), 'IDMap2,IVF256,Flat')
+        self.assertEqual(index_factory_string('ivf_pq', 1000000, 384), 'IDMap2,IVF4000,PQ48')
+        self.assertEqual(index_factory_string('ivf_flat', 10, 384), 'IDMap2,IVF1,Flat')
+
+    def test_index_types_that_cannot_be_trained_fall_back_to_flat(self):
+        vectors = fake_encode_texts([f"text {i}" for i in range(100)], dim=16)
+        self.assertEqual(get_index_type(create_faiss_index(16, 'ivf_pq', vectors)), 'flat')
+        self.assertEqual(get_index_type(create_faiss_index(16, 'ivf_flat')), 'flat')
+        self.assertEqual(trainable_index_type('ivf_pq', 256), 'ivf_pq')
+        self.assertEqual(trainable_index_type('hnsw', 0), 'hnsw')
+
+    def test_created_indexes_are_trained_id_mapped_inner_product_indexes(self):
+        # A single sub-quantizer keeps PQ training fast
+        vectors = fake_encode_texts([f"text {i}" for i in range(2000)], dim=8)
+        for index_type in ('flat', 'ivf_flat', 'ivf_pq', 'hnsw'):
+            faiss_index = create_faiss_index(8, index_type, vectors)
+            self.assertEqual(get_index_type(faiss_index), index_type)
+            self.assertTrue(faiss_index.is_trained)
+            self.assertEqual(faiss_index.metric_type, faiss.METRIC_INNER_PRODUCT)
+
+            faiss_index.add_with_ids(vectors, np.arange(1000, 3000, dtype='int64'))
+            _, ids = faiss_index.search(vectors[:5], 1)
+            self.assertTrue(set(ids[:, 0].tolist()) <= set(range(1000, 3000)), index_type)
+
+
+class InnerProductScoreTests(SimpleTestCase):
+    def test_scores_of_normalised_vectors_are_cosine_similarities(self):
+        raw = np.random.default_rng(0).standard_normal((50, 16), dtype='float32') * 5
+        query = generate_user_preference_embedding({category: index + 1.0 for index, category in enumerate(CATEGORIES)}, 16)
+        faiss_index = create_faiss_index(16, 'flat')
+        faiss_index.add_with_ids(normalize_rows(raw.copy()), np.arange(50, dtype='int64'))
+
+        scores, ids = faiss_index.search(query, 50)
+
+        self.assertAlmostEqual(float(np.linalg.norm(query)), 1.0, places=5)
+        cosine = raw @ query[0] / np.linalg.norm(raw, axis=1) / np.linalg.norm(query[0])
+        np.testing.assert_allclose(scores[0], cosine[ids[0]], atol=1e-5)
+        # Ranked from the most to the least similar article
+        self.assertEqual(ids[0].tolist(), np.argsort(-cosine, kind='stable').tolist())
+
+
+class NewsIdMappingTests(SimpleTestCase):
+    def setUp(self):
+        use_temp_dir(self)
+
+    def test_saved_mapping_loads_back_memory_mapped(self):
+        news_ids = [f"{i:064x}" for i in range(5)]
+        mapping = NewsIdMapping.from_news_ids(news_ids).cleared([2])
+        mapping.save('mapping.bin')
+
+        loaded = NewsIdMapping.load('mapping.bin')
+        self.assertIsInstance(loaded.ids, np.memmap)
+        self.assertEqual(len(loaded), 5)
+        self.assertEqual(loaded.news_ids_at([4, 2, 0, 7, -1]), [news_ids[4], news_ids[0]])
+        self.assertEqual(loaded.position_of(news_ids[3]), 3)
+        self.assertIsNone(loaded.position_of(news_ids[2]))
+        self.assertEqual(len(load_news_id_mapping('missing.bin', None)), 0)
+
+    def test_legacy_json_mapping_is_read_without_writing_files(self):
+        with open('legacy.json', 'w') as f:
+            json.dump({'0': 'a' * 64, '2': 'c' * 64}, f)
+
+        mapping = load_news_id_mapping('mapping.bin', 'legacy.json')
+        self.assertEqual(len(mapping), 3)
+        self.assertEqual([mapping.news_id_at(position) for position in range(3)], ['a' * 64, None, 'c' * 64])
+        self.assertFalse(os.path.exists('mapping.bin'))
+
+        # The binary mapping takes precedence once an index update saved it
+        NewsIdMapping.from_news_ids(['b' * 64]).save('mapping.bin')
+        self.assertEqual(load_news_id_mapping('mapping.bin', 'legacy.json').position_of('b' * 64), 0)
+
+
+class IndexServiceTests(SimpleTestCase):
+    def setUp(self):
+        use_temp_dir(self)
+
+    def publish(self, count):
+        news_ids = [f"{i:064x}" for i in range(count)]
+        faiss_index = faiss.IndexIDMap2(faiss.IndexFlatIP(8))
+        faiss_index.add_with_ids(np.eye(count, 8, dtype='float32'), np.arange(count, dtype='int64'))
+        NewsIdMapping.from_news_ids(news_ids).save('news_id_mapping.bin')
+        publish_index(faiss_index, 'news_faiss.index')
+
+    def test_published_index_is_swapped_in_after_the_check_interval(self):
+        self.publish(2)
+        service = FaissIndexService('news_faiss.index', 'news_id_mapping.bin', None, check_interval=3600)
+        first = service.get_snapshot()
+        self.assertEqual((first.index.ntotal, len(first.mapping)), (2, 2))
+
+        self.publish(3)
+        # Within the check interval the resident snapshot keeps being served
+        self.assertIs(service.get_snapshot(), first)
+
+        second = service.reload()
+        self.assertEqual((second.index.ntotal, len(second.mapping)), (3, 3))
+        self.assertIs(service.get_snapshot(), second)
+        self.assertNotEqual(second.version, first.version)
+        # Searches that started on the old snapshot still see a complete old version
+        _, indices = first.index.search(np.eye(1, 8, 1, dtype='float32'), 1)
+        self.assertEqual(first.mapping.news_ids_at(indices[0]), [f"{1:064x}"])
+
+    def test_unreadable_index_file_keeps_the_current_snapshot(self):
+        self.publish(2)
+        service = FaissIndexService('news_faiss.index', 'news_id_mapping.bin', None, check_interval=0)
+        first = service.get_snapshot()
+
+        with open('news_faiss.index.tmp', 'wb') as f:
+            f.write(b'not an index')
+        os.replace('news_faiss.index.tmp', 'news_faiss.index')
+
+        self.assertIs(service.get_snapshot(), first)
+        self.assertIs(service.reload(), first)
+
+
+class RecommendationHydrationTests(TestCase):
+    def setUp(self):
+        make_preferences('1', sports=1.0)
+
+    def test_query_count_is_constant_for_any_top_n(self):
+        news_ids = make_articles(40)
+        with mock.patch('news.recommendationSystem.get_index_service', return_value=make_index_service(news_ids)):
+            for top_n in (1, 5, 21, 40):
+                with self.assertNumQueries(3):
+                    recommendations = get_recommended_news('1', top_n)
+                self.assertEqual(len(recommendations), top_n)
+
+    def test_results_keep_faiss_rank_order_and_drop_missing_articles(self):
+        news_ids = make_articles(10)
+        service = make_index_service(news_ids)
+        snapshot = service.get_snapshot()
+        _, indices = snapshot.index.search(np.ones((1, snapshot.index.d), dtype='float32') / 8 ** 0.5, 10)
+        ranked = snapshot.mapping.news_ids_at(indices[0])
+
+        NewsArticle.objects.filter(news_id=ranked[1]).delete()
+
+        with mock.patch('news.recommendationSystem.get_index_service', return_value=service):
+            with mock.patch('news.recommendationSystem.generate_user_preference_embedding',
+                            return_value=np.ones((1, snapshot.index.d), dtype='float32') / 8 ** 0.5):
+                recommendations = get_recommended_news('1', 10)
+
+        self.assertEqual([article['news_id'] for article in recommendations], ranked[:1] + ranked[2:])
+
+
+class BatchRecommendationTests(TestCase):
+    def test_batch_matches_the_recommendations_of_each_user(self):
+        news_ids = make_articles(30)
+        make_preferences('1', sports=1.0)
+        make_preferences('2', business=3.0, technology=1.0)
+        make_preferences('3', health=1.0)
+        profile = UserProfileVector(user_id='3', click_count=2)
+        profile.set_vector(np.random.default_rng(1).standard_normal(8).astype('float32'))
+        profile.save()
+
+        with mock.patch('news.recommendationSystem.get_index_service', return_value=make_index_service(news_ids)):
+            with self.assertNumQueries(3):
+                batch = get_recommended_news_batch([1, '2', '3', '4'], 7)
+            single = {user_id: get_recommended_news(user_id, 7) for user_id in ('1', '2', '3')}
+
+        # Users without preferences are left out
+        self.assertEqual(batch, single)
+        self.assertNotEqual(batch['1'], batch['3'])
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class RecommendationCacheTests(TestCase):
+    def setUp(self):
+        make_preferences('1', sports=1.0)
+        self.service = make_index_service(make_articles(20))
+        self.cache = RecommendationCache(DjangoCacheBackend())
+        self.cache.backend.clear()
+        for target in ('news.recommendationSystem.get_index_service', 'news.recommendationCache.get_index_service'):
+            patcher = mock.patch(target, return_value=self.service)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        for target in ('news.recommendationSystem.get_recommendation_cache',
+                       'news.recommendationCache.get_recommendation_cache'):
+            patcher = mock.patch(target, return_value=self.cache)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_repeated_request_is_served_from_cache(self):
+        first = get_cached_recommended_news('1', 5)
+        # Only the preference version is read
+        with self.assertNumQueries(1):
+            second = get_cached_recommended_news('1', 5)
+
+        self.assertEqual(first, second)
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+    def test_preference_update_invalidates_cached_recommendations(self):
+        get_cached_recommended_news('1', 5)
+        update_user_preferences_impl('1', ['business'])
+        get_cached_recommended_news('1', 5)
+
+        self.assertEqual((self.cache.hits, self.cache.misses), (0, 2))
+
+    def test_preference_change_made_by_another_process_invalidates_cached_recommendations(self):
+        get_cached_recommended_news('1', 5)
+        # A click applied by the click worker writes the weights without touching this process' cache
+        user_pref = UserPreferences.objects.get(user_id='1')
+        user_pref.set_weights(user_pref.get_weights() + np.eye(len(CATEGORIES), dtype='float32')[0] * 0.02)
+        UserPreferences.objects.filter(pk=user_pref.pk).update(weights=user_pref.weights)
+        get_cached_recommended_news('1', 5)
+
+        self.assertEqual((self.cache.hits, self.cache.misses), (0, 2))
+
+    def test_new_index_version_invalidates_cached_recommendations(self):
+        get_cached_recommended_news('1', 5)
+        snapshot = self.service.get_snapshot()
+        self.service.get_snapshot.return_value = IndexSnapshot(snapshot.index, snapshot.mapping, 'new-version')
+        get_cached_recommended_news('1', 5)
+
+        self.assertEqual((self.cache.hits, self.cache.misses), (0, 2))
+
+
+class ClickPreferenceUpdateTests(TestCase):
+    def setUp(self):
+        self.news_ids = make_category_articles()
+        disable_index_service(self)
+
+    def click(self, user_id, category):
+        return handle_click(user_id, self.news_ids[CATEGORIES.index(category)], mode='sync')
+
+    def test_sync_click_is_applied_before_returning(self):
+        make_preferences('1', business=0.5, sports=0.5)
+
+        self.assertTrue(self.click('1', 'sports'))
+
+        weights = stored_weights('1')
+        self.assertAlmostEqual(weights['sports'], 0.5 + 0.02)
+        self.assertAlmostEqual(weights['business'], 0.5)
+        self.assertFalse(UserInteractions.objects.filter(processed=False).exists())
+
+    def test_async_click_is_left_to_the_click_worker(self):
+        make_preferences('1', business=0.5, sports=0.5)
+
+        with mock.patch('news.clickQueue.start_click_worker') as start_click_worker:
+            self.assertFalse(handle_click('1', self.news_ids[CATEGORIES.index('sports')], mode='async'))
+        start_click_worker.assert_not_called()
+
+        self.assertAlmostEqual(stored_weights('1')['sports'], 0.5)
+        self.assertTrue(UserInteractions.objects.filter(processed=False).exists())
+
+    def test_first_click_of_new_user_gives_clicked_category_all_weight(self):
+        make_user('2')
+        self.click('2', 'science')
+
+        user_weights = get_user_preferences('2')
+        self.assertAlmostEqual(user_weights['science'], 1.0)
+        self.assertAlmostEqual(user_weights['business'], 0.0)
+
+    def test_click_of_unknown_or_invalid_user_is_rejected(self):
+        with self.assertRaises(Http404):
+            self.click('2', 'science')
+        with self.assertRaises(ValueError):
+            self.click('abc', 'science')
+
+        url = reverse('handle_user_click')
+        news_id = self.news_ids[CATEGORIES.index('science')]
+        self.assertEqual(self.client.post(f"{url}?user_id=2&news_id={news_id}").status_code, 404)
+        self.assertEqual(self.client.post(f"{url}?user_id=abc&news_id={news_id}").status_code, 400)
+        self.assertEqual(self.client.post(f"{url}?news_id={news_id}").status_code, 400)
+        self.assertFalse(UserInteractions.objects.exists())
+        self.assertFalse(UserPreferences.objects.exists())
+
+    def test_weights_decay_with_elapsed_time(self):
+        half_life_ago = timezone.now() - timedelta(seconds=PREFERENCE_HALF_LIFE)
+        user_pref = make_preferences('1', business=1.0, last_updated=half_life_ago)
+        self.click('1', 'sports')
+
+        # The click is boosted by the half-life that elapsed, so it counts double relative to the older weights
+        user_pref.refresh_from_db()
+        self.assertEqual(user_pref.last_updated, half_life_ago)
+        self.assertAlmostEqual(stored_weights('1')['sports'], 0.04, places=5)
+
+        user_weights = effective_weights(user_pref)
+        self.assertAlmostEqual(user_weights['business'], 1 / 1.04, places=5)
+        self.assertAlmostEqual(user_weights['sports'], 0.04 / 1.04, places=5)
+
+    def test_weights_of_long_idle_users_do_not_underflow(self):
+        long_ago = timezone.now() - timedelta(seconds=130 * PREFERENCE_HALF_LIFE)
+        make_preferences('1', business=0.75, sports=0.25, last_updated=long_ago)
+
+        self.assertAlmostEqual(get_user_preferences('1')['business'], 0.75)
+        self.assertAlmostEqual(get_user_preferences('1')['sports'], 0.25)
+        _, matrix = load_preference_matrix(['1'])
+        np.testing.assert_allclose(matrix[0, :2], [0.75, 0.25], rtol=1e-6)
+        query = generate_user_preference_embedding(effective_weights(UserPreferences.objects.get(user_id='1')), 8)
+        np.testing.assert_allclose(query[0, :2], np.array([3, 1]) / 10 ** 0.5, rtol=1e-6)
+
+    def test_old_weights_are_rebased_before_a_click(self):
+        long_ago = timezone.now() - timedelta(seconds=50 * PREFERENCE_HALF_LIFE)
+        make_preferences('1', business=1.0, last_updated=long_ago)
+        self.click('1', 'sports')
+
+        self.assertGreater(UserPreferences.objects.get(user_id='1').last_updated, long_ago)
+        weights = stored_weights('1')
+        self.assertAlmostEqual(weights['sports'], 0.02)
+        self.assertAlmostEqual(weights['business'] / 0.5 ** 50, 1.0, places=4)
+
+
+class ConcurrentClickTests(TransactionTestCase):
+    @skipUnlessDBFeature('has_select_for_update')
+    def test_concurrent_clicks_of_same_user_are_not_lost(self):
+        news_id = make_category_articles()[CATEGORIES.index('sports')]
+        disable_index_service(self)
+        make_preferences('1', business=1.0)
+        threads_count, clicks_per_thread = 4, 10
+
+        def click():
+            try:
+                for _ in range(clicks_per_thread):
+                    handle_click('1', news_id, mode='sync')
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=click) for _ in range(threads_count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # Every click adds its boost to the stored weight, so only lost updates can change the result
+        self.assertAlmostEqual(stored_weights('1')['sports'], 0.02 * threads_count * clicks_per_thread, places=5)
+
+
+class ClickQueueTests(TestCase):
+    def setUp(self):
+        self.news_ids = make_category_articles()
+        disable_index_service(self)
+
+    def test_coalesced_clicks_match_sequential_updates(self):
+        clicked = [1, 1, 4, 0, 1, 6, 6, 2]
+        make_preferences('1', business=0.5, sports=0.5)
+        make_preferences('2', business=0.5, sports=0.5)
+        for index in clicked:
+            enqueue_click('1', self.news_ids[index])
+            handle_click('2', self.news_ids[index], mode='sync')
+        make_user('3')
+        enqueue_click('3', self.news_ids[5])
+        # A click queued before its user was deleted
+        UserInteractions.objects.create(user_id='4', news_article=NewsArticle.objects.get(news_id=self.news_ids[5]),
+                                        clicked=True)
+
+        # 8 queries for the preferences and the queue, 1 INSERT and 1 UPDATE per distinct click count for trending
+        with self.assertNumQueries(12):
+            self.assertEqual(process_pending_clicks(), len(clicked) + 2)
+
+        coalesced, sequential = stored_weights('1'), stored_weights('2')
+        for name in CATEGORIES:
+            self.assertAlmostEqual(coalesced[name], sequential[name], places=6)
+        self.assertAlmostEqual(get_user_preferences('3')['general'], 1.0)
+        # Clicks of unknown users are dropped
+        self.assertFalse(UserPreferences.objects.filter(user_id=4).exists())
+        self.assertFalse(UserInteractions.objects.filter(processed=False).exists())
+        self.assertEqual(process_pending_clicks(), 0)
+
+    def test_profile_fold_matches_sequential_updates(self):
+        embeddings = np.random.default_rng(0).standard_normal((5, 8))
+        profile, count = None, 0
+        for embedding in embeddings:
+            profile, count = fold_clicks_into_profile(profile, count, embedding[np.newaxis], 0.02)
+
+        coalesced, coalesced_count = fold_clicks_into_profile(None, 0, embeddings, 0.02)
+        self.assertEqual(coalesced_count, count)
+        np.testing.assert_allclose(coalesced, profile, rtol=1e-5)
+
+
+class UserIdValidationTests(TestCase):
+    def test_recommendations_of_invalid_or_unknown_users_are_not_found(self):
+        make_user('1')
+        for user_id in ('abc', '1', '99'):
+            response = self.client.get(reverse('recommend_news'), {'user_id': user_id})
+            self.assertEqual(response.status_code, 404, user_id)
+
+    def test_preferences_of_invalid_or_unknown_users_are_not_updated(self):
+        url = reverse('update_user_preferences')
+        for user_id in ('abc', '99'):
+            response = self.client.post(f"{url}?user_id={user_id}", {'categories': ['sports']},
+                                        content_type='application/json')
+            self.assertEqual(response.status_code, 404, user_id)
+            self.assertEqual(response.json(), {'error': f"User with ID {user_id} does not exist."})
+        self.assertFalse(UserPreferences.objects.exists())
+
+        make_user('1')
+        response = self.client.post(f"{url}?user_id=1", {'categories': ['sports']}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertAlmostEqual(get_user_preferences('1')['sports'], 1.0)
+
+
+class PreferenceStorageTests(TestCase):
+    def test_preference_matrix_is_loaded_with_one_query(self):
+        make_preferences('1', business=1.0)
+        make_preferences('2', sports=0.25, science=0.75)
+        # Weights stored before the last categories were added read as 0 for them
+        UserPreferences.objects.create(user=make_user('3'), weights=np.array([0.5, 0.5], dtype='float32').tobytes())
+
+        with self.assertNumQueries(1):
+            user_ids, matrix = load_preference_matrix(['1', '2', '3', '4'])
+
+        self.assertEqual(user_ids, ['1', '2', '3'])
+        self.assertEqual(matrix.shape, (3, len(CATEGORIES)))
+        self.assertTrue(matrix.flags['C_CONTIGUOUS'])
+        np.testing.assert_allclose(matrix[1], [0, 0.25, 0, 0, 0, 0, 0.75], atol=1e-6)
+        np.testing.assert_allclose(matrix[2], [0.5, 0.5, 0, 0, 0, 0, 0], atol=1e-6)
+
+
+class ArticleFeedTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        # Pairs of articles share a publication time, so pages must break ties by id
+        NewsArticle.objects.bulk_create([
+            NewsArticle(
+                news_id=f"{category}-{i}",
+                title=f"{category} {i}",
+                category=category,
+                url=f"https://example.com/{category}/{i}",
+                published_at=datetime(2025, 1, 1, tzinfo=dt_timezone.utc) + timedelta(hours=i // 2),
+            )
+            for category in ('sports', 'health')
+            for i in range(7)
+        ])
+
+    def test_multiple_categories_are_fetched_with_one_query(self):
+        with self.assertNumQueries(1):
+            feeds = get_category_feeds(['sports', 'health', 'science'], page_size=3)
+
+        self.assertEqual([a['news_id'] for a in feeds['sports'][0]], ['sports-6', 'sports-5', 'sports-4'])
+        self.assertEqual([a['news_id'] for a in feeds['health'][0]], ['health-6', 'health-5', 'health-4'])
+        self.assertEqual(feeds['science'], ([], None))
+
+    def test_category_pages_continue_after_cursor(self):
+        seen, cursors = [], []
+        while True:
+            articles, cursor = get_category_feeds(['sports'], page_size=3, cursors=cursors)['sports']
+            seen += [article['news_id'] for article in articles]
+            if cursor is None:
+                break
+            cursors = [cursor]
+        self.assertEqual(seen, [f"sports-{i}" for i in range(6, -1, -1)])
+
+    def test_latest_pages_continue_after_cursor(self):
+        seen, cursor = [], None
+        while True:
+            articles, cursor = get_latest_feed(page_size=4, cursor=cursor)
+            seen += [article['news_id'] for article in articles]
+            if cursor is None:
+                break
+        self.assertEqual(len(seen), 14)
+        self.assertEqual(len(set(seen)), 14)
+
+    def test_invalid_cursor_and_page_size_are_rejected(self):
+        response = self.client.get(reverse('get_trending_news'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 400)
+        # Valid base64 JSON that is not a cursor object: [1], {"p": 1, "i": "x"}, {"p": "2025-01-01", "i": 1, "c": [1]}
+        for cursor in ('WzFd', 'eyJwIjogMSwgImkiOiAieCJ9', 'eyJwIjogIjIwMjUtMDEtMDEiLCAiaSI6IDEsICJjIjogWzFdfQ=='):
+            response = self.client.get(reverse('categories_articles'), {'categories': 'sports', 'cursor': cursor})
+            self.assertEqual(response.status_code, 400, cursor)
+        self.assertEqual(parse_page_size('1000'), FEED_MAX_PAGE_SIZE)
+        with self.assertRaises(ValueError):
+            parse_page_size('ten')
+
+
+class TrendingFeedTests(TestCase):
+    def setUp(self):
+        self.news_ids = make_articles(5)
+        self.article_ids = dict(NewsArticle.objects.values_list('news_id', 'id'))
+        for user_id in ('1', '2'):
+            make_user(user_id)
+        patcher = mock.patch('news.clickQueue.get_index_service',
+                             return_value=mock.Mock(**{'get_snapshot.return_value': None}))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        get_trending_cache().invalidate()
+        self.addCleanup(get_trending_cache().invalidate)
+
+    def click(self, *indexes):
+        for index in indexes:
+            enqueue_click('1', self.news_ids[index])
+        process_pending_clicks()
+
+    def score(self, index):
+        return TrendingScore.objects.get(news_article_id=self.article_ids[self.news_ids[index]]).score
+
+    def test_clicks_rank_articles_and_newest_articles_fill_the_list(self):
+        self.click(3, 1, 3, 3, 1, 4)
+        NewsArticle.objects.filter(news_id=self.news_ids[2]).update(
+            published_at=datetime(2025, 6, 1, tzinfo=dt_timezone.utc))
+
+        trending = [article['news_id'] for article in TrendingCache(top_k=4).get()]
+
+        self.assertEqual(trending, [self.news_ids[3], self.news_ids[1], self.news_ids[4], self.news_ids[2]])
+
+    def test_decay_pass_halves_scores_per_half_life_and_drops_faded_ones(self):
+        self.click(0, 0, 1)
+        now = timezone.now() + TRENDING_HALF_LIFE
+        TrendingScore.objects.update(decayed_at=now - TRENDING_HALF_LIFE)
+
+        self.assertEqual(decay_trending_scores(now, min_score=0.75), (1, 1))
+        self.assertAlmostEqual(self.score(0), 1.0)
+        self.assertFalse(TrendingScore.objects.filter(news_article_id=self.article_ids[self.news_ids[1]]).exists())
+
+    def test_rebuild_matches_incremental_scores(self):
+        self.click(2, 2, 0)
+        incremental = {index: self.score(index) for index in (0, 2)}
+
+        rebuild_trending_scores()
+
+        for index, score in incremental.items():
+            self.assertAlmostEqual(self.score(index), score, places=3)
+
+    def test_trending_list_is_served_from_memory_until_it_expires(self):
+        self.click(4)
+        response = self.client.get(reverse('get_trending_news'), {'page_size': 2})
+        self.assertEqual(response.json()['trending_news'][0]['news_id'], self.news_ids[4])
+
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('get_trending_news'),
+                                       {'page_size': 2, 'cursor': response.json()['next_cursor']})
+        self.assertEqual(len(response.json()['trending_news']), 2)
+
+
+class NewsFetcherTests(SimpleTestCase):
+    def test_pages_of_all_categories_are_fetched_in_parallel_over_pooled_connections(self):
+        with StubNewsAPI(articles_per_category=25, delay=0.05) as stub:
+            with NewsFetcher(url=stub.url, api_key='test', concurrency=4, rate_limit=None, page_size=10) as fetcher:
+                articles = fetcher.fetch(CATEGORIES)
+
+        # 3 pages per category, in category order and page order
+        self.assertEqual(
+            [(article['category'], article['title']) for article in articles],
+            [(category, f"{category} {i}") for category in CATEGORIES for i in range(25)],
+        )
+        self.assertGreater(stub.max_in_flight, 1)
+        self.assertLessEqual(stub.max_in_flight, 4)
+        self.assertLessEqual(stub.connections, 4)
+
+    def test_failed_requests_are_retried(self):
+        with StubNewsAPI(articles_per_category=5, failures={'sports': 2}) as stub:
+            with NewsFetcher(url=stub.url, api_key='test', rate_limit=None, backoff=0) as fetcher:
+                articles = fetcher.fetch(['sports', 'health'])
+        self.assertEqual(len(articles), 10)
+
+    def test_category_failing_after_retries_does_not_affect_others(self):
+        with StubNewsAPI(articles_per_category=5, failures={'sports': 10}) as stub:
+            with NewsFetcher(url=stub.url, api_key='test', rate_limit=None, max_retries=1, backoff=0) as fetcher:
+                articles = fetcher.fetch(['sports', 'health'])
+        self.assertEqual({article['category'] for article in articles}, {'health'})
+
+    def test_rate_limiter_spaces_requests(self):
+        limiter = RateLimiter(rate=50, burst=1)
+        start = time.monotonic()
+        for _ in range(6):
+            limiter.acquire()
+        self.assertGreaterEqual(time.monotonic() - start, 5 / 50 * 0.9)
+
+
+class NewsIngestTests(TestCase):
+    def make_news(self, count):
+        return [
+            {
+                'title': f"Title {i}",
+                'description': None,
+                'url': f"https://example.com/{i}",
+                'urlToImage': None,
+                'publishedAt': '2025-01-01T00:00:00Z',
+                'category': 'health',
+            }
+            for i in range(count)
+        ]
+
+    def test_ingest_costs_one_lookup_and_one_insert_per_batch(self):
+        articles = self.make_news(5)
+        save_news_to_db(articles[:2])
+
+        # 1 lookup of the existing ids, 2 INSERTs of up to 2 rows (each within a SAVEPOINT and its RELEASE)
+        with self.assertNumQueries(7):
+            new_news_ids = save_news_to_db(articles + articles[3:], batch_size=2)
+
+        self.assertEqual(new_news_ids, [generate_news_id(article) for article in articles[2:]])
+        self.assertEqual(NewsArticle.objects.count(), 5)
+
+    def test_articles_inserted_concurrently_are_not_reported_as_new(self):
+        articles = self.make_news(5)
+        save_news_to_db([articles[1], articles[3]])
+
+        # Another populate inserted two articles after the lookup of the existing ids
+        with mock.patch.object(NewsArticle.objects, 'filter', return_value=NewsArticle.objects.none()):
+            new_news_ids = save_news_to_db(articles, batch_size=2)
+
+        self.assertEqual(new_news_ids, [generate_news_id(articles[i]) for i in (0, 2, 4)])
+        self.assertEqual(NewsArticle.objects.count(), 5)
+
+    def test_articles_without_required_fields_are_skipped(self):
+        articles = self.make_news(2)
+        articles[0]['title'] = None
+        self.assertEqual(save_news_to_db(articles), [generate_news_id(articles[1])])
+
+
+class IncrementalIndexTests(TestCase):
+    def setUp(self):
+        use_temp_dir(self)
+        model = mock.Mock()
+        model.get_sentence_embedding_dimension.return_value = 32
+        for target, kwargs in (('news.dataConvertor.encode_texts', {'side_effect': fake_encode_texts}),
+                               ('news.dataConvertor.get_model', {'return_value': model}),
+                               ('news.dataConvertor.get_index_service', {}),
+                               ('news.embeddingStore._embedding_store', {'new': None})):
+            patcher = mock.patch(target, **kwargs)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def indexed_ids(self, faiss_index):
+        return sorted(faiss.vector_to_array(faiss_index.id_map).tolist())
+
+    def test_new_articles_are_added_with_new_ids(self):
+        news_ids = make_articles(3)
+        faiss_index, mapping = process_and_store_embeddings(chunk_size=2)
+        self.assertEqual(self.indexed_ids(faiss_index), [0, 1, 2])
+
+        new_news_ids = make_articles(2, start=3)
+        faiss_index, mapping = process_and_store_embeddings(new_news_ids)
+
+        self.assertEqual(self.indexed_ids(faiss_index), [0, 1, 2, 3, 4])
+        self.assertEqual([mapping.position_of(news_id) for news_id in news_ids + new_news_ids], [0, 1, 2, 3, 4])
+        self.assertEqual(len(get_embedding_store()), 5)
+        np.testing.assert_allclose(get_embedding_store().get(new_news_ids[1], mapping),
+                                   faiss_index.reconstruct(4), rtol=1e-6)
+
+    def test_deleted_articles_are_removed_without_reusing_their_ids(self):
+        news_ids = make_articles(3)
+        process_and_store_embeddings()
+        NewsArticle.objects.filter(news_id=news_ids[1]).delete()
+
+        faiss_index, mapping = process_and_store_embeddings()
+        self.assertEqual(self.indexed_ids(faiss_index), [0, 2])
+        self.assertIsNone(mapping.position_of(news_ids[1]))
+
+        new_news_ids = make_articles(1, start=3)
+        faiss_index, mapping = process_and_store_embeddings()
+        self.assertEqual(self.indexed_ids(faiss_index), [0, 2, 3])
+        self.assertEqual(mapping.position_of(new_news_ids[0]), 3)
+
+    def test_legacy_index_is_dropped_and_every_article_re_embedded(self):
+        news_ids = make_articles(3)
+        legacy_index = faiss.IndexFlatL2(32)
+        legacy_index.add(np.random.default_rng(0).standard_normal((5, 32), dtype='float32'))
+        faiss.write_index(legacy_index, 'news_faiss.index')
+        # The legacy mapping was rebuilt from the table, so its positions no longer match the legacy vectors
+        with open('news_id_to_index_mapping.json', 'w') as f:
+            json.dump({str(position): news_id for position, news_id in enumerate(news_ids)}, f)
+        new_news_ids = make_articles(1, start=3)
+
+        faiss_index, mapping = process_and_store_embeddings(new_news_ids)
+
+        self.assertIsInstance(faiss_index, faiss.IndexIDMap2)
+        self.assertEqual(self.indexed_ids(faiss_index), [0, 1, 2, 3])
+        self.assertEqual(len(get_embedding_store()), 4)
+        for article in NewsArticle.objects.all():
+            expected = fake_encode_texts(clean_texts([article.title], [article.description]))[0]
+            np.testing.assert_allclose(faiss_index.reconstruct(mapping.position_of(article.news_id)), expected,
+                                       rtol=1e-6)
+        self.assertEqual(len(load_news_id_mapping()), 4)
+
+
+    def test_near_duplicates_in_different_chunks_of_a_build_share_a_cluster(self):
+        news_ids = make_articles(3)
+        NewsArticle.objects.filter(news_id=news_ids[2]).update(title="Article 0", description="Description 0")
+
+        faiss_index, mapping = process_and_store_embeddings(chunk_size=1)
+
+        self.assertEqual(self.indexed_ids(faiss_index), [0, 1])
+        self.assertEqual(NewsArticle.objects.get(news_id=news_ids[2]).cluster_id, mapping.position_of(news_ids[0]))
+
+    def test_rebuild_waits_for_the_running_job(self):
+        make_articles(3)
+        process_and_store_embeddings()
+        running = enqueue_job()
+        claim_next_job()
+
+        with self.assertRaises(CommandError):
+            call_command('rebuild_faiss_index', stdout=io.StringIO())
+        self.assertFalse(PopulateJob.objects.filter(kind=PopulateJob.KIND_REBUILD).exists())
+
+        PopulateJob.objects.filter(pk=running.pk).update(status=PopulateJob.STATUS_SUCCEEDED)
+        call_command('rebuild_faiss_index', '--index-type', 'hnsw', stdout=io.StringIO())
+        rebuild = PopulateJob.objects.get(kind=PopulateJob.KIND_REBUILD)
+        self.assertEqual(rebuild.status, PopulateJob.STATUS_SUCCEEDED)
+        self.assertEqual(get_index_type(faiss.read_index('news_faiss.index')), 'hnsw')
+
+    def test_index_type_chosen_for_a_rebuild_is_kept_by_later_updates(self):
+        make_articles(3)
+        process_and_store_embeddings()
+        call_command('rebuild_faiss_index', '--index-type', 'hnsw', stdout=io.StringIO())
+
+        faiss_index, _ = process_and_store_embeddings(make_articles(1, start=3))
+        self.assertEqual(get_index_type(faiss_index), 'hnsw')
+        self.assertEqual(faiss_index.ntotal, 4)
+
+        # A rebuild without a type goes back to the automatic choice
+        call_command('rebuild_faiss_index', stdout=io.StringIO())
+        faiss_index, _ = process_and_store_embeddings(make_articles(1, start=4))
+        self.assertEqual(get_index_type(faiss_index), 'flat')
+
+
+class PopulatePipelineTests(TestCase):
+    def test_pages_are_inserted_in_chunks_and_only_new_articles_are_embedded(self):
+        with StubNewsAPI(articles_per_category=15) as stub:
+            with NewsFetcher(url=stub.url, api_key='test', rate_limit=None, page_size=10) as fetcher:
+                save_news_to_db(list(fetcher.iter_pages(['sports']))[0][2][:4])
+                with mock.patch('news.populatePipeline.process_and_store_embeddings') as embed:
+                    new_news_ids, timers = populate_news(['sports', 'health'], chunk_size=8, fetcher=fetcher)
+
+        self.assertEqual(len(new_news_ids), 26)
+        self.assertEqual(NewsArticle.objects.count(), 30)
+        self.assertEqual(embed.call_args.args[0], new_news_ids)
+        self.assertEqual(timers.items['fetch'], 30)
+        self.assertEqual(timers.items['insert'], 30)
+
+
+def fake_populate(categories, timers):
+    with timers.stage('fetch'):
+        timers.count('fetch', 3)
+    return ['a', 'b'], timers
+
+
+class PopulateJobTests(TestCase):
+    def test_populate_request_queues_one_job_and_returns_immediately(self):
+        # Jobs are left to the `run_populate_jobs` worker, the web process does not run them
+        with mock.patch('news.views.start_populate_worker') as start_populate_worker:
+            first = self.client.get(reverse('populate_news_data'))
+            second = self.client.post(reverse('populate_news_data'))
+        start_populate_worker.assert_not_called()
+
+        self.assertEqual(first.status_code, 202)
+        self.assertEqual(first.json()['status'], 'queued')
+        self.assertEqual(second.json()['job_id'], first.json()['job_id'])
+        self.assertEqual(self.client.get(first.json()['status_url']).json()['status'], 'queued')
+
+    def test_each_kind_has_its_own_queued_job(self):
+        populate = enqueue_job()
+        reindex = enqueue_job(PopulateJob.KIND_REINDEX)
+
+        self.assertEqual((populate.kind, reindex.kind), (PopulateJob.KIND_POPULATE, PopulateJob.KIND_REINDEX))
+        self.assertNotEqual(populate.pk, reindex.pk)
+        self.assertEqual(enqueue_job(), populate)
+        self.assertEqual(enqueue_job(PopulateJob.KIND_REINDEX), reindex)
+
+    def test_job_reports_stage_progress(self):
+        job = enqueue_job()
+        with mock.patch('news.populatePipeline.populate_news', side_effect=fake_populate):
+            self.assertEqual(run_pending_jobs(), 1)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, PopulateJob.STATUS_SUCCEEDED)
+        self.assertEqual(job.progress['new_articles'], 2)
+        self.assertEqual(job.progress['stages']['fetch']['items'], 3)
+
+    def test_failed_job_records_error(self):
+        job = enqueue_job(PopulateJob.KIND_REINDEX)
+        with mock.patch('news.dataConvertor.process_and_store_embeddings', side_effect=RuntimeError("disk full")):
+            run_pending_jobs()
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.error), (PopulateJob.STATUS_FAILED, "disk full"))
+
+    def test_jobs_do_not_overlap_and_dead_runs_release_the_lock(self):
+        running = enqueue_job()
+        self.assertEqual(claim_next_job(), running)
+        queued = enqueue_job()
+
+        self.assertIsNone(claim_next_job())
+
+        PopulateJob.objects.filter(pk=running.pk).update(heartbeat_at=timezone.now() - POPULATE_STALE_AFTER * 2)
+        with mock.patch('news.populatePipeline.populate_news', side_effect=fake_populate):
+            self.assertEqual(run_pending_jobs(), 1)
+        self.assertEqual(PopulateJob.objects.get(pk=running.pk).status, PopulateJob.STATUS_FAILED)
+        self.assertEqual(PopulateJob.objects.get(pk=queued.pk).status, PopulateJob.STATUS_SUCCEEDED)
+
+
+class TextCleaningTests(SimpleTestCase):
+    def test_batch_cleaning_matches_per_text_cleaning(self):
+        texts = [
+            None, float('nan'), "", "  Padded  Title! ", "U.S. stocks rally 2%\t(AP)", "Café — naïve résumé…",
+            "\u0130stanbul \u212aelvin", "ÆØÅ ß ǅ", "line\nbreak", "nul\x00byte", "\u00a0nbsp\u2003", "😀 emoji",
+        ]
+        # Without and with a text containing the separator clean_texts joins the texts with
+        for texts in ([text for text in texts if text != "nul\x00byte"], texts):
+            titles = texts + texts[::-1]
+            descriptions = texts[::-1] + texts
+            self.assertEqual(clean_texts(titles, descriptions),
+                             [clean_text(title) + " " + clean_text(description)
+                              for title, description in zip(titles, descriptions)])
+        self.assertEqual(clean_texts([], []), [])
+
+
+class NearDuplicateTests(TestCase):
+    def setUp(self):
+        self.news_ids = make_articles(4)
+        self.mapping = NewsIdMapping.from_news_ids(self.news_ids)
+        self.published_at = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+        rng = np.random.default_rng(0)
+        self.vectors = rng.standard_normal((4, 8)).astype('float32')
+        self.vectors /= np.linalg.norm(self.vectors, axis=1, keepdims=True)
+
+    def make_index(self, positions):
+        faiss_index = faiss.IndexIDMap2(faiss.IndexFlatIP(8))
+        faiss_index.add_with_ids(self.vectors[positions], np.array(positions, dtype='int64'))
+        return faiss_index
+
+    def test_new_articles_join_the_cluster_of_indexed_and_earlier_near_duplicates(self):
+        faiss_index = self.make_index([0, 1])
+        embeddings = self.vectors[[0, 2, 2, 3]]
+        moments = [self.published_at, self.published_at, self.published_at + timedelta(hours=1),
+                   self.published_at + timedelta(days=30)]
+
+        cluster_ids = assign_clusters(embeddings, moments, [4, 5, 6, 7], faiss_index, self.mapping.news_id_at)
+
+        # Same story as indexed article 0, same story as new article 5, unrelated article
+        self.assertEqual(cluster_ids.tolist(), [0, 5, 5, 7])
+
+    def test_near_duplicates_published_outside_the_window_start_their_own_cluster(self):
+        faiss_index = self.make_index([0])
+        moments = [self.published_at + timedelta(days=30)] * 2
+
+        cluster_ids = assign_clusters(self.vectors[[0, 0]], moments, [4, 5], faiss_index, self.mapping.news_id_at)
+
+        self.assertEqual(cluster_ids.tolist(), [4, 4])
+
+    def test_removed_representative_is_replaced_by_the_oldest_remaining_member(self):
+        NewsArticle.objects.filter(news_id__in=self.news_ids[:3]).update(cluster_id=0)
+        NewsArticle.objects.filter(news_id=self.news_ids[3]).update(cluster_id=3)
+        self.assertEqual(duplicate_positions(self.mapping).tolist(), [1, 2])
+
+        updates, promoted = promote_cluster_members([0], self.mapping.cleared([0]))
+
+        self.assertEqual(promoted, [1])
+        self.assertEqual(sorted(cluster_id for _, cluster_id in updates), [1, 1])
+
+
+class ServingImportTests(SimpleTestCase):
+    def test_serving_path_does_not_load_ml_or_ingest_modules(self):
+        code = (
+            "import django, json, sys; django.setup(); import news.urls; "
+            "print(json.dumps([m for m in sys.modules if m.split('.')[0] in sys.argv[1:] or m in sys.argv[1:]]))"
+        )
+        unwanted = ['torch', 'sentence_transformers', 'pandas', 'news.dataConvertor', 'news.newsHandler',
+                    'news.populatePipeline']
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=settings.SETTINGS_MODULE,
+                   PYTHONPATH=os.pathsep.join(path for path in sys.path if path))
+        result = subprocess.run([sys.executable, '-c', code, *unwanted], env=env, capture_output=True, text=True)
+
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(json.loads(result.stdout.strip().splitlines()[-1]), [])
@@ -0,0 +1,202 @@
+import base64
+import json
+import logging
+import math
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .articleFeeds import FEED_FIELDS, FEED_MAX_PAGE_SIZE, get_latest_feed
+from .models import TrendingScore, UserInteractions
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Time after which a click counts half as much towards the trending score
+TRENDING_HALF_LIFE = getattr(settings, 'TRENDING_HALF_LIFE', timedelta(hours=6))
+
+# Number of articles in the precomputed trending list
+TRENDING_TOP_K = getattr(settings, 'TRENDING_TOP_K', FEED_MAX_PAGE_SIZE)
+
+# Seconds a web process serves its trending list before reading it again
+TRENDING_CACHE_TTL = getattr(settings, 'TRENDING_CACHE_TTL', 60)
+
+# Seconds between two decay passes of the `refresh_trending` command
+TRENDING_REFRESH_INTERVAL = getattr(settings, 'TRENDING_REFRESH_INTERVAL', 300)
+
+# Scores that decayed below this value (about 7 half-lives after a single click) are removed from the table
+TRENDING_MIN_SCORE = getattr(settings, 'TRENDING_MIN_SCORE', 0.01)
+
+TRENDING_DECAY_CONSTANT = math.log(2) / TRENDING_HALF_LIFE.total_seconds()
+
+
+def record_trending_clicks(click_counts):
+    """
+    Add clicks to the trending scores of the clicked articles.
+
+    Clicks are added undecayed; they start decaying at the next decay pass, which bounds their error by
+    TRENDING_REFRESH_INTERVAL. Articles with the same number of clicks share one UPDATE, so a batch costs one
+    INSERT and an UPDATE per distinct click count.
+
+    :param click_counts: Dictionary of article primary key to its number of new clicks
+    """
+    if not click_counts:
+        return
+    TrendingScore.objects.bulk_create(
+        [TrendingScore(news_article_id=article_id) for article_id in click_counts], ignore_conflicts=True
+    )
+    articles_by_count = defaultdict(list)
+    for article_id, count in click_counts.items():
+        articles_by_count[count].append(article_id)
+    for count, article_ids in articles_by_count.items():
+        TrendingScore.objects.filter(news_article_id__in=article_ids).update(score=F('score') + count)
+
+
+def decay_trending_scores(now=None, min_score=TRENDING_MIN_SCORE):
+    """
+    Decay every trending score to `now` and remove the scores that fell below `min_score`.
+
+    :param now: Time to decay the scores to (default: now)
+    :param min_score: Scores below this value are removed
+    :return: Tuple of the number of scores kept and removed
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        # Locking the rows makes clicks recorded during the pass wait instead of being overwritten
+        scores = list(TrendingScore.objects.select_for_update().only('news_article_id', 'score', 'decayed_at'))
+        if not scores:
+            return 0, 0
+
+        elapsed = np.array([(now - score.decayed_at).total_seconds() for score in scores])
+        decayed = np.array([score.score for score in scores]) * np.exp(-TRENDING_DECAY_CONSTANT * np.maximum(elapsed, 0.0))
+
+        kept, removed = [], []
+        for score, value in zip(scores, decayed.tolist()):
+            if value < min_score:
+                removed.append(score.news_article_id)
+            else:
+                score.score, score.decayed_at = value, now
+                kept.append(score)
+
+        TrendingScore.objects.bulk_update(kept, ['score', 'decayed_at'], batch_size=2000)
+        TrendingScore.objects.filter(news_article_id__in=removed).delete()
+
+    logger.info(f"Decayed {len(kept)} trending scores, removed {len(removed)}.")
+    return len(kept), len(removed)
+
+
+def rebuild_trending_scores(now=None, min_score=TRENDING_MIN_SCORE):
+    """
+    Recompute the trending scores from the recorded clicks, replacing the table.
+
+    :param now: Time to decay the scores to (default: now)
+    :param min_score: Scores below this value are not stored
+    :return: The number of stored scores
+    """
+    now = now or timezone.now()
+    # Clicks older than this contribute less than min_score each
+    horizon = now - timedelta(seconds=math.log(1 / min_score) / TRENDING_DECAY_CONSTANT)
+
+    scores = Counter()
+    clicks = (UserInteractions.objects.filter(clicked=True, timestamp__gte=horizon, timestamp__lte=now)
+              .values_list('news_article_id', 'timestamp'))
+    for article_id, clicked_at in clicks.iterator(chunk_size=10000):
+        scores[article_id] += math.exp(-TRENDING_DECAY_CONSTANT * (now - clicked_at).total_seconds())
+
+    with transaction.atomic():
+        TrendingScore.objects.all().delete()
+        TrendingScore.objects.bulk_create([
+            TrendingScore(news_article_id=article_id, score=score, decayed_at=now)
+            for article_id, score in scores.items() if score >= min_score
+        ], batch_size=2000)
+
+    return TrendingScore.objects.count()
+
+
+def load_trending_articles(top_k=TRENDING_TOP_K):
+    """
+    Read the `top_k` highest scored articles, padded with the newest articles when fewer articles have a score.
+
+    :param top_k: Number of articles
+    :return: List of article dicts, highest score first
+    """
+    rows = (TrendingScore.objects.order_by('-score', '-news_article_id')
+            .values(*(f"news_article__{field}" for field in FEED_FIELDS))[:top_k])
+    articles = [{field: row[f"news_article__{field}"] for field in FEED_FIELDS} for row in rows]
+
+    if len(articles) < top_k:
+        trending_ids = {article['news_id'] for article in articles}
+        latest, _ = get_latest_feed(page_size=top_k)
+        articles += [article for article in latest if article['news_id'] not in trending_ids][:top_k - len(articles)]
+    return articles
+
+
+class TrendingCache:
+    """
+    In-process copy of the trending list, read again from the database once it is `ttl` seconds old.
+    """
+
+    def __init__(self, ttl=TRENDING_CACHE_TTL, top_k=TRENDING_TOP_K):
+        self.ttl = ttl
+        self.top_k = top_k
+        self._articles = None
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self):
+        if self._articles is None or self._expires_at <= time.monotonic():
+            with self._lock:
+                if self._articles is None or self._expires_at <= time.monotonic():
+                    self._articles = load_trending_articles(self.top_k)
+                    self._expires_at = time.monotonic() + self.ttl
+        return self._articles
+
+    def invalidate(self):
+        with self._lock:
+            self._articles = None
+
+
+_trending_cache = TrendingCache()
+
+
+def get_trending_cache():
+    return _trending_cache
+
+
+def encode_trending_cursor(offset):
+    return base64.urlsafe_b64encode(json.dumps({'o': offset}).encode('utf-8')).decode('ascii')
+
+
+def decode_trending_cursor(cursor):
+    """
+    Return the offset of a trending cursor.
+    :raises ValueError: If the cursor is malformed
+    """
+    try:
+        offset = int(json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))['o'])
+    except (KeyError, TypeError, UnicodeError, json.JSONDecodeError, base64.binascii.Error) as e:
+        raise ValueError(f"Invalid cursor {cursor}.") from e
+    if offset < 0:
+        raise ValueError(f"Invalid cursor {cursor}.")
+    return offset
+
+
+def get_trending_page(page_size, cursor=None):
+    """
+    Return one page of the cached trending list.
+
+    :param page_size: Number of articles
+    :param cursor: Cursor returned for the previous page
+    :return: Tuple of the list of article dicts and the next cursor (None on the last page)
+    """
+    offset = decode_trending_cursor(cursor) if cursor else 0
+    articles = get_trending_cache().get()
+    end = offset + page_size
+    return articles[offset:end], encode_trending_cursor(end) if end < len(articles) else None
@@ -4,6 +4,7 @@ from . import views
 urlpatterns = [
     path('categories/', views.get_categories_articles, name='categories_articles'),
     path('populate/', views.populate_news_data, name='populate_news_data'),
+    path('populate/<int:job_id>/', views.populate_job_status, name='populate_job_status'),
     path('recommend_news/', views.recommend_news, name='recommend_news'),
     path('update_user_preferences/', views.update_user_preferences, name='update_user_preferences'),
     path('user_preferences/', views.get_user_preferences_view, name = 'get_user_preferences'),
@@ -1,5 +1,8 @@
+from .categories import CATEGORIES, CATEGORY_INDEX
+from .decayFunction import effective_weights, existing_user_ids
 from .models import UserPreferences
 from django.http import Http404
+from django.utils import timezone
 import logging
 
 # Set up logging
@@ -16,21 +19,11 @@ def get_user_preferences(user_id):
         # Fetch the user preferences for the given user
         user_pref = UserPreferences.objects.get(user_id=user_id)
 
-        # Create a dictionary to hold category-wise preferences
-        user_weights = {
-            'business': user_pref.business_weight,
-            'sports': user_pref.sports_weight,
-            'technology': user_pref.technology_weight,
-            'entertainment': user_pref.entertainment_weight,
-            'health': user_pref.health_weight,
-            'general': user_pref.general_weight,
-            'science': user_pref.science_weight,
-        }
+        # Create a dictionary to hold category-wise preferences, normalized
+        return effective_weights(user_pref)
 
-        return user_weights
-
-    except UserPreferences.DoesNotExist:
-        # If user preferences do not exist, return a 404 error with a message
+    except (UserPreferences.DoesNotExist, ValueError):
+        # If user preferences do not exist (or the user_id is not a user id), return a 404 error with a message
         logger.error(f"User preferences not found for user {user_id}.")
         raise Http404({"error" : "User preferences not found. Please select your preferences."})
 
@@ -40,16 +33,19 @@ def update_user_preferences_impl(user_id, categories):
     :param user_id: The unique identifier for the user
     :param categories: List of categories selected by the user
     :return: A dictionary with success or error message
+    :raises Http404: If the user does not exist
     """
-    try:
-        # Available categories in the system
-        available_categories = ['business', 'sports', 'technology', 'entertainment', 'health', 'general', 'science']
+    # Ids that are not integers belong to no user
+    if not existing_user_ids([user_id]):
+        logger.error(f"User with ID {user_id} does not exist.")
+        raise Http404(f"User with ID {user_id} does not exist.")
 
+    try:
         # Validate categories, ensure they are within the available categories
-        valid_categories = [cat for cat in categories if cat in available_categories]
+        valid_categories = [cat for cat in categories if cat in CATEGORY_INDEX]
 
         if not valid_categories:
-            raise Exception({"error": "No valid categories provided."})
+            return {"error": "No valid categories provided."}
 
         # Equal weight assignment
         weight_per_category = 1 / len(valid_categories)
@@ -61,13 +57,10 @@ def update_user_preferences_impl(user_id, categories):
         user_pref, created = UserPreferences.objects.get_or_create(user_id=user_id)
 
         # Update the user's preferences with the new weights
-        for category in available_categories:
-            if category in user_weights:
-                setattr(user_pref, f"{category}_weight", user_weights[category])
-            else:
-                setattr(user_pref, f"{category}_weight", 0)
+        user_pref.set_weights([user_weights.get(category, 0) for category in CATEGORIES])
+        user_pref.last_updated = timezone.now()
 
-        # Save the updated preferences
+        # Save the updated preferences (cached recommendations are keyed by the stored preferences)
         user_pref.save()
 
         logger.info(f"User preferences updated for user {user_id}.")
@@ -75,4 +68,4 @@ def update_user_preferences_impl(user_id, categories):
 
     except Exception as e:
         logger.error(f"Error updating user preferences for user {user_id}: {str(e)}")
-        return {"error": f"An error occurred while updating preferences: {str(e)}"}
\ No newline at end of file
+        return {"error": "An error occurred while updating preferences."}
\ No newline at end of file
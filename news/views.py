@@ -1,13 +1,15 @@
-from .decayFunction import handle_user_click
+from .articleFeeds import get_category_feeds, parse_page_size
+from .clickQueue import handle_click
 from django.http import JsonResponse, Http404
-from .recommendationSystem import get_recommended_news
-from .dataConvertor import process_and_store_embeddings
-from .models import NewsArticle
+from django.urls import reverse
+from .recommendationSystem import get_cached_recommended_news
+from .trendingFeed import TRENDING_TOP_K, get_trending_page
 from django.views.decorators.csrf import csrf_exempt
 import logging
 import json
 
-from .newsHandler import fetch_all_news_for_categories, save_news_to_db
+from .models import PopulateJob
+from .populateJobs import POPULATE_WORKER_IN_PROCESS, enqueue_job, serialize_job, start_populate_worker
 from .userPreferencesHandler import update_user_preferences_impl, get_user_preferences
 
 logger = logging.getLogger(__name__)
@@ -28,23 +30,30 @@ def get_categories_articles(request):
                 logger.error("No categories provided.")
                 return JsonResponse({"error": "Please provide a list of categories."}, status=400)
 
-            # Fetch articles from the database for each category
-            articles_data = {}
-            for category in categories:
-                articles = NewsArticle.objects.filter(category=category).values(
-                    'news_id', 'title', 'category', 'description', 'url', 'published_at', 'image_url'
-                )
+            try:
+                page_size = parse_page_size(request.GET.get('page_size'))
+                cursors = request.GET.getlist('cursor')
+                feeds = get_category_feeds(categories, page_size, cursors)
+            except ValueError as e:
+                logger.error(f"Invalid pagination parameters: {str(e)}")
+                return JsonResponse({"error": "Invalid page_size or cursor."}, status=400)
 
+            # One page of articles per category, with the cursor of the category's next page
+            articles_data = {}
+            next_cursors = {}
+            for category, (articles, next_cursor) in feeds.items():
                 # If no articles found for the category
                 if not articles:
                     articles_data[category] = {"error": f"No articles found for category '{category}'."}
                     continue
 
                 # Add the fetched articles to the dictionary
-                articles_data[category] = list(articles)
+                articles_data[category] = articles
+                if next_cursor:
+                    next_cursors[category] = next_cursor
 
             # Return the articles data as a JSON response
-            return JsonResponse({'articles': articles_data}, status=200)
+            return JsonResponse({'articles': articles_data, 'next_cursors': next_cursors}, status=200)
 
         except Exception as e:
             logger.error(f"Error fetching articles for categories: {str(e)}")
@@ -56,10 +65,15 @@ def handle_click_view(request):
         try:
             user_id = request.GET.get('user_id')
             news_id = request.GET.get('news_id')
-            handle_user_click(user_id, news_id)
-            return JsonResponse({"message": "User preferences updated successfully."})
+            if handle_click(user_id, news_id):
+                return JsonResponse({"message": "User preferences updated successfully."})
+            # The click is queued and applied to the preferences by the click worker
+            return JsonResponse({"message": "Click recorded."}, status=202)
+        except ValueError as e:
+            # Handle 400 error if the user ID is not an integer
+            return JsonResponse({"error": str(e)}, status=400)
         except Http404 as e:
-            # Handle 404 error if the article is not found
+            # Handle 404 error if the user or the article is not found
             return JsonResponse({"error": str(e)}, status=404)
         except Exception as e:
             # Catch any other exceptions and return an error message
@@ -68,33 +82,50 @@ def handle_click_view(request):
 @csrf_exempt
 def populate_news_data(request):
     """
-    API view to fetch news data, store them in the database, and build the FAISS index.
-    :return: JSON response indicating success or failure of the operation
+    API view to queue a job fetching news data, storing them in the database and building the FAISS index.
+    The job runs in the `run_populate_jobs` worker (see populateJobs), so the request returns immediately; `kind=reindex` queues
+    a reindex of the whole table instead, and `kind=rebuild` a rebuild of the index from the embedding store. Only one job of each kind waits at a time: a request made while a job of
+    the requested kind is queued returns that job.
+    :return: JSON response with the queued job and the URL of its status
     """
-    if request.method == "GET":
+    if request.method in ("GET", "POST"):
         try:
-            # List of categories to fetch news for
-            categories = ['business', 'sports', 'technology', 'entertainment', 'health', 'general', 'science']
+            kind = request.GET.get('kind', PopulateJob.KIND_POPULATE)
+            if kind not in dict(PopulateJob.KIND_CHOICES):
+                return JsonResponse({'error': f"Unknown job kind '{kind}'."}, status=400)
 
-            # Step 1: Fetch all news articles for the specified categories
-            logger.info(f"Fetching news articles for categories: {categories}")
-            articles = fetch_all_news_for_categories(categories)
+            job = enqueue_job(kind)
+            if POPULATE_WORKER_IN_PROCESS:
+                start_populate_worker()
 
-            # Step 2: Save the fetched articles into the database
-            logger.info(f"Saving {len(articles)} articles to the database.")
-            save_news_to_db(articles)
-
-            # Step 3: Process the articles to generate embeddings and store them in FAISS
-            logger.info("Generating embeddings and storing them in FAISS.")
-            process_and_store_embeddings()
-
-            # Return success response
-            return JsonResponse({'message': 'News data populated successfully, FAISS index built.'}, status=200)
+            # Return the queued job
+            response = serialize_job(job)
+            response['status_url'] = request.build_absolute_uri(reverse('populate_job_status', args=[job.pk]))
+            return JsonResponse(response, status=202)
 
         except Exception as e:
-            logger.error(f"Error during population process: {str(e)}")
+            logger.error(f"Error queueing the population job: {str(e)}")
             return JsonResponse({'error': 'An error occurred while populating the news data.'}, status=500)
 
+    else:
+        return JsonResponse({"error": "Only GET and POST requests are allowed."}, status=405)
+
+
+def populate_job_status(request, job_id):
+    """
+    API view to get the status, progress and per-stage durations of a populate job.
+    :return: JSON response with the job
+    """
+    if request.method == "GET":
+        try:
+            job = PopulateJob.objects.get(pk=job_id)
+        except PopulateJob.DoesNotExist:
+            return JsonResponse({"error": f"Populate job {job_id} does not exist."}, status=404)
+        return JsonResponse(serialize_job(job), status=200)
+
+    else:
+        return JsonResponse({"error": "Only GET requests are allowed."}, status=405)
+
 
 @csrf_exempt
 def recommend_news(request):
@@ -112,7 +143,7 @@ def recommend_news(request):
                 return JsonResponse({"error": "User ID is required"}, status=400)
 
             # Fetch the top N recommended news articles
-            recommended_articles = get_recommended_news(user_id, 21)
+            recommended_articles = get_cached_recommended_news(user_id, 21)
 
             if not recommended_articles:
                 return JsonResponse({"error": "No recommendations found"}, status=404)
@@ -160,6 +191,9 @@ def update_user_preferences(request):
                 return JsonResponse(response, status=400)
             return JsonResponse(response, status=200)
 
+        except Http404 as e:
+            # Handle 404 error if the user is not found
+            return JsonResponse({"error": str(e)}, status=404)
         except Exception as e:
             logger.error(f"Error updating user preferences for user {user_id}: {str(e)}")
             return JsonResponse({"error": f"An error occurred: {str(e)}"}, status=500)
@@ -207,37 +241,27 @@ def get_user_preferences_view(request):
 @csrf_exempt
 def get_trending_news(request):
     """
-    API view to get the most recent or most interacted news articles.
-    The trending articles are determined based on the `published_at` field or any other metric.
+    API view to get the most interacted news articles.
+    The trending articles are ranked by recency-decayed click counts (see trendingFeed), padded with the most
+    recent articles, and served from a list each process refreshes every TRENDING_CACHE_TTL seconds.
     :return: JSON response with the list of trending news articles
     """
     if request.method == "GET":
         try:
-            # Define the number of trending articles to fetch (e.g., top 10)
-            top_n = int(request.GET.get("top_n", 10))  # Default to 10 if not provided
-
-            # Fetch the top N most recent articles based on `published_at`
-            trending_articles = NewsArticle.objects.all().order_by('-published_at')[:top_n]
-
-            if not trending_articles:
+            # Number of trending articles per page (`top_n` is the former name of `page_size`)
+            try:
+                page_size = min(parse_page_size(request.GET.get("page_size", request.GET.get("top_n")), default=10),
+                                TRENDING_TOP_K)
+                trending_articles_data, next_cursor = get_trending_page(page_size, request.GET.get("cursor"))
+            except ValueError as e:
+                logger.error(f"Invalid pagination parameters: {str(e)}")
+                return JsonResponse({"error": "Invalid page_size or cursor."}, status=400)
+
+            if not trending_articles_data:
                 return JsonResponse({"error": "No trending news available."}, status=404)
 
-            # Serialize the fetched articles into a list
-            trending_articles_data = [
-                {
-                    "news_id": article.news_id,
-                    "title": article.title,
-                    "category": article.category,
-                    "description": article.description,
-                    "url": article.url,
-                    "image_url":article.image_url,
-                    "published_at": article.published_at
-                }
-                for article in trending_articles
-            ]
-
             # Return the trending articles as a JSON response
-            return JsonResponse({"trending_news": trending_articles_data}, status=200)
+            return JsonResponse({"trending_news": trending_articles_data, "next_cursor": next_cursor}, status=200)
 
         except Exception as e:
             logger.error(f"Error fetching trending news: {str(e)}")